@@ -0,0 +1,77 @@
+"""
+Cached assessment line item (ALI) metadata.
+
+Line item titles essentially never change, yet /api/lesson-count used to
+fetch every ``assessmentLineItems/{id}`` for every student and date range
+just to check for "Question:". Metadata now lives in KV, one key per ALI:
+
+  ``ali_meta:{aliId}`` → { title, course, kind }
+    kind: "lesson"   — a Test / FRQ / Quiz (counts as a completed lesson)
+          "question" — an individual "Question:" item
+          "unknown"  — untitled, or not found upstream
+
+get_ali_meta() reads all requested keys with one MGET and fetches only
+the misses, FETCH_WORKERS at a time, writing them back in one pipeline.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from api._kv import kv_mget, kv_set_many
+
+GRADEBOOK_PATH = "/ims/oneroster/gradebook/v1p2"
+META_TTL = 30 * 24 * 3600
+MISSING_TTL = 24 * 3600        # retry items that weren't found after a day
+FETCH_WORKERS = 8
+MGET_CHUNK = 200
+
+
+def meta_key(ali_id: str) -> str:
+    return f"ali_meta:{ali_id}"
+
+
+def classify(title: str) -> str:
+    # Lessons are Tests/FRQs/Quizzes — NOT individual "Question:" items
+    if not title:
+        return "unknown"
+    return "question" if "Question:" in title else "lesson"
+
+
+def _fetch_meta(up, ali_id: str) -> dict | None:
+    """Metadata for one line item; None on a transient failure (not cached)."""
+    try:
+        data, status = up.get(f"{GRADEBOOK_PATH}/assessmentLineItems/{ali_id}", timeout=10)
+    except Exception:
+        return None
+    if not data:
+        return {"title": "", "course": "", "kind": "unknown"} if status == 404 else None
+    obj = data.get("assessmentLineItem", data)
+    title = obj.get("title", "") or ""
+    course = ((obj.get("course") or {}).get("sourcedId", "")
+              or (obj.get("metadata") or {}).get("courseSourcedId", ""))
+    return {"title": title, "course": course, "kind": classify(title)}
+
+
+def get_ali_meta(ali_ids, up) -> dict:
+    """{aliId: {title, course, kind}} for every id; misses fetched via ``up``
+    (an api._helpers.Upstream). Ids that failed transiently are omitted."""
+    ids = sorted(set(i for i in ali_ids if i))
+    meta = {}
+    for start in range(0, len(ids), MGET_CHUNK):
+        chunk = ids[start:start + MGET_CHUNK]
+        for ali_id, value in zip(chunk, kv_mget([meta_key(i) for i in chunk])):
+            if isinstance(value, dict) and "kind" in value:
+                meta[ali_id] = value
+
+    missing = [i for i in ids if i not in meta]
+    if not missing:
+        return meta
+
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(missing))) as pool:
+        fetched = dict(zip(missing, pool.map(lambda i: _fetch_meta(up, i), missing)))
+
+    found = {meta_key(i): m for i, m in fetched.items() if m and m["kind"] != "unknown"}
+    not_found = {meta_key(i): m for i, m in fetched.items() if m and m["kind"] == "unknown"}
+    kv_set_many(found, ttl=META_TTL)
+    kv_set_many(not_found, ttl=MISSING_TTL)
+    meta.update({i: m for i, m in fetched.items() if m})
+    return meta
@@ -0,0 +1,143 @@
+"""
+Day-bucketed cache of EduBridge analytics facts.
+
+/api/analytics and /api/enrollment-analytics return facts grouped by local
+day (``facts`` and ``factsByApp`` are both keyed ``YYYY-MM-DD``). Facts for
+a day that has ended never change, so each day is cached on its own:
+
+  KV ``analytics_day:{scope}:{subjectHash}:{date}`` → { facts, factsByApp }
+  KV ``analytics_meta:{scope}:{subjectHash}`` → the response's other
+    top-level fields (``enrollment``, ``course``, ...), for META_TTL
+    scope       "student" (email / studentId) or "enrollment"
+    subjectHash sha1 of the subject ids + timezone (days are local)
+
+Closed days are kept for CLOSED_TTL; today is kept for TODAY_TTL only. A
+request reads its days and the meta record with one MGET, then makes at
+most one upstream call, covering the first through the last uncached day
+(or just the last day, when only the meta record has expired). Days after
+today are empty by definition and never fetched. Every response has the
+same shape, whether it came from cache or not.
+
+Only ranges made of whole local days are bucketed (plain dates, or the
+midnight → 23:59:59.999 timestamps the dashboard sends); anything else,
+or a response whose keys aren't the requested days, is passed through.
+"""
+
+import hashlib
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from api._helpers import fetch_with_params
+from api._kv import kv_mget, kv_set, kv_set_many
+
+CLOSED_TTL = 365 * 24 * 3600
+TODAY_TTL = 120
+META_TTL = 3600
+MAX_DAYS = 400
+
+
+def _zone(tz_name: str):
+    try:
+        return ZoneInfo(tz_name) if tz_name else timezone.utc
+    except Exception:
+        return None
+
+
+def _local_day(value: str, tz, end: bool) -> date | None:
+    """The local day a range bound falls on, or None if it isn't a day boundary."""
+    if len(value) == 10:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return None
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    local = moment.astimezone(tz)
+    clock = local.time()
+    if not end and clock == dtime(0, 0):
+        return local.date()
+    if end and clock >= dtime(23, 59, 59):
+        return local.date()
+    return None
+
+
+def _bound(day: date, tz, end: bool) -> str:
+    """UTC timestamp for the start / end of a local day, in the dashboard's format."""
+    local = datetime.combine(day, dtime(23, 59, 59, 999000) if end else dtime(0, 0), tzinfo=tz)
+    return local.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.") + f"{local.microsecond // 1000:03d}Z"
+
+
+def _day_key(scope: str, subject: str, day: str) -> str:
+    return f"analytics_day:{scope}:{subject}:{day}"
+
+
+def cached_facts(path: str, params: dict, scope: str, subject_ids, fetch=fetch_with_params):
+    """Facts for ``params``' date range, assembled from day buckets.
+
+    ``fetch(path, params)`` → (data, status) does the upstream call
+    (fetch_with_params, or an Upstream's get). Returns (data, status).
+    """
+    tz = _zone(params.get("timezone", ""))
+    start_s, end_s = params.get("startDate", ""), params.get("endDate", "")
+    if tz is None or not start_s or not end_s:
+        return fetch(path, params)
+    first, last = _local_day(start_s, tz, end=False), _local_day(end_s, tz, end=True)
+    if not first or not last or first > last or (last - first).days >= MAX_DAYS:
+        return fetch(path, params)
+
+    subject = hashlib.sha1(
+        "|".join([*subject_ids, params.get("timezone", "")]).encode()
+    ).hexdigest()[:16]
+    today = datetime.now(tz).date()
+    days = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+    meta_key = f"analytics_meta:{scope}:{subject}"
+    *stored, meta = kv_mget([_day_key(scope, subject, d) for d in days] + [meta_key])
+    cached = dict(zip(days, stored))
+
+    for d in days:
+        if d > today.isoformat():
+            cached[d] = {}  # nothing can have happened yet
+    missing = [d for d in days if not isinstance(cached[d], dict)]
+    if not missing and not isinstance(meta, dict):
+        missing = days[-1:]  # the smallest call that brings the other fields back
+    extra = meta if isinstance(meta, dict) else {}
+    if missing:
+        fetch_from = date.fromisoformat(missing[0])
+        fetch_to = date.fromisoformat(missing[-1])
+        upstream_params = {**params, "startDate": _bound(fetch_from, tz, False), "endDate": _bound(fetch_to, tz, True)}
+        data, status = fetch(path, upstream_params)
+        if not data:
+            return data, status
+        fetched_days = [d for d in days if missing[0] <= d <= missing[-1]]
+        facts = data.get("facts") or {}
+        by_app = data.get("factsByApp") or {}
+        if not isinstance(facts, dict) or not isinstance(by_app, dict) or not set(facts) | set(by_app) <= set(fetched_days):
+            # Not day-keyed the way we expect: serve the full range uncached
+            return fetch(path, params)
+
+        closed, today_bucket = {}, None
+        for d in fetched_days:
+            bucket = {"facts": facts.get(d), "factsByApp": by_app.get(d)}
+            cached[d] = bucket
+            if d < today.isoformat():
+                closed[_day_key(scope, subject, d)] = bucket
+            elif d == today.isoformat():
+                today_bucket = bucket
+        kv_set_many(closed, ttl=CLOSED_TTL)
+        if today_bucket is not None:
+            kv_set(_day_key(scope, subject, today.isoformat()), today_bucket, ttl=TODAY_TTL)
+        extra = {k: v for k, v in data.items() if k not in ("facts", "factsByApp")}
+        kv_set(meta_key, extra, ttl=META_TTL)
+
+    out = {**extra, "facts": {}, "factsByApp": {}}
+    for d in days:
+        bucket = cached[d]
+        if bucket.get("facts") is not None:
+            out["facts"][d] = bucket["facts"]
+        if bucket.get("factsByApp") is not None:
+            out["factsByApp"][d] = bucket["factsByApp"]
+    return out, 200
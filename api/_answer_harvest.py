@@ -0,0 +1,281 @@
+"""
+PowerPath answer harvesting for /api/compute-skill-scores.
+
+When a student has no lesson-viewer answer log for a course, their answers
+come from PowerPath: getAssessmentProgress for every assessment component
+resource (quiz / bank CR) in the course. The harvester reads up to MAX_CRS
+of them, HARVEST_WORKERS at a time, and keeps a compact result per CR so
+later harvests only re-read the CRs that may have changed:
+
+  answer_harvest:{student}:{course}        { at, crs: { crId: { at,
+                                             answers: { questionId:
+                                             correct } } } }
+  answer_harvest_lease:{student}:{course}  one harvester at a time
+
+A CR is re-read when it was never harvested, when our own writers touched
+it since (``pp_touched``, api/_progress_cache.py), or when its entry is
+older than REFRESH_AFTER — that catches attempts changed outside this app.
+
+Every harvest backfills the answers into the ``student_answers:{student}:
+{course}`` log that /api/log-answer writes, as entries marked
+``source: "powerpath"``; answers the lesson viewer logged win (log-answer
+drops the mark when it updates an entry). The backfill merges by
+questionId, and both writers hold
+
+  student_answers_lock:{student}:{course}  short write lock on the log
+
+around their read-modify-write.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+from api._course_tree import index_for
+from api._helpers import API_BASE, Upstream, api_headers
+from api._kv import kv_delete_if, kv_get, kv_set, kv_set_nx
+from api._progress_cache import touched_lessons
+from api._tree_cache import get_tree
+
+HARVEST_WORKERS = 8
+MAX_CRS = 100
+REFRESH_AFTER = 6 * 3600     # re-read a CR at least this often
+MIN_INTERVAL = 10 * 60       # between background refreshes of an untouched harvest
+HARVEST_TTL = 30 * 24 * 3600
+LEASE_TTL = 90
+LOG_LOCK_TTL = 10
+LOG_LOCK_WAIT = 3            # seconds a writer waits for the answer-log lock
+
+
+def _record_key(student_id: str, course_id: str) -> str:
+    return f"answer_harvest:{student_id}:{course_id}"
+
+
+def _lease_key(student_id: str, course_id: str) -> str:
+    return f"answer_harvest_lease:{student_id}:{course_id}"
+
+
+# ── Assessment CRs ───────────────────────────────────────────────────
+
+def extract_assessment_cr_ids(tree) -> list[str]:
+    """Component resource sourcedIds for assessment-type resources (quiz/bank
+    CRs), lesson- and unit-level, from the course index.
+    The CR sourcedId (e.g., USHI23-l2-r104063-bank-v1) is what PowerPath
+    uses as the lesson ID in getAssessmentProgress."""
+    cr_ids = []
+    seen = set()
+    for r in index_for(tree).of_kind("assessment"):
+        cr_sid = r["crId"]
+        if not cr_sid or cr_sid in seen:
+            continue
+        if "bank" in cr_sid.lower() or "assessment" in r["type"] or "assessment" in r["url"]:
+            seen.add(cr_sid)
+            cr_ids.append(cr_sid)
+    return cr_ids
+
+
+def assessment_cr_ids(student_id: str, course_ids: list[str]) -> list[str]:
+    """Assessment CR ids of the first of ``course_ids`` with a tree.
+
+    Assessment CR IDs are course-wide, so the shared tree cache serves them;
+    the student's own lesson plan is only a fallback.
+    """
+    tree = None
+    for cid in course_ids:
+        tree = get_tree(cid)
+        if tree:
+            break
+    if not tree:
+        headers = api_headers()
+        for cid in course_ids:
+            try:
+                resp = requests.get(
+                    f"{API_BASE}/powerpath/lessonPlans/{cid}/{student_id}",
+                    headers=headers,
+                    timeout=30,
+                )
+                if resp.status_code == 200:
+                    data = resp.json()
+                    if data:
+                        tree = data
+                        break
+            except Exception:
+                continue
+    return extract_assessment_cr_ids(tree)[:MAX_CRS] if tree else []
+
+
+# ── Harvest ──────────────────────────────────────────────────────────
+
+def _harvest_cr(upstream: Upstream, student_id: str, cr_id: str) -> dict | None:
+    """{questionId: correct} for one CR's attempt, or None if the read failed."""
+    try:
+        progress, status = upstream.get("/powerpath/getAssessmentProgress",
+                                        {"student": student_id, "lesson": cr_id}, timeout=10)
+    except Exception:
+        return None
+    if status != 200 or not isinstance(progress, dict):
+        return None
+    answers = {}
+    for q in progress.get("questions", []):
+        qid = q.get("id", "")
+        correct = q.get("correct")
+        if qid and (q.get("answered", False) or correct is not None):
+            answers[qid] = bool(correct)
+    return answers
+
+
+def _due(cr_ids: list[str], crs: dict, touched: dict, now: float) -> list[str]:
+    due = []
+    for cr_id in cr_ids:
+        entry = crs.get(cr_id)
+        if not entry or now - entry["at"] >= REFRESH_AFTER or touched.get(cr_id, 0) >= entry["at"]:
+            due.append(cr_id)
+    return due
+
+
+def _answers_of(record: dict) -> dict:
+    """{questionId: {correct, answered}} across every harvested CR."""
+    answers = {}
+    for entry in (record.get("crs") or {}).values():
+        for qid, correct in entry["answers"].items():
+            answers[qid] = {"correct": correct, "answered": True}
+    return answers
+
+
+def load_harvest(student_id: str, course_id: str) -> dict | None:
+    record = kv_get(_record_key(student_id, course_id))
+    return record if isinstance(record, dict) and isinstance(record.get("crs"), dict) else None
+
+
+def harvest_answers(student_id: str, course_id: str, pp100_id: str = "",
+                    deadline: float | None = None) -> dict:
+    """Re-read the CRs that are due and backfill the answer log.
+
+    Returns { answers, refreshed, cached, failed, pending, busy }; ``pending``
+    counts due CRs left for a later run because ``deadline`` passed, and
+    ``busy`` means another harvester holds the lease (answers are then the
+    last stored harvest).
+    """
+    record = load_harvest(student_id, course_id) or {"crs": {}}
+    out = {"refreshed": 0, "cached": 0, "failed": 0, "pending": 0, "busy": False}
+
+    lease = _lease_key(student_id, course_id)
+    token = uuid.uuid4().hex
+    if not kv_set_nx(lease, token, LEASE_TTL):
+        out["busy"] = True
+        return {**out, "answers": _answers_of(record)}
+
+    try:
+        course_ids = list(dict.fromkeys(c for c in (pp100_id, course_id) if c))
+        cr_ids = assessment_cr_ids(student_id, course_ids)
+        now = time.time()
+        due = _due(cr_ids, record["crs"], touched_lessons(student_id), now)
+        out["cached"] = len(cr_ids) - len(due)
+
+        if due:
+            upstream = Upstream()
+            pool = ThreadPoolExecutor(max_workers=min(HARVEST_WORKERS, len(due)))
+            futures = {pool.submit(_harvest_cr, upstream, student_id, cr_id): cr_id for cr_id in due}
+            timeout = max(0.0, min(deadline, now + LEASE_TTL - 10) - time.time()) if deadline else LEASE_TTL - 10
+            done, not_done = wait(futures, timeout=timeout)
+            pool.shutdown(wait=False, cancel_futures=True)
+            for f in done:
+                answers = f.result()
+                if answers is None:
+                    out["failed"] += 1
+                else:
+                    record["crs"][futures[f]] = {"at": now, "answers": answers}
+                    out["refreshed"] += 1
+            out["pending"] = len(not_done)
+
+        if cr_ids:  # CRs dropped from the course no longer count
+            keep = set(cr_ids)
+            record["crs"] = {cr: e for cr, e in record["crs"].items() if cr in keep}
+        record["at"] = now
+        kv_set(_record_key(student_id, course_id), record, ttl=HARVEST_TTL)
+        if out["refreshed"]:
+            _backfill(student_id, course_id, record)
+    finally:
+        kv_delete_if(lease, token)
+
+    return {**out, "answers": _answers_of(record)}
+
+
+def _log_lock_key(key: str) -> str:
+    return key.replace("student_answers:", "student_answers_lock:", 1)
+
+
+def lock_answer_log(key: str) -> str | None:
+    """Take the write lock on an answer log, waiting up to LOG_LOCK_WAIT.
+    Returns the token for unlock_answer_log(), or None if it stayed taken."""
+    token = uuid.uuid4().hex
+    deadline = time.time() + LOG_LOCK_WAIT
+    while not kv_set_nx(_log_lock_key(key), token, LOG_LOCK_TTL):
+        if time.time() >= deadline:
+            return None
+        time.sleep(0.1)
+    return token
+
+
+def unlock_answer_log(key: str, token: str):
+    kv_delete_if(_log_lock_key(key), token)
+
+
+def _backfill(student_id: str, course_id: str, record: dict):
+    """Merge harvested answers into ``student_answers:{student}:{course}``
+    by questionId: PowerPath-sourced entries are updated, added or (for CRs
+    no longer in the harvest) dropped; entries the viewer logged are kept."""
+    key = f"student_answers:{student_id}:{course_id}"
+    token = lock_answer_log(key)
+    if token is None:
+        return  # a viewer write is in progress; the next harvest backfills
+    try:
+        log = kv_get(key)
+        if not isinstance(log, list):
+            log = []
+        harvested = _answers_of(record)
+        merged, seen = [], set()
+        for e in log:
+            if isinstance(e, dict) and e.get("source") == "powerpath":
+                a = harvested.get(e.get("questionId"))
+                if a is None:
+                    continue
+                e["correct"] = a["correct"]
+            if isinstance(e, dict):
+                seen.add(e.get("questionId"))
+            merged.append(e)
+        for qid, a in harvested.items():
+            if qid not in seen:
+                merged.append({"questionId": qid, "choiceId": "", "correct": a["correct"],
+                               "timestamp": 0, "source": "powerpath"})
+        kv_set(key, merged)
+    finally:
+        unlock_answer_log(key, token)
+
+
+def refresh_in_background(student_id: str, course_id: str, pp100_id: str = "") -> bool:
+    """Start a background harvest if a stored one may be out of date: older
+    than MIN_INTERVAL, or a CR in it was touched since. False if nothing
+    was ever harvested for the student and course."""
+    record = load_harvest(student_id, course_id)
+    if record is None:
+        return False
+    at = record.get("at") or 0
+    touched = touched_lessons(student_id)
+    if time.time() - at >= MIN_INTERVAL or any(touched.get(cr, 0) >= at for cr in record["crs"]):
+        start_harvest(student_id, course_id, pp100_id)
+    return True
+
+
+def start_harvest(student_id: str, course_id: str, pp100_id: str = ""):
+    """Run harvest_answers() in a background thread."""
+    def run():
+        try:
+            harvest_answers(student_id, course_id, pp100_id)
+        except Exception as e:
+            print(f"[answer-harvest] {student_id}/{course_id} failed: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
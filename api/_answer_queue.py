@@ -0,0 +1,218 @@
+"""
+Write-behind queue for PowerPath question responses.
+
+/api/quiz-session acknowledges an answer once it is appended to a
+per-attempt stream in KV; a drain worker then PUTs the responses to
+``updateStudentQuestionResponse`` in the order they were given.
+
+KV layout:
+  quiz_answers:{student}:{lesson}        native Redis list of
+                                         { question, response, at }
+  quiz_answers_lease:{student}:{lesson}  drain lease (one drainer per attempt)
+  quiz_answers_failed:{student}:{lesson} native Redis list of the items
+                                         PowerPath rejected
+  quiz_answers_active                    native Redis set of [student, lesson]
+                                         streams that may hold answers
+
+Only the lease holder reads the head, PUTs it and pops it, so responses
+reach PowerPath one at a time and in order across instances. LEASE_TTL
+outlasts the worst case of one item's PUTs; the drainer renews the lease
+(compare-and-expire) before each item and stops as soon as it is no longer
+the holder, and pops an item only if it is still the head, so a stream that
+was discarded and refilled meanwhile is never popped by mistake. Transient
+failures (network, 429, 5xx) are retried with backoff; if they persist the
+drain stops with the item still at the head, and the next enqueue or
+flush picks it up. A 4xx rejection moves the item to the failed list so it
+can't block the rest of the attempt; finalize reports that list back to
+the client (failed_answers()).
+
+An acknowledged answer must not depend on the instance that took it
+staying alive, or on the student coming back to finalize: every enqueue
+adds its stream to ``quiz_answers_active``, and sweep_answers() — run by
+the GET /api/quiz-session?action=sweep cron (vercel.json) — drains each of
+them and drops the ones left empty.
+"""
+
+import threading
+import time
+import uuid
+
+import requests
+
+from api._helpers import API_BASE, api_headers
+from api._kv import (kv_delete, kv_delete_if, kv_lpop_if, kv_lrange, kv_renew_if, kv_rpush, kv_sadd,
+                     kv_set_nx, kv_smembers, kv_srem)
+from api._progress_cache import record_responses
+
+PP = f"{API_BASE}/powerpath"
+STREAM_TTL = 24 * 3600
+PUT_TIMEOUT = 10
+MAX_TRIES = 3           # PUTs per item per drain pass
+BACKOFF = (0.5, 1.5)    # seconds slept between tries
+# Seconds; must outlast one item's worst case — MAX_TRIES tries of up to two
+# PUTs (401 → new token) plus the backoff. A drainer that dies frees the
+# attempt after this.
+LEASE_TTL = MAX_TRIES * 2 * PUT_TIMEOUT + int(sum(BACKOFF)) + 20
+DISCARD_WAIT = 15       # seconds discard_answers() waits for an in-flight drain
+ACTIVE_KEY = "quiz_answers_active"
+
+
+def _stream_key(student: str, lesson: str) -> str:
+    return f"quiz_answers:{student}:{lesson}"
+
+
+def _lease_key(student: str, lesson: str) -> str:
+    return f"quiz_answers_lease:{student}:{lesson}"
+
+
+def _failed_key(student: str, lesson: str) -> str:
+    return f"quiz_answers_failed:{student}:{lesson}"
+
+
+def enqueue_answer(student: str, lesson: str, question_id: str, response, start_worker: bool = True) -> bool:
+    """Append a response to the attempt's stream. False if KV didn't take it
+    (the caller should then PUT synchronously)."""
+    item = {"question": question_id, "response": response, "at": time.time()}
+    if not kv_rpush(_stream_key(student, lesson), item, ttl=STREAM_TTL):
+        return False
+    kv_sadd(ACTIVE_KEY, [student, lesson])
+    if start_worker:
+        threading.Thread(target=drain_answers, args=(student, lesson), daemon=True).start()
+    return True
+
+
+def pending_answers(student: str, lesson: str) -> list:
+    """Responses not yet accepted by PowerPath, oldest first."""
+    return kv_lrange(_stream_key(student, lesson)) or []
+
+
+def failed_answers(student: str, lesson: str) -> list:
+    """Responses PowerPath rejected (4xx) for the attempt, oldest first."""
+    return kv_lrange(_failed_key(student, lesson)) or []
+
+
+def _put(item: dict, student: str, lesson: str, headers: dict):
+    payload = {"student": student, "lesson": lesson, "question": item["question"], "response": item["response"]}
+    resp = requests.put(f"{PP}/updateStudentQuestionResponse", headers=headers, json=payload, timeout=PUT_TIMEOUT)
+    if resp.status_code == 401:
+        headers.update(api_headers())
+        resp = requests.put(f"{PP}/updateStudentQuestionResponse", headers=headers, json=payload,
+                            timeout=PUT_TIMEOUT)
+    return resp.status_code
+
+
+def _send(item: dict, student: str, lesson: str, headers: dict) -> str:
+    """PUT one response with retries: "ok", "rejected" (4xx) or "failed"."""
+    for attempt in range(MAX_TRIES):
+        try:
+            status = _put(item, student, lesson, headers)
+        except Exception:
+            status = 0
+        if 200 <= status < 300:
+            return "ok"
+        if 400 <= status < 500 and status != 429:
+            return "rejected"
+        if attempt < len(BACKOFF):
+            time.sleep(BACKOFF[attempt])
+    return "failed"
+
+
+def drain_answers(student: str, lesson: str, deadline: float | None = None) -> dict:
+    """Push queued responses to PowerPath in order until the stream is empty,
+    a transient failure persists, or ``deadline`` passes.
+
+    Returns { sent, rejected, pending, busy }; ``busy`` means another worker
+    holds the lease (or took it over during the pass).
+    """
+    out = {"sent": 0, "rejected": 0, "pending": 0, "busy": False}
+    token = uuid.uuid4().hex
+    lease = _lease_key(student, lesson)
+    if not kv_set_nx(lease, token, LEASE_TTL):
+        out["busy"] = True
+        out["pending"] = len(pending_answers(student, lesson))
+        return out
+
+    headers = api_headers()
+    key = _stream_key(student, lesson)
+    accepted = {}
+    try:
+        while not deadline or time.time() < deadline:
+            if not kv_renew_if(lease, token, LEASE_TTL):
+                out["busy"] = True  # lease expired or was taken over
+                break
+            head = kv_lrange(key, 0, 0)
+            if not head:
+                break
+            item = head[0]
+            result = _send(item, student, lesson, headers)
+            if result == "failed":
+                break
+            if result == "rejected":
+                kv_rpush(_failed_key(student, lesson), item, ttl=STREAM_TTL)
+                out["rejected"] += 1
+            else:
+                out["sent"] += 1
+                accepted[item["question"]] = {"response": item["response"]}
+            if not kv_lpop_if(key, item):
+                break  # the stream was discarded under us
+    finally:
+        kv_delete_if(lease, token)
+    record_responses(student, lesson, accepted)
+    out["pending"] = len(pending_answers(student, lesson))
+    return out
+
+
+def flush_answers(student: str, lesson: str, timeout: float = 20) -> bool:
+    """Drain the attempt's stream, waiting out another worker's lease. True
+    once nothing is pending."""
+    deadline = time.time() + timeout
+    while True:
+        result = drain_answers(student, lesson, deadline)
+        if not result["pending"]:
+            return True
+        if time.time() >= deadline or not result["busy"]:
+            return False
+        time.sleep(0.5)
+
+
+def sweep_answers(deadline: float) -> dict:
+    """Drain every active stream until ``deadline``. Streams left empty are
+    dropped from the active set; busy or still-failing ones stay for the
+    next sweep. Returns { streams, sent, rejected, pending }."""
+    out = {"streams": 0, "sent": 0, "rejected": 0, "pending": 0}
+    for member in kv_smembers(ACTIVE_KEY):
+        if time.time() >= deadline:
+            break
+        if not (isinstance(member, list) and len(member) == 2):
+            kv_srem(ACTIVE_KEY, member)
+            continue
+        student, lesson = member
+        result = drain_answers(student, lesson, deadline)
+        out["streams"] += 1
+        out["sent"] += result["sent"]
+        out["rejected"] += result["rejected"]
+        out["pending"] += result["pending"]
+        if not result["pending"] and not result["busy"]:
+            kv_srem(ACTIVE_KEY, member)
+            if pending_answers(student, lesson):  # enqueued while we removed it
+                kv_sadd(ACTIVE_KEY, member)
+    return out
+
+
+def discard_answers(student: str, lesson: str):
+    """Forget queued responses (the attempt is about to be reset).
+
+    The stream is dropped first so a running drain stops after its current
+    item; then we wait up to DISCARD_WAIT for its lease, so that item's PUT
+    lands before the caller resets the attempt rather than after.
+    """
+    kv_delete(_stream_key(student, lesson))
+    kv_delete(_failed_key(student, lesson))
+    lease = _lease_key(student, lesson)
+    token = uuid.uuid4().hex
+    deadline = time.time() + DISCARD_WAIT
+    while not kv_set_nx(lease, token, LEASE_TTL):
+        if time.time() >= deadline:
+            return
+        time.sleep(0.5)
+    kv_delete_if(lease, token)
@@ -0,0 +1,254 @@
+"""
+Caliper outbox: buffered, batched delivery of Caliper events.
+
+Handlers (/api/caliper-event, /api/activity-record, /api/mark-content-complete,
+/api/powerpath-complete) call enqueue_events() and return straight away.
+Events are appended to a shared KV stream and sent to the Caliper API as
+multi-event envelopes:
+
+  caliper_outbox          native Redis list of Caliper events, oldest first
+  caliper_outbox_lease    flush lease (one flusher at a time across instances)
+  caliper_seen:{eventId}  dedupe marker, DEDUPE_TTL
+  caliper_dead            [event, ...] events the Caliper API rejected
+  caliper_outbox_metrics  { envelopes, eventsSent, eventsRejected, failures,
+                            lastFlushAt, lastBatchSize, lastLatencyMs,
+                            lastError, pending }
+
+A flush starts in the background once FLUSH_SIZE events are waiting, or
+FLUSH_AFTER seconds after the first event an instance enqueues; the
+/api/caliper-event cron drains whatever an instance left behind. The
+flusher renews its lease (compare-and-expire) before every POST and stops
+once it is no longer the holder; settled events are removed only while
+they are still the outbox head, so two flushers can never trim each
+other's events. An event
+id seen within DEDUPE_TTL is dropped, so client retries don't double-count.
+If KV is unavailable, events are sent synchronously as before.
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import requests
+
+from api._helpers import get_token
+from api._kv import (kv_delete_if, kv_get, kv_list_push, kv_lpop_if, kv_lrange, kv_ltrim_if, kv_renew_if,
+                     kv_rpush, kv_set, kv_set_nx)
+
+CALIPER_URL = "https://caliper.alpha-1edtech.ai/caliper/event"
+SENSOR_ID = "https://alphalearn.alpha.school"
+DATA_VERSION = "http://purl.imsglobal.org/ctx/caliper/v1p2"
+
+OUTBOX_KEY = "caliper_outbox"
+LEASE_KEY = "caliper_outbox_lease"
+DEAD_KEY = "caliper_dead"
+METRICS_KEY = "caliper_outbox_metrics"
+FLUSH_SIZE = 25         # events waiting before a flush starts immediately
+FLUSH_AFTER = 3         # seconds an event may wait on a quiet instance
+MAX_BATCH = 100         # events per envelope
+DEDUPE_TTL = 24 * 3600
+LEASE_TTL = 60          # renewed before every POST (15 s timeout)
+
+_seen = set()           # event ids this instance already accepted
+_timer_lock = threading.Lock()
+_timer_armed = False
+
+
+def caliper_time(moment: datetime | None = None) -> str:
+    return (moment or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _envelope(events: list) -> dict:
+    return {"sensor": SENSOR_ID, "sendTime": caliper_time(), "dataVersion": DATA_VERSION, "data": events}
+
+
+def _post(events: list, token: str):
+    """POST one envelope. Returns (status, body text); status 0 on a network error."""
+    try:
+        resp = requests.post(
+            CALIPER_URL,
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            json=_envelope(events),
+            timeout=15,
+        )
+        return resp.status_code, resp.text[:300]
+    except Exception as e:
+        return 0, str(e)
+
+
+def _ok(status: int) -> bool:
+    return status in (200, 201, 202, 204)
+
+
+def _rejected(status: int) -> bool:
+    return 400 <= status < 500 and status not in (401, 429)
+
+
+# ── Enqueue ──────────────────────────────────────────────────────────
+
+def _is_duplicate(event_id: str) -> bool:
+    if event_id in _seen:
+        return True
+    if len(_seen) > 10000:
+        _seen.clear()
+    _seen.add(event_id)
+    key = f"caliper_seen:{event_id}"
+    if kv_set_nx(key, 1, DEDUPE_TTL):
+        return False
+    # SET NX also fails when KV is down: only a marker we can read is a duplicate
+    return kv_get(key) is not None
+
+
+def enqueue_events(events: list) -> dict:
+    """Queue Caliper events for batched delivery.
+
+    Events without an ``id`` get a ``urn:uuid:`` one. Returns
+    { queued, duplicates, sent?, status? } — ``sent``/``status`` only when
+    KV was unavailable and the events went out synchronously.
+    """
+    fresh, duplicates = [], 0
+    for event in events:
+        event.setdefault("id", f"urn:uuid:{uuid.uuid4()}")
+        if _is_duplicate(event["id"]):
+            duplicates += 1
+        else:
+            fresh.append(event)
+    if not fresh:
+        return {"queued": 0, "duplicates": duplicates}
+
+    length = kv_rpush(OUTBOX_KEY, *fresh)
+    if not length:
+        try:
+            status, _ = _post(fresh, get_token())
+        except Exception:
+            status = 0
+        if not _ok(status):
+            _seen.difference_update(e["id"] for e in fresh)  # let a retry through
+        return {"queued": 0, "duplicates": duplicates, "sent": len(fresh) if _ok(status) else 0, "status": status}
+
+    if length >= FLUSH_SIZE:
+        threading.Thread(target=flush, daemon=True).start()
+    else:
+        _arm_timer()
+    return {"queued": len(fresh), "duplicates": duplicates}
+
+
+def _arm_timer():
+    global _timer_armed
+    with _timer_lock:
+        if _timer_armed:
+            return
+        _timer_armed = True
+
+    def run():
+        global _timer_armed
+        time.sleep(FLUSH_AFTER)
+        with _timer_lock:
+            _timer_armed = False
+        flush()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+# ── Flush ────────────────────────────────────────────────────────────
+
+def _holding(lease: str, deadline: float | None) -> bool:
+    """True while the flush may send again: before ``deadline``, and with the
+    lease still ours (renewed)."""
+    return (not deadline or time.time() < deadline) and kv_renew_if(LEASE_KEY, lease, LEASE_TTL)
+
+
+def _send_individually(batch: list, token: str, out: dict, lease: str, deadline: float | None) -> bool:
+    """After a batch was rejected, send its events one by one so a single bad
+    event can't hold up the rest, popping each settled (sent or moved to the
+    dead list) event off the outbox. False if it stopped early: a transient
+    failure, the deadline, or a lost lease."""
+    for event in batch:
+        if not _holding(lease, deadline):
+            return False
+        status, text = _post([event], token)
+        if _ok(status):
+            out["eventsSent"] += 1
+        elif _rejected(status):
+            kv_list_push(DEAD_KEY, {"event": event, "status": status, "body": text})
+            out["eventsRejected"] += 1
+        else:
+            out["failures"] += 1
+            out["lastError"] = f"HTTP {status}: {text}"
+            return False
+        if not kv_lpop_if(OUTBOX_KEY, event):
+            return False  # the outbox head moved: another flusher took over
+    return True
+
+
+def flush(deadline: float | None = None) -> dict:
+    """Send queued events in envelopes of up to MAX_BATCH until the outbox
+    is empty, a send fails transiently, or ``deadline`` passes. Returns this
+    run's metrics ({"busy": True} if another flusher holds the lease)."""
+    lease = uuid.uuid4().hex
+    if not kv_set_nx(LEASE_KEY, lease, LEASE_TTL):
+        return {"busy": True}
+
+    out = {"envelopes": 0, "eventsSent": 0, "eventsRejected": 0, "failures": 0, "lastError": ""}
+    refreshed = False
+    try:
+        token = get_token()
+        while _holding(lease, deadline):
+            batch = kv_lrange(OUTBOX_KEY, 0, MAX_BATCH - 1)
+            if not batch:
+                break
+            sent_at = time.time()
+            status, text = _post(batch, token)
+            out["lastLatencyMs"] = round((time.time() - sent_at) * 1000)
+            out["lastBatchSize"] = len(batch)
+            if status == 401 and not refreshed:
+                token, refreshed = get_token(), True
+                continue
+            if _ok(status):
+                out["envelopes"] += 1
+                out["eventsSent"] += len(batch)
+                if not kv_ltrim_if(OUTBOX_KEY, batch):
+                    break  # the outbox head moved: another flusher took over
+                continue
+            if _rejected(status):
+                if len(batch) == 1:
+                    kv_list_push(DEAD_KEY, {"event": batch[0], "status": status, "body": text})
+                    out["eventsRejected"] += 1
+                    if not kv_lpop_if(OUTBOX_KEY, batch[0]):
+                        break
+                elif not _send_individually(batch, token, out, lease, deadline):
+                    break
+                continue
+            out["failures"] += 1
+            out["lastError"] = f"HTTP {status}: {text}"
+            break
+    except Exception as e:
+        out["failures"] += 1
+        out["lastError"] = str(e)
+    finally:
+        kv_delete_if(LEASE_KEY, lease)
+
+    out["pending"] = len(kv_lrange(OUTBOX_KEY) or [])
+    _record_metrics(out)
+    return out
+
+
+def _record_metrics(run: dict):
+    metrics = get_metrics()
+    for k in ("envelopes", "eventsSent", "eventsRejected", "failures"):
+        metrics[k] = metrics.get(k, 0) + run.get(k, 0)
+    metrics["lastFlushAt"] = time.time()
+    metrics["pending"] = run.get("pending", 0)
+    for k in ("lastBatchSize", "lastLatencyMs"):
+        if k in run:
+            metrics[k] = run[k]
+    if run.get("lastError"):
+        metrics["lastError"] = run["lastError"]
+    kv_set(METRICS_KEY, metrics)
+
+
+def get_metrics() -> dict:
+    """Cumulative outbox metrics."""
+    metrics = kv_get(METRICS_KEY)
+    return metrics if isinstance(metrics, dict) else {}
@@ -0,0 +1,89 @@
+"""
+Short-lived cache of merged /api/course-content responses.
+
+The merged response (student lesson plan + tree + progress + OneRoster
+results) is memoized per (course, student) for CACHE_TTL seconds:
+
+  - KV ``course_content:{courseId}:{userId}`` → { v, cachedAt, z } where
+    ``z`` is the zlib-compressed, base64-encoded JSON response
+  - an in-process dict, so repeat loads on a warm instance skip KV
+
+Writers (/api/submit-result, /api/mark-content-complete,
+/api/powerpath-complete, and every PowerPath finalize / reset path:
+quiz-session, finalize-lesson, pp-finalize, pp-complete-lesson,
+pp-set-score, pp-reset*, pp-answer-*) don't always know the course, so invalidation is
+per student: invalidate_student() bumps ``course_content_ver:{userId}`` and
+every cached entry carrying an older version is ignored.
+"""
+
+import base64
+import json
+import threading
+import time
+import zlib
+
+from api._kv import kv_get, kv_incr, kv_set
+
+CACHE_TTL = 60
+VERSION_TTL = 24 * 3600
+
+_mem = {}   # (course_id, user_id) → {"v", "cachedAt", "data"}
+_lock = threading.Lock()
+
+
+def _entry_key(course_id: str, user_id: str) -> str:
+    return f"course_content:{course_id}:{user_id}"
+
+
+def _version_key(user_id: str) -> str:
+    return f"course_content_ver:{user_id}"
+
+
+def _version(user_id: str) -> int:
+    v = kv_get(_version_key(user_id))
+    try:
+        return int(v or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_cached(course_id: str, user_id: str) -> dict | None:
+    """Cached course-content response, or None if missing, expired or invalidated."""
+    version = _version(user_id)
+    now = time.time()
+    with _lock:
+        entry = _mem.get((course_id, user_id))
+    if entry and entry["v"] == version and now - entry["cachedAt"] < CACHE_TTL:
+        return entry["data"]
+
+    stored = kv_get(_entry_key(course_id, user_id))
+    if not isinstance(stored, dict) or stored.get("v") != version or not stored.get("z"):
+        return None
+    if now - (stored.get("cachedAt") or 0) >= CACHE_TTL:
+        return None
+    try:
+        data = json.loads(zlib.decompress(base64.b64decode(stored["z"])))
+    except Exception:
+        return None
+    with _lock:
+        _mem[(course_id, user_id)] = {"v": version, "cachedAt": stored["cachedAt"], "data": data}
+    return data
+
+
+def put_cached(course_id: str, user_id: str, data: dict):
+    version = _version(user_id)
+    now = time.time()
+    with _lock:
+        _mem[(course_id, user_id)] = {"v": version, "cachedAt": now, "data": data}
+    blob = base64.b64encode(zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 6)).decode()
+    kv_set(_entry_key(course_id, user_id), {"v": version, "cachedAt": now, "z": blob}, ttl=CACHE_TTL)
+
+
+def invalidate_student(user_id: str):
+    """Drop every cached course-content response for a student."""
+    if not user_id:
+        return
+    kv_incr(_version_key(user_id), ttl=VERSION_TTL)
+    with _lock:
+        for k in [k for k in _mem if k[1] == user_id]:
+            _mem.pop(k, None)
@@ -0,0 +1,318 @@
+"""
+PowerPath lesson-plan tree fetching and traversal shared across endpoints.
+
+The tree is ``lessonPlan → subComponents (units) → subComponents (lessons)
+→ componentResources``. Units without lessons carry their resources (e.g.
+unit tests) directly. Walkers should query the flattened CourseIndex
+(index_for(tree)) rather than descend the tree themselves.
+"""
+
+import threading
+from collections import OrderedDict
+
+import requests
+
+from api._helpers import API_BASE, api_headers
+from api._kv import kv_get
+
+# Staging/service account (pehal64861@aixind.com)
+SERVICE_USER_ID = "8ea2b8e1-1b04-4cab-b608-9ab524c059c2"
+
+
+# ── Fetching ─────────────────────────────────────────────────────────
+
+def try_tree(url: str, headers: dict) -> dict | None:
+    """Try to fetch a tree from a URL. Returns parsed JSON or None."""
+    try:
+        resp = requests.get(url, headers=headers, timeout=30)
+        if resp.status_code == 401:
+            headers = api_headers()
+            resp = requests.get(url, headers=headers, timeout=30)
+        if resp.status_code == 200:
+            data = resp.json()
+            if data:
+                return data
+    except Exception:
+        pass
+    return None
+
+
+def fetch_tree(course_id: str) -> dict | None:
+    """Fetch a course tree via the generic endpoint, then the service account's
+    lesson plan, trying the cached PP100 alias as well. Never enrolls or syncs."""
+    headers = api_headers()
+    ids_to_try = [course_id]
+    cached_pp100 = kv_get(f"pp100_course_id:{course_id}")
+    if cached_pp100 and cached_pp100 != course_id:
+        ids_to_try.append(cached_pp100)
+
+    for cid in ids_to_try:
+        tree = try_tree(f"{API_BASE}/powerpath/lessonPlans/tree/{cid}", headers)
+        if tree:
+            return tree
+    for cid in ids_to_try:
+        tree = try_tree(f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}", headers)
+        if tree:
+            return tree
+    return None
+
+
+# ── Traversal ────────────────────────────────────────────────────────
+
+def tree_units(tree) -> list:
+    """Return the unit list from a tree payload (handles nested lessonPlan wrappers)."""
+    inner = tree.get("lessonPlan", tree) if isinstance(tree, dict) else tree
+    if isinstance(inner, dict) and inner.get("lessonPlan"):
+        inner = inner["lessonPlan"]
+    if isinstance(inner, list):
+        return inner
+    return inner.get("subComponents", []) if isinstance(inner, dict) else []
+
+
+def parse_resource_meta(res_wrapper: dict) -> tuple[str, str, str, str]:
+    """Return (url, res_id, title, rtype) from a componentResource wrapper."""
+    res = res_wrapper.get("resource", res_wrapper) if isinstance(res_wrapper, dict) else res_wrapper
+    if not isinstance(res, dict):
+        return "", "", "", ""
+    meta = res.get("metadata") or {}
+    rurl = meta.get("url", "") or res.get("url", "") or meta.get("href", "") or res.get("href", "")
+    res_id = res.get("id", "") or res.get("sourcedId", "") or ""
+    res_title = res.get("title", "") or ""
+    rtype = (meta.get("type", "") or res.get("type", "")).lower()
+    return rurl, res_id, res_title, rtype
+
+
+def _is_article(rurl: str) -> bool:
+    return bool(rurl) and "stimuli" in rurl.lower()
+
+
+def _resource_kind(rurl: str, rtype: str) -> str:
+    if rtype == "video":
+        return "video"
+    if _is_article(rurl):
+        return "article"
+    return "assessment"
+
+
+# ── Flattened index ──────────────────────────────────────────────────
+
+class CourseIndex:
+    """Flattened, array-backed view of a lesson-plan tree.
+
+    ``units``, ``lessons`` and ``resources`` are flat lists in tree order;
+    records point at their parents by offset (``unit``, ``lesson``) and at
+    their children by ``[start, end)`` ranges into the next list down.
+    Unit-level resources (e.g. unit tests) follow that unit's lesson
+    resources and have ``lesson == -1``.
+
+      unit:     { id, title, sortOrder, lessons: (start, end), resources: (start, end) }
+      lesson:   { id, title, sortOrder, unit, resources: (start, end) }
+      resource: { crId, id, title, url, type, kind, unit, lesson }
+
+    ``kind`` is "video", "article" or "assessment". Lookups by resource ID,
+    CR ID, lesson ID, type and kind are dict hits. Build with index_for().
+    """
+
+    def __init__(self, tree):
+        inner = tree.get("lessonPlan", tree) if isinstance(tree, dict) else tree
+        if isinstance(inner, dict) and inner.get("lessonPlan"):
+            inner = inner["lessonPlan"]
+        self.title = inner.get("title", "") if isinstance(inner, dict) else ""
+        self.units = []
+        self.lessons = []
+        self.resources = []
+        self.by_resource_id = {}
+        self.by_cr_id = {}
+        self.by_lesson_id = {}
+        self.by_type = {}
+        self.by_kind = {}
+
+        for unit in tree_units(tree):
+            if not isinstance(unit, dict):
+                continue
+            ui = len(self.units)
+            lesson_start = len(self.lessons)
+            for lesson in unit.get("subComponents", []):
+                if not isinstance(lesson, dict):
+                    continue
+                li = len(self.lessons)
+                lesson_id = lesson.get("sourcedId") or lesson.get("id") or ""
+                start = len(self.resources)
+                self._add_resources(lesson.get("componentResources", []), ui, li)
+                self.lessons.append({
+                    "id": lesson_id,
+                    "title": lesson.get("title", ""),
+                    "sortOrder": lesson.get("sortOrder", ""),
+                    "unit": ui,
+                    "resources": (start, len(self.resources)),
+                })
+                if lesson_id:
+                    self.by_lesson_id.setdefault(lesson_id, li)
+            unit_res_start = len(self.resources)
+            self._add_resources(unit.get("componentResources", []), ui, -1)
+            self.units.append({
+                "id": unit.get("sourcedId") or unit.get("id") or "",
+                "title": unit.get("title", ""),
+                "sortOrder": unit.get("sortOrder", ""),
+                "lessons": (lesson_start, len(self.lessons)),
+                "resources": (unit_res_start, len(self.resources)),
+            })
+
+    def _add_resources(self, wrappers, ui, li):
+        for rw in wrappers or []:
+            if not isinstance(rw, dict):
+                continue
+            res = rw.get("resource", rw)
+            if not isinstance(res, dict):
+                continue
+            rurl, res_id, res_title, rtype = parse_resource_meta(rw)
+            ri = len(self.resources)
+            cr_id = rw.get("sourcedId", "") if "resource" in rw else ""
+            kind = _resource_kind(rurl, rtype)
+            self.resources.append({
+                "crId": cr_id,
+                "id": res_id,
+                "title": res_title,
+                "url": rurl,
+                "type": rtype,
+                "kind": kind,
+                "unit": ui,
+                "lesson": li,
+            })
+            if res_id:
+                self.by_resource_id.setdefault(res_id, ri)
+            if cr_id:
+                self.by_cr_id.setdefault(cr_id, ri)
+            self.by_type.setdefault(rtype, []).append(ri)
+            self.by_kind.setdefault(kind, []).append(ri)
+
+    # ── Queries ──
+
+    def resource(self, res_id: str) -> dict | None:
+        ri = self.by_resource_id.get(res_id)
+        return self.resources[ri] if ri is not None else None
+
+    def resource_by_cr(self, cr_id: str) -> dict | None:
+        ri = self.by_cr_id.get(cr_id)
+        return self.resources[ri] if ri is not None else None
+
+    def lesson(self, lesson_id: str) -> dict | None:
+        li = self.by_lesson_id.get(lesson_id)
+        return self.lessons[li] if li is not None else None
+
+    def of_type(self, rtype: str) -> list[dict]:
+        return [self.resources[ri] for ri in self.by_type.get(rtype, [])]
+
+    def of_kind(self, kind: str) -> list[dict]:
+        return [self.resources[ri] for ri in self.by_kind.get(kind, [])]
+
+    def unit_lessons(self, ui: int) -> list[dict]:
+        start, end = self.units[ui]["lessons"]
+        return self.lessons[start:end]
+
+    def unit_resources(self, ui: int) -> list[dict]:
+        """Resources attached directly to the unit (not to one of its lessons)."""
+        start, end = self.units[ui]["resources"]
+        return self.resources[start:end]
+
+    def lesson_resources(self, li: int) -> list[dict]:
+        start, end = self.lessons[li]["resources"]
+        return self.resources[start:end]
+
+    def parent_lesson(self, res: dict) -> dict | None:
+        return self.lessons[res["lesson"]] if res["lesson"] >= 0 else None
+
+    def parent_unit(self, rec: dict) -> dict:
+        return self.units[rec["unit"]]
+
+    def lesson_groups(self):
+        """Yield (unit_title, lesson_title, resources) for every lesson.
+
+        A unit with no lessons but its own resources is yielded as a single
+        lesson titled after the unit.
+        """
+        for ui, unit in enumerate(self.units):
+            lessons = self.unit_lessons(ui)
+            unit_resources = self.unit_resources(ui)
+            if not lessons and unit_resources:
+                yield unit["title"], unit["title"], unit_resources
+            for lesson in lessons:
+                start, end = lesson["resources"]
+                yield unit["title"], lesson["title"], self.resources[start:end]
+
+
+_index_memo = OrderedDict()  # id(tree) → (tree, CourseIndex)
+_index_lock = threading.Lock()
+INDEX_MEMO_SIZE = 32
+
+
+def index_for(tree) -> CourseIndex:
+    """CourseIndex for a tree, built once per tree object.
+
+    Trees from api/_tree_cache are shared per course version, so in practice
+    each version is indexed once per process.
+    """
+    key = id(tree)
+    with _index_lock:
+        hit = _index_memo.get(key)
+        if hit and hit[0] is tree:
+            _index_memo.move_to_end(key)
+            return hit[1]
+    index = CourseIndex(tree)
+    with _index_lock:
+        _index_memo[key] = (tree, index)
+        while len(_index_memo) > INDEX_MEMO_SIZE:
+            _index_memo.popitem(last=False)
+    return index
+
+
+def extract_assessments(tree: dict) -> list[dict]:
+    """Extract all assessment resources from a PowerPath tree.
+
+    Also captures video and article/stimulus URLs per lesson and attaches
+    them to each test object as ``videoUrl`` and ``articleUrl`` so that
+    downstream consumers (e.g. relevance analysis) can pair questions with
+    their lesson's learning content.
+    """
+    tests = []
+    seen = set()
+    for unit_title, lesson_title, resources in index_for(tree).lesson_groups():
+        video_url = next((r["url"] for r in resources if r["kind"] == "video" and r["url"]), "")
+        article_url = next((r["url"] for r in resources if r["kind"] == "article"), "")
+
+        for r in resources:
+            if r["kind"] != "assessment" or not (r["id"] or r["url"]):
+                continue
+            if r["id"] in seen:
+                continue
+            seen.add(r["id"])
+            tests.append({
+                "id": r["id"],
+                "title": r["title"] or lesson_title,
+                "url": r["url"],
+                "unitTitle": unit_title,
+                "lessonTitle": lesson_title,
+                "lessonType": r["type"] or "assessment",
+                "videoUrl": video_url,
+                "articleUrl": article_url,
+            })
+    return tests
+
+
+def extract_articles(tree: dict) -> list[dict]:
+    """Extract every article/stimulus resource from a PowerPath tree."""
+    articles = []
+    seen = set()
+    for unit_title, lesson_title, resources in index_for(tree).lesson_groups():
+        for r in resources:
+            if r["kind"] != "article" or r["url"] in seen:
+                continue
+            seen.add(r["url"])
+            articles.append({
+                "id": r["id"],
+                "title": r["title"] or lesson_title,
+                "url": r["url"],
+                "unitTitle": unit_title,
+                "lessonTitle": lesson_title,
+            })
+    return articles
@@ -0,0 +1,185 @@
+"""
+Background warming of a course's QTI items, stimuli and rendered articles.
+
+Walks the course tree (same traversal as /api/find-course-tests), then
+resolves every assessment through a caching QtiFetcher and renders every
+article through load_article_html, so both land in KV before a student
+opens the lesson.
+
+Progress lives in KV under ``course_warm:{courseId}``:
+  { status: warming|partial|done|error, courseId, total, warmed, failed, done: [key, ...], startedAt, updatedAt }
+``done`` holds the keys of finished resources, so a warm that timed out or
+crashed resumes where it stopped instead of starting over.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api._article import load_article_html
+from api._course_tree import extract_articles, extract_assessments
+from api._kv import kv_get, kv_list_get, kv_list_push, kv_set
+from api._qti import QTI_CACHE_TTL, QtiFetcher, find_test, is_test, qti_headers, resolve_test
+from api._tree_cache import get_tree
+
+WARM_CONCURRENCY = 4      # resources warmed at once
+FETCH_WORKERS = 8         # QTI GETs in flight across those resources
+SAVE_EVERY = 10           # persist progress after this many completions
+STALE_AFTER = 15 * 60     # a "warming" record older than this is treated as dead
+
+WARM_COURSES_KEY = "warm_courses"
+
+
+def progress_key(course_id: str) -> str:
+    return f"course_warm:{course_id}"
+
+
+def register_course(course_id: str):
+    """Add a course to the set re-warmed by the scheduled run."""
+    if course_id and course_id not in kv_list_get(WARM_COURSES_KEY):
+        kv_list_push(WARM_COURSES_KEY, course_id)
+
+
+# ── Work items ───────────────────────────────────────────────────────
+
+def _work_items(tree) -> list[tuple[str, dict]]:
+    """(key, resource) pairs for every assessment and article in the tree."""
+    items = []
+    for t in extract_assessments(tree):
+        if t.get("id"):
+            items.append((f"test:{t['id']}", t))
+    for a in extract_articles(tree):
+        items.append((f"article:{a['id'] or a['url']}", a))
+    return items
+
+
+def _warm_test(test: dict, fetcher: QtiFetcher) -> bool:
+    """Resolve one assessment so its test, items and stimuli are cached."""
+    qti_id, data = find_test(test["id"], fetcher)
+    if not data and test.get("url"):
+        data, st = fetcher.get(test["url"])
+    if not data:
+        return False
+    if is_test(data):
+        resolve_test(data.get("qti-assessment-test", data), fetcher)
+    return True
+
+
+def _warm_article(article: dict) -> bool:
+    html_out, status = load_article_html(article.get("url", ""), article.get("id", ""))
+    return bool(html_out)
+
+
+def _warm_one(key: str, resource: dict, fetcher: QtiFetcher) -> bool:
+    if key.startswith("test:"):
+        return _warm_test(resource, fetcher)
+    return _warm_article(resource)
+
+
+# ── Runner ───────────────────────────────────────────────────────────
+
+def is_running(course_id: str) -> bool:
+    state = kv_get(progress_key(course_id))
+    return (
+        isinstance(state, dict)
+        and state.get("status") == "warming"
+        and time.time() - (state.get("updatedAt") or 0) < STALE_AFTER
+    )
+
+
+def warm_course(course_id: str, restart: bool = False, deadline: float | None = None) -> dict:
+    """Warm one course, resuming from saved progress unless ``restart``.
+
+    Stops early with status "partial" (the next run resumes) once
+    ``deadline`` (a time.time() value) passes. Returns the final state.
+    """
+    key = progress_key(course_id)
+    state = None if restart else kv_get(key)
+    done = set(state.get("done") or []) if isinstance(state, dict) and state.get("status") != "done" else set()
+
+    now = time.time()
+    state = {
+        "status": "warming",
+        "courseId": course_id,
+        "total": 0,
+        "warmed": len(done),
+        "failed": 0,
+        "done": sorted(done),
+        "startedAt": now,
+        "updatedAt": now,
+    }
+    kv_set(key, state)
+
+    try:
+        tree = get_tree(course_id)
+        if not tree:
+            state.update({"status": "error", "error": "Could not fetch course tree", "updatedAt": time.time()})
+            kv_set(key, state)
+            return state
+
+        items = _work_items(tree)
+        pending = [(k, r) for k, r in items if k not in done]
+        state["total"] = len(items)
+        kv_set(key, state)
+
+        # Any cached copy will do here; student reads revalidate stale ones
+        fetcher = QtiFetcher(qti_headers(), max_workers=FETCH_WORKERS, max_age=QTI_CACHE_TTL)
+        since_save = 0
+        timed_out = False
+        try:
+            with ThreadPoolExecutor(max_workers=WARM_CONCURRENCY) as pool:
+                futures = {}
+                it = iter(pending)
+                # Keep at most WARM_CONCURRENCY resources queued so a deadline stops promptly
+                for k, r in it:
+                    futures[pool.submit(_warm_one, k, r, fetcher)] = k
+                    if len(futures) >= WARM_CONCURRENCY:
+                        break
+                while futures:
+                    f = next(as_completed(futures))
+                    k = futures.pop(f)
+                    try:
+                        ok = f.result()
+                    except Exception:
+                        ok = False
+                    if ok:
+                        done.add(k)
+                        state["warmed"] = len(done)
+                    else:
+                        state["failed"] += 1
+                    since_save += 1
+                    if since_save >= SAVE_EVERY:
+                        since_save = 0
+                        state.update({"done": sorted(done), "updatedAt": time.time()})
+                        kv_set(key, state)
+                    if deadline and time.time() > deadline:
+                        timed_out = True
+                        continue
+                    nxt = next(it, None)
+                    if nxt:
+                        futures[pool.submit(_warm_one, nxt[0], nxt[1], fetcher)] = nxt[0]
+        finally:
+            fetcher.close()
+
+        state.update({
+            "status": "partial" if timed_out else "done",
+            "done": sorted(done),
+            "updatedAt": time.time(),
+        })
+        if not timed_out:
+            state["completedAt"] = state["updatedAt"]
+        kv_set(key, state)
+        return state
+
+    except Exception as e:
+        state.update({"status": "error", "error": str(e), "done": sorted(done), "updatedAt": time.time()})
+        kv_set(key, state)
+        return state
+
+
+def start_warm(course_id: str, restart: bool = False) -> bool:
+    """Warm a course in a background thread. Returns False if one is already running."""
+    if not course_id or (not restart and is_running(course_id)):
+        return False
+    threading.Thread(target=warm_course, args=(course_id, restart), daemon=True).start()
+    return True
@@ -0,0 +1,179 @@
+"""
+Student dashboard sections, shared by /api/dashboard and /api/lesson-count.
+
+Each section is a function of (Upstream, args) → JSON-able data. Upstream
+(api/_helpers.py) holds one access token for the whole request and
+memoizes GETs, so calls shared between sections go upstream once. The xp
+section reads the materialized ledger (api/_xp_ledger.py).
+
+Sections with a TTL are cached in KV under
+``dashboard:{section}:{userId}:{argsHash}`` → { at, data }; writers that
+change a section call invalidate_sections().
+"""
+
+import hashlib
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from api._ali_meta import get_ali_meta
+from api._analytics_cache import cached_facts
+from api._helpers import Upstream
+from api._kv import kv_delete, kv_get, kv_set
+from api._xp_ledger import read_xp
+
+GRADEBOOK_PATH = "/ims/oneroster/gradebook/v1p2"
+
+
+# ── Lesson count ─────────────────────────────────────────────────────
+
+def _results_in_range(up: Upstream, user_id: str, start_date: str, end_date: str) -> list:
+    """Student's assessment results scored within [start_date, end_date], newest first."""
+    all_results = []
+    offset = 0
+    while True:
+        data, status = up.get(f"{GRADEBOOK_PATH}/assessmentResults", {
+            "filter": f"student.sourcedId='{user_id}'",
+            "limit": 100,
+            "offset": offset,
+            "sort": "dateLastModified",
+            "orderBy": "desc",
+        })
+        data = data or {}
+        results = data.get("assessmentResults", [])
+        if not results:
+            for v in data.values():
+                if isinstance(v, list):
+                    results = v
+                    break
+
+        # Filter by date range
+        any_in_range = False
+        for r in results:
+            sd = r.get("scoreDate", "")
+            if start_date and sd < start_date:
+                continue
+            if end_date and sd > end_date:
+                continue
+            any_in_range = True
+            all_results.append(r)
+
+        # Stop if we've gone past the date range or no more results
+        if len(results) < 100:
+            break
+        # If none in range and results are older, stop
+        if results and not any_in_range:
+            oldest = results[-1].get("scoreDate", "")
+            if oldest and start_date and oldest < start_date:
+                break
+        offset += 100
+    return all_results
+
+
+def lesson_count(up: Upstream, user_id: str, start_date: str = "", end_date: str = "") -> dict:
+    """Completed lessons (quizzes, FRQs, tests) per course in a date range."""
+    # Collect unique line item IDs per course (graded only)
+    li_ids_by_course = defaultdict(set)
+    for ar in _results_in_range(up, user_id, start_date, end_date):
+        if ar.get("scoreStatus") != "fully graded":
+            continue
+        meta = ar.get("metadata", {}) or {}
+        course = meta.get("courseSourcedId", "")
+        if not course:
+            continue
+        li = ar.get("assessmentLineItem", {}) or {}
+        li_id = li.get("sourcedId", "") if isinstance(li, dict) else ""
+        if li_id:
+            li_ids_by_course[course].add(li_id)
+
+    # Count lessons (not individual questions) from cached line item metadata
+    meta = get_ali_meta(set().union(*li_ids_by_course.values()), up)
+    courses = {
+        course_id: sum(1 for li_id in li_ids if meta.get(li_id, {}).get("kind") == "lesson")
+        for course_id, li_ids in li_ids_by_course.items()
+    }
+    return {"courses": courses}
+
+
+# ── Sections ─────────────────────────────────────────────────────────
+
+def _raw(up: Upstream, path: str, params: dict | None = None):
+    data, status = up.get(path, params)
+    if not data:
+        raise RuntimeError(f"HTTP {status}")
+    return data
+
+
+def _analytics(up: Upstream, args: dict):
+    params = {k: args[k] for k in ("email", "studentId", "startDate", "endDate", "timezone") if args.get(k)}
+    if "email" not in params and "studentId" not in params:
+        raise ValueError("Provide 'email' or 'studentId'")
+    data, status = cached_facts("/edubridge/analytics/activity", params, "student",
+                                [params.get("email", ""), params.get("studentId", "")], fetch=up.get)
+    if not data:
+        raise RuntimeError(f"HTTP {status}")
+    return data
+
+
+# name → (builder, KV TTL in seconds or 0 for uncached, args that key the cache)
+SECTIONS = {
+    "xp": (lambda up, a: read_xp(a["userId"], up), 0, ()),
+    "enrollments": (lambda up, a: _raw(up, f"/edubridge/enrollments/user/{a['userId']}"), 120, ()),
+    "timeSaved": (lambda up, a: _raw(up, f"/edubridge/time-saved/user/{a['userId']}"), 900, ()),
+    "goals": (lambda up, a: {"goals": kv_get(f"goals:{a['userId']}") or {}}, 0, ()),
+    "lessonCount": (
+        lambda up, a: lesson_count(up, a["userId"], a.get("startDate", ""), a.get("endDate", "")),
+        300, ("startDate", "endDate"),
+    ),
+    # Day-bucketed in api/_analytics_cache.py
+    "analytics": (_analytics, 0, ()),
+}
+DEFAULT_SECTIONS = ("xp", "enrollments", "timeSaved", "goals", "lessonCount", "analytics")
+
+
+def _cache_key(name: str, args: dict, keyed_by: tuple) -> str:
+    digest = hashlib.sha1(json.dumps([args.get(k, "") for k in keyed_by]).encode()).hexdigest()[:16]
+    return f"dashboard:{name}:{args['userId']}:{digest}"
+
+
+def invalidate_sections(user_id: str, *names: str):
+    """Drop a student's cached copies of sections that aren't keyed by extra args."""
+    for name in names:
+        build, ttl, keyed_by = SECTIONS[name]
+        if ttl and not keyed_by:
+            kv_delete(_cache_key(name, {"userId": user_id}, keyed_by))
+
+
+def _run_section(name: str, up: Upstream, args: dict, fresh: bool) -> dict:
+    build, ttl, keyed_by = SECTIONS[name]
+    started = time.time()
+    key = _cache_key(name, args, keyed_by) if ttl else ""
+    if key and not fresh:
+        cached = kv_get(key)
+        if isinstance(cached, dict) and "data" in cached:
+            return {"data": cached["data"], "meta": {"cached": True, "age": round(started - cached.get("at", started))}}
+    try:
+        data = build(up, args)
+    except Exception as e:
+        return {"error": str(e), "meta": {"cached": False, "ms": round((time.time() - started) * 1000)}}
+    if key:
+        kv_set(key, {"at": time.time(), "data": data}, ttl=ttl)
+    return {"data": data, "meta": {"cached": False, "ms": round((time.time() - started) * 1000)}}
+
+
+def build_dashboard(args: dict, sections=DEFAULT_SECTIONS, fresh: bool = False) -> dict:
+    """Run the requested sections concurrently. A failing section is reported
+    under ``errors`` and leaves its entry in ``sections`` null."""
+    names = [s for s in sections if s in SECTIONS]
+    up = Upstream()
+    with ThreadPoolExecutor(max_workers=max(len(names), 1)) as pool:
+        futures = {name: pool.submit(_run_section, name, up, args, fresh) for name in names}
+    doc = {"userId": args["userId"], "sections": {}, "errors": {}, "meta": {}}
+    for name, f in futures.items():
+        out = f.result()
+        doc["sections"][name] = out.get("data")
+        doc["meta"][name] = out["meta"]
+        if "error" in out:
+            doc["errors"][name] = out["error"]
+    return doc
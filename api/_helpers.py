@@ -9,6 +9,8 @@ Docs: https://docs.timeback.com/beta/api-reference/overview
 
 import json
 import os
+import threading
+from concurrent.futures import Future
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
@@ -144,6 +146,52 @@ def post_resource(path: str, payload: dict) -> tuple[dict | None, int]:
         return None, resp.status_code
 
 
+# ---------------------------------------------------------------------------
+# Per-request client (one token, deduplicated GETs)
+# ---------------------------------------------------------------------------
+class Upstream:
+    """Timeback API client for one request: one token, memoized GETs.
+
+    Concurrent callers asking for the same (path, params) share a single
+    in-flight request.
+    """
+
+    def __init__(self):
+        self._token = None
+        self._token_lock = threading.Lock()
+        self._calls = {}
+        self._calls_lock = threading.Lock()
+
+    def _headers(self, refresh: bool = False) -> dict:
+        with self._token_lock:
+            if refresh or not self._token:
+                self._token = get_token()
+            return {"Authorization": f"Bearer {self._token}", "Content-Type": "application/json"}
+
+    def _get(self, path: str, params: dict | None, timeout: int):
+        resp = requests.get(f"{API_BASE}{path}", headers=self._headers(), params=params, timeout=timeout)
+        if resp.status_code == 401:
+            resp = requests.get(f"{API_BASE}{path}", headers=self._headers(refresh=True), params=params, timeout=timeout)
+        if resp.status_code == 200:
+            return resp.json(), 200
+        return None, resp.status_code
+
+    def get(self, path: str, params: dict | None = None, timeout: int = 30) -> tuple[dict | None, int]:
+        """GET a path. Returns (data, status_code); identical calls are made once."""
+        key = (path, json.dumps(params or {}, sort_keys=True))
+        with self._calls_lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+        if owner:
+            try:
+                future.set_result(self._get(path, params, timeout))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
 # ---------------------------------------------------------------------------
 # User parser
 # ---------------------------------------------------------------------------
@@ -44,15 +44,21 @@ def kv_get(key: str):
     return None
 
 
-def kv_set(key: str, value) -> bool:
-    """Write a key to KV. Value is JSON-serialised. Returns True on success."""
+def kv_set(key: str, value, ttl: int | None = None) -> bool:
+    """Write a key to KV. Value is JSON-serialised. Returns True on success.
+
+    When ``ttl`` (seconds) is given the key expires after that long.
+    """
     if not KV_URL or not KV_TOKEN:
         return False
+    cmd = ["SET", key, json.dumps(value)]
+    if ttl:
+        cmd += ["EX", int(ttl)]
     try:
         resp = requests.post(
             KV_URL,
             headers={**_headers(), "Content-Type": "application/json"},
-            json=["SET", key, json.dumps(value)],
+            json=cmd,
             timeout=10,
         )
         return resp.status_code == 200
@@ -76,6 +82,51 @@ def kv_delete(key: str) -> bool:
         return False
 
 
+def kv_mget(keys: list) -> list:
+    """Read many keys in one round-trip. Returns parsed values (None if missing), in order."""
+    if not keys or not KV_URL or not KV_TOKEN:
+        return [None] * len(keys)
+    try:
+        resp = requests.post(
+            KV_URL,
+            headers={**_headers(), "Content-Type": "application/json"},
+            json=["MGET", *keys],
+            timeout=10,
+        )
+        values = resp.json().get("result") or []
+    except Exception:
+        return [None] * len(keys)
+    out = []
+    for raw in values:
+        try:
+            out.append(json.loads(raw) if raw is not None else None)
+        except (json.JSONDecodeError, TypeError):
+            out.append(raw)
+    return out + [None] * (len(keys) - len(out))
+
+
+def kv_set_many(items: dict, ttl: int | None = None) -> bool:
+    """Write many keys in one pipelined request. Values are JSON-serialised."""
+    if not items or not KV_URL or not KV_TOKEN:
+        return False
+    commands = []
+    for key, value in items.items():
+        cmd = ["SET", key, json.dumps(value)]
+        if ttl:
+            cmd += ["EX", int(ttl)]
+        commands.append(cmd)
+    try:
+        resp = requests.post(
+            f"{KV_URL}/pipeline",
+            headers={**_headers(), "Content-Type": "application/json"},
+            json=commands,
+            timeout=15,
+        )
+        return resp.status_code == 200
+    except Exception:
+        return False
+
+
 # ---------------------------------------------------------------------------
 # Convenience: list-like operations (stored as JSON arrays)
 # ---------------------------------------------------------------------------
@@ -103,3 +154,204 @@ def kv_list_remove(key: str, item) -> bool:
     except ValueError:
         return True  # already absent
     return kv_set(key, lst)
+
+
+# ---------------------------------------------------------------------------
+# Native Redis lists and locks (atomic; for queues shared across instances)
+# ---------------------------------------------------------------------------
+
+def _command(cmd: list, timeout: int = 10):
+    """Run one Redis command. Returns the raw ``result``, or None on failure."""
+    if not KV_URL or not KV_TOKEN:
+        return None
+    try:
+        resp = requests.post(
+            KV_URL,
+            headers={**_headers(), "Content-Type": "application/json"},
+            json=cmd,
+            timeout=timeout,
+        )
+        if resp.status_code != 200:
+            return None
+        return resp.json().get("result")
+    except Exception:
+        return None
+
+
+def kv_rpush(key: str, *items, ttl: int | None = None) -> int:
+    """Append JSON-serialised items to a native Redis list. Returns the new
+    length, or 0 on failure. ``ttl`` (seconds) refreshes the key's expiry."""
+    if not items or not KV_URL or not KV_TOKEN:
+        return 0
+    commands = [["RPUSH", key, *(json.dumps(item) for item in items)]]
+    if ttl:
+        commands.append(["EXPIRE", key, int(ttl)])
+    try:
+        resp = requests.post(
+            f"{KV_URL}/pipeline",
+            headers={**_headers(), "Content-Type": "application/json"},
+            json=commands,
+            timeout=10,
+        )
+        return int(resp.json()[0].get("result") or 0) if resp.status_code == 200 else 0
+    except Exception:
+        return 0
+
+
+def kv_lrange(key: str, start: int = 0, stop: int = -1) -> list | None:
+    """Items of a native Redis list (parsed JSON). None if KV is unavailable."""
+    raw = _command(["LRANGE", key, start, stop])
+    if raw is None:
+        return None
+    out = []
+    for item in raw:
+        try:
+            out.append(json.loads(item))
+        except (json.JSONDecodeError, TypeError):
+            out.append(item)
+    return out
+
+
+def kv_lpop(key: str) -> bool:
+    """Drop the head of a native Redis list."""
+    return _command(["LPOP", key]) is not None
+
+
+def kv_lpop_item(key: str):
+    """Pop and return the head of a native Redis list (parsed JSON), or None
+    if the list is empty or KV is unavailable."""
+    raw = _command(["LPOP", key])
+    if raw is None:
+        return None
+    try:
+        return json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return raw
+
+
+def kv_ltrim(key: str, start: int, stop: int = -1) -> bool:
+    """Keep only items start..stop of a native Redis list."""
+    return _command(["LTRIM", key, start, stop]) is not None
+
+
+def kv_set_nx(key: str, value, ttl: int) -> bool:
+    """Set a key only if it doesn't exist (a lease / lock). True if acquired."""
+    return _command(["SET", key, json.dumps(value), "NX", "EX", int(ttl)]) == "OK"
+
+
+def kv_sadd(key: str, *members) -> bool:
+    """Add JSON-serialised members to a native Redis set."""
+    if not members:
+        return True
+    return _command(["SADD", key, *(json.dumps(m) for m in members)]) is not None
+
+
+def kv_srem(key: str, *members) -> bool:
+    """Remove JSON-serialised members from a native Redis set."""
+    if not members:
+        return True
+    return _command(["SREM", key, *(json.dumps(m) for m in members)]) is not None
+
+
+def kv_smembers(key: str) -> list:
+    """Members of a native Redis set (parsed JSON); [] if empty or KV is unavailable."""
+    out = []
+    for raw in _command(["SMEMBERS", key]) or []:
+        try:
+            out.append(json.loads(raw))
+        except (json.JSONDecodeError, TypeError):
+            out.append(raw)
+    return out
+
+
+def kv_hset(key: str, field: str, value, ttl: int | None = None) -> bool:
+    """Set one field of a native Redis hash (JSON-serialised value), leaving
+    the other fields alone. ``ttl`` (seconds) refreshes the key's expiry."""
+    if not KV_URL or not KV_TOKEN:
+        return False
+    commands = [["HSET", key, field, json.dumps(value)]]
+    if ttl:
+        commands.append(["EXPIRE", key, int(ttl)])
+    try:
+        resp = requests.post(
+            f"{KV_URL}/pipeline",
+            headers={**_headers(), "Content-Type": "application/json"},
+            json=commands,
+            timeout=10,
+        )
+        return resp.status_code == 200 and "error" not in resp.json()[0]
+    except Exception:
+        return False
+
+
+def kv_hgetall(key: str) -> dict:
+    """All fields of a native Redis hash (parsed JSON values); {} if missing,
+    not a hash, or KV is unavailable."""
+    raw = _command(["HGETALL", key])
+    if isinstance(raw, dict):  # some REST clients return a map
+        raw = [x for pair in raw.items() for x in pair]
+    if not isinstance(raw, list):
+        return {}
+    out = {}
+    for field, value in zip(raw[::2], raw[1::2]):
+        try:
+            out[field] = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            out[field] = value
+    return out
+
+
+_DELETE_IF = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+_RENEW_IF = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('EXPIRE', KEYS[1], ARGV[2]) end return 0"
+_LPOP_IF = "if redis.call('LINDEX', KEYS[1], 0) == ARGV[1] then redis.call('LPOP', KEYS[1]) return 1 end return 0"
+_LTRIM_IF = (
+    "local head = redis.call('LRANGE', KEYS[1], 0, #ARGV - 1) "
+    "if #head ~= #ARGV then return 0 end "
+    "for i = 1, #ARGV do if head[i] ~= ARGV[i] then return 0 end end "
+    "redis.call('LTRIM', KEYS[1], #ARGV, -1) return 1"
+)
+
+
+def kv_delete_if(key: str, value) -> bool:
+    """Delete a key only if it still holds ``value`` (release a lease we own)."""
+    return _command(["EVAL", _DELETE_IF, 1, key, json.dumps(value)]) == 1
+
+
+def kv_renew_if(key: str, value, ttl: int) -> bool:
+    """Reset a key's expiry only if it still holds ``value``. False if the
+    lease was lost (expired, or taken over by another holder)."""
+    return _command(["EVAL", _RENEW_IF, 1, key, json.dumps(value), int(ttl)]) == 1
+
+
+def kv_lpop_if(key: str, item) -> bool:
+    """Drop the head of a native Redis list only if it is still ``item``.
+    False if the list changed under us (emptied, or a different head)."""
+    return _command(["EVAL", _LPOP_IF, 1, key, json.dumps(item)]) == 1
+
+
+def kv_ltrim_if(key: str, items: list) -> bool:
+    """Drop the first ``len(items)`` entries of a native Redis list only if
+    they are still exactly ``items``. False if the head changed under us."""
+    if not items:
+        return True
+    return _command(["EVAL", _LTRIM_IF, 1, key, *(json.dumps(item) for item in items)]) == 1
+
+
+def kv_incr(key: str, ttl: int | None = None) -> int:
+    """Atomically increment an integer key. Returns the new value, or 0 on
+    failure. ``ttl`` (seconds) refreshes the key's expiry."""
+    if not KV_URL or not KV_TOKEN:
+        return 0
+    commands = [["INCR", key]]
+    if ttl:
+        commands.append(["EXPIRE", key, int(ttl)])
+    try:
+        resp = requests.post(
+            f"{KV_URL}/pipeline",
+            headers={**_headers(), "Content-Type": "application/json"},
+            json=commands,
+            timeout=10,
+        )
+        return int(resp.json()[0].get("result") or 0) if resp.status_code == 200 else 0
+    except Exception:
+        return 0
@@ -0,0 +1,239 @@
+"""
+Course → PP100 course resolution index.
+
+PowerPath 100 ("PP100") copies of a course carry the quiz banks, but the
+link between a catalog course and its PP100 copy is only visible in titles
+and course codes. Instead of downloading the whole catalog on every lookup,
+/api/pp100-index builds this index offline and refreshes it incrementally
+from OneRoster ``dateLastModified``:
+
+  KV ``pp100_index`` → { builtAt, watermark, z }
+    z = zlib + base64 JSON of
+        { pp100:   { courseId: [token, ...] },
+          courses: { courseId: [title, courseCode] },   # non-PP100 catalog
+          aliases: { courseId: [pp100Id, ...] } }       # best match first
+
+Lookups (pp100_ids / best_pp100_id) read a copy held in process memory and
+are plain dict hits; the copy is reloaded from KV every RELOAD_SECONDS.
+"""
+
+import base64
+import json
+import re
+import threading
+import time
+import zlib
+
+from api._helpers import fetch_all_paginated, fetch_one
+from api._kv import kv_get, kv_set
+
+INDEX_KEY = "pp100_index"
+RELOAD_SECONDS = 5 * 60
+COURSES_PATH = "/ims/oneroster/rostering/v1p2/courses"
+
+STOP_WORDS = {"the", "and", "for", "with", "a", "an", "in", "of", "to"}
+# Tokens every PP100 / AP course shares; matching on them links everything
+GENERIC_TOKENS = {"pp100", "pp", "100", "ap", "course", "powerpath"}
+ABBREVIATIONS = {
+    "us": ["united", "states"],
+    "u.s.": ["united", "states"],
+    "u.s": ["united", "states"],
+    "usa": ["united", "states"],
+    "govt": ["government"],
+    "gov": ["government"],
+    "apush": ["united", "states", "history"],
+    "hist": ["history"],
+    "bio": ["biology"],
+    "chem": ["chemistry"],
+    "calc": ["calculus"],
+    "lit": ["literature"],
+    "lang": ["language"],
+    "econ": ["economics"],
+    "psych": ["psychology"],
+    "euro": ["european"],
+}
+
+_mem = {"index": None, "loadedAt": 0.0}
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+# ── Tokenizing and matching ──────────────────────────────────────────
+
+def tokenize(title: str, code: str = "") -> set[str]:
+    """Lower-cased title/code tokens with abbreviations expanded."""
+    tokens = set()
+    for word in re.split(r"[\s\-:/,()]+", f"{title} {code}".lower()):
+        word = word.strip()
+        if not word or word in STOP_WORDS:
+            continue
+        tokens.update(ABBREVIATIONS.get(word, (word,)))
+    return tokens - GENERIC_TOKENS
+
+
+def is_pp100(course_id: str, title: str) -> bool:
+    return "pp100" in (title or "").lower() or "pp100" in (course_id or "").lower()
+
+
+def match(tokens: set[str], pp100: dict, exclude: str = "") -> list[str]:
+    """PP100 course IDs sharing at least one token, best match first."""
+    scored = []
+    for cid, pp_tokens in pp100.items():
+        if cid == exclude:
+            continue
+        score = len(tokens.intersection(pp_tokens))
+        if score:
+            scored.append((-score, cid))
+    return [cid for _s, cid in sorted(scored)]
+
+
+# ── Storage ──────────────────────────────────────────────────────────
+
+def _empty() -> dict:
+    return {"builtAt": 0, "watermark": "", "pp100": {}, "courses": {}, "aliases": {}}
+
+
+def _save(index: dict):
+    body = {k: index[k] for k in ("pp100", "courses", "aliases")}
+    blob = base64.b64encode(zlib.compress(json.dumps(body, separators=(",", ":")).encode(), 6)).decode()
+    kv_set(INDEX_KEY, {"builtAt": index["builtAt"], "watermark": index["watermark"], "z": blob})
+    with _lock:
+        _mem.update({"index": index, "loadedAt": time.time()})
+
+
+def _read() -> dict | None:
+    stored = kv_get(INDEX_KEY)
+    if not isinstance(stored, dict) or not stored.get("z"):
+        return None
+    try:
+        body = json.loads(zlib.decompress(base64.b64decode(stored["z"])))
+    except Exception:
+        return None
+    index = _empty()
+    index.update(body)
+    index["builtAt"] = stored.get("builtAt", 0)
+    index["watermark"] = stored.get("watermark", "")
+    return index
+
+
+def load_index() -> dict:
+    """In-process copy of the index, reloaded from KV every RELOAD_SECONDS."""
+    with _lock:
+        index, loaded_at = _mem["index"], _mem["loadedAt"]
+    if index is not None and time.time() - loaded_at < RELOAD_SECONDS:
+        return index
+    index = _read() or index
+    if index is None:
+        # Never built: pay for one catalog scan here, then every call is a lookup
+        with _build_lock:
+            if _mem["index"] is None:
+                refresh_index(full=True)
+        return _mem["index"]
+    with _lock:
+        _mem.update({"index": index, "loadedAt": time.time()})
+    return index
+
+
+# ── Building ─────────────────────────────────────────────────────────
+
+def _apply(index: dict, courses: list) -> bool:
+    """Fold changed catalog rows into the index. Returns True if the PP100 set changed."""
+    pp100_changed = False
+    for c in courses:
+        cid = c.get("sourcedId", "")
+        if not cid:
+            continue
+        title = c.get("title") or ""
+        code = c.get("courseCode") or ""
+        modified = c.get("dateLastModified") or ""
+        if modified > index["watermark"]:
+            index["watermark"] = modified
+
+        if (c.get("status") or "active") != "active":
+            pp100_changed |= index["pp100"].pop(cid, None) is not None
+            index["courses"].pop(cid, None)
+            index["aliases"].pop(cid, None)
+        elif is_pp100(cid, title):
+            index["pp100"][cid] = sorted(tokenize(title, code))
+            pp100_changed = True
+        else:
+            index["courses"][cid] = [title, code]
+            aliases = match(tokenize(title, code), index["pp100"], exclude=cid)
+            if aliases:
+                index["aliases"][cid] = aliases
+            else:
+                index["aliases"].pop(cid, None)
+    return pp100_changed
+
+
+def _rematch_all(index: dict):
+    index["aliases"] = {}
+    for cid, (title, code) in index["courses"].items():
+        aliases = match(tokenize(title, code), index["pp100"], exclude=cid)
+        if aliases:
+            index["aliases"][cid] = aliases
+
+
+def refresh_index(full: bool = False) -> dict:
+    """Rebuild (full, or when no index exists) or apply catalog changes since
+    the stored watermark. Returns a summary."""
+    index = None if full else _read()
+    if index is None:
+        index = _empty()
+        changed = fetch_all_paginated(COURSES_PATH, "courses")
+        full = True
+    else:
+        wm = index["watermark"]
+        changed = fetch_all_paginated(f"{COURSES_PATH}?filter=dateLastModified%3E'{wm}'", "courses") if wm else []
+
+    # PP100 rows first so regular courses match against the current PP100 set
+    changed.sort(key=lambda c: not is_pp100(c.get("sourcedId", ""), c.get("title") or ""))
+    if _apply(index, changed) and not full:
+        _rematch_all(index)
+
+    index["builtAt"] = time.time()
+    _save(index)
+    return {
+        "full": full,
+        "changed": len(changed),
+        "pp100Courses": len(index["pp100"]),
+        "courses": len(index["courses"]),
+        "aliased": len(index["aliases"]),
+        "watermark": index["watermark"],
+    }
+
+
+# ── Lookups ──────────────────────────────────────────────────────────
+
+def pp100_ids(course_id: str, allow_fetch: bool = True) -> list[str]:
+    """PP100 course IDs for a catalog course, best match first.
+
+    Served from the in-process index. A course newer than the last refresh
+    costs one course fetch, matched against the in-memory PP100 table.
+    """
+    index = load_index()
+    if course_id in index["aliases"]:
+        return list(index["aliases"][course_id])
+    if course_id in index["courses"] or course_id in index["pp100"] or not allow_fetch:
+        return []
+    try:
+        course_data, status = fetch_one(f"{COURSES_PATH}/{course_id}")
+    except Exception:
+        return []
+    if not course_data:
+        return []
+    course_obj = course_data.get("course", course_data)
+    title = course_obj.get("title") or ""
+    code = course_obj.get("courseCode") or ""
+    aliases = match(tokenize(title, code), index["pp100"], exclude=course_id)
+    with _lock:
+        index["courses"][course_id] = [title, code]
+        if aliases:
+            index["aliases"][course_id] = aliases
+    return aliases
+
+
+def best_pp100_id(course_id: str) -> str:
+    """Best PP100 match for a course, or "" if none."""
+    ids = pp100_ids(course_id)
+    return ids[0] if ids else ""
@@ -0,0 +1,140 @@
+"""
+Concurrent PowerPath answer submission, shared by /api/pp-answer-batch and
+/api/pp-answer-one.
+
+submit_answers() PUTs ``updateStudentQuestionResponse`` for many questions
+through a bounded worker pool (ANSWER_WORKERS at a time) and reports a
+result per question. Failures that may be transient (network errors, 429,
+5xx) are retried up to RETRIES more rounds with a short backoff; a 401
+refreshes the shared token once. A whole lesson fits in one request, so
+callers no longer chunk with startIndex / batchSize.
+
+Progress reads go through the attempt snapshot cache (api/_progress_cache.py);
+accepted answers are written into it and finalize() invalidates it.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api._content_cache import invalidate_student
+from api._helpers import API_BASE, api_headers
+from api._progress_cache import get_progress, invalidate_progress, record_responses
+from api._qti_xml import correct_response
+
+PP = f"{API_BASE}/powerpath"
+ANSWER_WORKERS = 8
+RETRIES = 2
+BACKOFF = 0.5     # seconds before each retry round, doubled per round
+PUT_TIMEOUT = 10
+
+
+def fetch_progress(student_id: str, lesson_id: str, headers: dict, max_age: float | None = None):
+    """getAssessmentProgress for the attempt. Returns (data | None, status)."""
+    return get_progress(student_id, lesson_id, headers, max_age)
+
+
+def correct_answer(question: dict) -> str:
+    """The question's QTI correct response ("A" if the XML doesn't say)."""
+    content = question.get("content")
+    raw_xml = content.get("rawXml", "") if isinstance(content, dict) else ""
+    return correct_response(raw_xml) or "A"
+
+
+def is_answered(question: dict) -> bool:
+    return bool(question.get("answered", False) or question.get("response") is not None)
+
+
+class _Token:
+    """Headers shared by the pool; refreshed at most once after a 401."""
+
+    def __init__(self, headers: dict):
+        self.headers = headers
+        self._lock = threading.Lock()
+        self._refreshed = False
+
+    def refresh(self, stale: dict) -> dict:
+        with self._lock:
+            if not self._refreshed and self.headers is stale:
+                self.headers = api_headers()
+                self._refreshed = True
+            return self.headers
+
+
+def _put_one(token: _Token, student_id: str, lesson_id: str, question_id: str, response) -> dict:
+    payload = {"student": student_id, "lesson": lesson_id, "question": question_id, "response": response}
+    started = time.time()
+    try:
+        headers = token.headers
+        resp = requests.put(f"{PP}/updateStudentQuestionResponse", headers=headers, json=payload, timeout=PUT_TIMEOUT)
+        if resp.status_code == 401:
+            resp = requests.put(f"{PP}/updateStudentQuestionResponse", headers=token.refresh(headers),
+                                json=payload, timeout=PUT_TIMEOUT)
+    except Exception as e:
+        return {"status": "error", "httpStatus": 0, "error": str(e), "ms": round((time.time() - started) * 1000)}
+    out = {"status": "success" if resp.ok else "error", "httpStatus": resp.status_code,
+           "ms": round((time.time() - started) * 1000)}
+    if resp.ok:
+        try:
+            data = resp.json() if resp.text else {}
+        except ValueError:
+            data = {}
+        result = data.get("responseResult") if isinstance(data, dict) else None
+        if isinstance(result, dict) and "isCorrect" in result:
+            out["isCorrect"] = result["isCorrect"]
+    else:
+        out["error"] = resp.text[:200]
+    return out
+
+
+def _retryable(result: dict) -> bool:
+    status = result["httpStatus"]
+    return result["status"] != "success" and (status == 0 or status == 429 or status >= 500)
+
+
+def submit_answers(student_id: str, lesson_id: str, answers: list, headers: dict | None = None,
+                   workers: int = ANSWER_WORKERS) -> list:
+    """PUT every (question_id, response) in ``answers`` concurrently.
+
+    Returns one dict per answer, in input order:
+    { questionId, response, status: success|error, httpStatus, attempts, ms, error? }
+    """
+    token = _Token(headers or api_headers())
+    results = [None] * len(answers)
+    todo = list(range(len(answers)))
+    for round_no in range(RETRIES + 1):
+        if not todo:
+            break
+        if round_no:
+            time.sleep(BACKOFF * 2 ** (round_no - 1))
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as pool:
+            futures = {i: pool.submit(_put_one, token, student_id, lesson_id, *answers[i]) for i in todo}
+        for i, f in futures.items():
+            question_id, response = answers[i]
+            results[i] = {"questionId": question_id, "response": response, **f.result(), "attempts": round_no + 1}
+        todo = [i for i in todo if _retryable(results[i])]
+    record_responses(student_id, lesson_id, {
+        r["questionId"]: {"response": r["response"], "isCorrect": r.get("isCorrect")}
+        for r in results if r["status"] == "success"
+    })
+    return results
+
+
+def finalize(student_id: str, lesson_id: str, headers: dict | None = None) -> dict:
+    """finalStudentAssessmentResponse. Returns { finalized, finalizeResponse | finalizeError }."""
+    headers = headers or api_headers()
+    payload = {"student": student_id, "lesson": lesson_id}
+    try:
+        resp = requests.post(f"{PP}/finalStudentAssessmentResponse", headers=headers, json=payload, timeout=15)
+        if resp.status_code == 401:
+            resp = requests.post(f"{PP}/finalStudentAssessmentResponse", headers=api_headers(),
+                                 json=payload, timeout=15)
+    except Exception as e:
+        return {"finalized": False, "finalizeError": str(e)}
+    invalidate_progress(student_id, lesson_id)
+    invalidate_student(student_id)
+    if resp.status_code in (200, 201):
+        return {"finalized": True, "finalizeResponse": resp.json() if resp.text else {}}
+    return {"finalized": False, "finalizeError": f"HTTP {resp.status_code}: {resp.text[:200]}"}
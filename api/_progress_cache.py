@@ -0,0 +1,140 @@
+"""
+Attempt-state snapshots: cached getAssessmentProgress per (student, lesson).
+
+getAssessmentProgress is the PowerPath call we repeat most — quiz-session,
+the pp-* tools and the answer endpoints all poll it, often several times a
+minute for the same attempt. get_progress() serves the last snapshot while
+it is younger than ``max_age`` seconds and only goes upstream when it is
+missing or older than that; every upstream read is written back:
+
+  pp_progress:{student}:{lesson}  { at, z } — ``z`` is the zlib + base64
+                                    JSON payload, ``at`` when PowerPath
+                                    returned it
+
+The default bound is PROGRESS_MAX_AGE (env PP_PROGRESS_MAX_AGE); callers
+that must see PowerPath's own view (reconciling, post-write checks) pass
+max_age=0.
+
+Our writers keep snapshots honest:
+  record_responses()    after updateStudentQuestionResponse succeeds —
+                        patches the questions in place (write-through)
+  invalidate_progress() after resetAttempt, finalStudentAssessmentResponse
+                        or anything else that rescores the attempt
+A patched snapshot keeps its ``at``, so the score PowerPath computes is
+re-read within the same bound. Both also stamp the lesson in
+
+  pp_touched:{student}            native Redis hash lesson → ts — when our
+                                    writers last changed each attempt (one
+                                    HSET per stamp, so concurrent writers
+                                    never drop each other's)
+
+which the answer harvester (api/_answer_harvest.py) uses to re-read only
+the lessons that changed.
+"""
+
+import base64
+import json
+import os
+import time
+import zlib
+
+import requests
+
+from api._helpers import API_BASE, api_headers
+from api._kv import kv_delete, kv_get, kv_hgetall, kv_hset, kv_set
+
+PROGRESS_MAX_AGE = int(os.environ.get("PP_PROGRESS_MAX_AGE", "30"))
+SNAPSHOT_TTL = 3600
+TOUCHED_TTL = 30 * 24 * 3600
+
+
+def _key(student: str, lesson: str) -> str:
+    return f"pp_progress:{student}:{lesson}"
+
+
+def _encode(data: dict) -> str:
+    return base64.b64encode(zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 6)).decode()
+
+
+def _load(student: str, lesson: str):
+    """(payload, at) of the stored snapshot, or (None, 0)."""
+    stored = kv_get(_key(student, lesson))
+    if not isinstance(stored, dict) or not stored.get("z"):
+        return None, 0
+    try:
+        return json.loads(zlib.decompress(base64.b64decode(stored["z"]))), stored.get("at") or 0
+    except Exception:
+        return None, 0
+
+
+def put_progress(student: str, lesson: str, data: dict, at: float | None = None):
+    """Store a getAssessmentProgress payload as the attempt's snapshot."""
+    kv_set(_key(student, lesson), {"at": at or time.time(), "z": _encode(data)}, ttl=SNAPSHOT_TTL)
+
+
+def _touch(student: str, lesson: str):
+    key = f"pp_touched:{student}"
+    if not kv_hset(key, lesson, time.time(), ttl=TOUCHED_TTL) and isinstance(kv_get(key), dict):
+        # a pre-hash JSON record still holds the key (WRONGTYPE): replace it
+        kv_delete(key)
+        kv_hset(key, lesson, time.time(), ttl=TOUCHED_TTL)
+
+
+def touched_lessons(student: str) -> dict:
+    """{lesson: ts} of the attempts our writers changed for the student."""
+    return kv_hgetall(f"pp_touched:{student}")
+
+
+def invalidate_progress(student: str, lesson: str):
+    kv_delete(_key(student, lesson))
+    _touch(student, lesson)
+
+
+def get_progress(student: str, lesson: str, headers: dict | None = None, max_age: float | None = None,
+                 timeout: float = 15):
+    """getAssessmentProgress through the snapshot cache. Returns (data | None, status).
+
+    A snapshot younger than ``max_age`` (default PROGRESS_MAX_AGE) is
+    returned as is; otherwise PowerPath is asked and the answer stored.
+    ``headers`` are updated in place if the token had to be refreshed.
+    """
+    max_age = PROGRESS_MAX_AGE if max_age is None else max_age
+    if max_age > 0:
+        data, at = _load(student, lesson)
+        if data is not None and time.time() - at < max_age:
+            return data, 200
+
+    if headers is None:
+        headers = api_headers()
+    params = {"student": student, "lesson": lesson}
+    url = f"{API_BASE}/powerpath/getAssessmentProgress"
+    resp = requests.get(url, headers=headers, params=params, timeout=timeout)
+    if resp.status_code == 401:
+        headers.update(api_headers())
+        resp = requests.get(url, headers=headers, params=params, timeout=timeout)
+    if resp.status_code != 200:
+        return None, resp.status_code
+    data = resp.json()
+    if isinstance(data, dict):
+        put_progress(student, lesson, data)
+    return data, 200
+
+
+def record_responses(student: str, lesson: str, responses: dict):
+    """Write accepted responses ({questionId: {response, isCorrect?}}) into
+    the snapshot, if there is one."""
+    if not responses:
+        return
+    _touch(student, lesson)
+    data, at = _load(student, lesson)
+    if data is None:
+        return
+    for q in data.get("questions", []):
+        done = responses.get(q.get("id"))
+        if done is None:
+            continue
+        q["answered"] = True
+        q["response"] = done.get("response")
+        if done.get("isCorrect") is not None:
+            q["correct"] = done["isCorrect"]
+    put_progress(student, lesson, data, at)
@@ -0,0 +1,215 @@
+"""
+Asynchronous service-account provisioning (enroll + lesson plan sync).
+
+PowerPath only serves a lesson plan for a course once a user is enrolled
+and ``lessonPlans/course/{id}/sync`` has run, which takes 60-90 s. Tree
+fetchers never do that inline any more: they call enqueue() and report
+"provisioning"; clients poll /api/provision-status.
+
+KV layout:
+  provision_job:{courseId}    { status: queued|running|done|failed, courseId,
+                                attempts, enqueuedAt, startedAt, finishedAt,
+                                steps, error }
+  provision_jobs              native Redis list of courseIds, FIFO
+  provision_claim:{courseId}  held (SET NX) by the worker provisioning the
+                              course, so only one instance ever runs it
+  provisioned:{courseId}      set once the sync succeeded; the course is
+                              never enrolled or synced again
+  (``provision_queue`` / ``provisioned_courses`` — the older JSON-array
+  keys — are still read and migrated)
+
+Jobs are idempotent per course: enqueuing a course that is queued, running
+or provisioned returns the existing job, and a duplicate queue entry is
+dropped when its claim fails or the course turns out provisioned. Queued
+jobs are drained by a background thread started on enqueue and by the
+/api/provision-course cron.
+"""
+
+import threading
+import time
+import uuid
+
+import requests
+
+from api._course_tree import SERVICE_USER_ID, try_tree
+from api._helpers import API_BASE, api_headers
+from api._kv import kv_delete, kv_delete_if, kv_get, kv_list_get, kv_lpop_item, kv_rpush, kv_set, kv_set_nx
+from api._tree_cache import put_tree
+
+QUEUE_KEY = "provision_jobs"
+LEGACY_QUEUE_KEY = "provision_queue"
+LEGACY_PROVISIONED_KEY = "provisioned_courses"
+MAX_ATTEMPTS = 3
+RUNNING_STALE_AFTER = 5 * 60   # a "running" job older than this is re-claimable
+SYNC_TIMEOUT = 90
+
+_provisioned = set()   # in-process copy of provisioned courses
+_drain_lock = threading.Lock()
+
+
+def job_key(course_id: str) -> str:
+    return f"provision_job:{course_id}"
+
+
+# ── State ────────────────────────────────────────────────────────────
+
+def is_provisioned(course_id: str) -> bool:
+    if course_id in _provisioned:
+        return True
+    if kv_get(f"provisioned:{course_id}") or course_id in kv_list_get(LEGACY_PROVISIONED_KEY):
+        _provisioned.add(course_id)
+        return True
+    return False
+
+
+def _mark_provisioned(course_id: str):
+    _provisioned.add(course_id)
+    kv_set(f"provisioned:{course_id}", True)
+
+
+def _is_active(job) -> bool:
+    if not isinstance(job, dict):
+        return False
+    if job.get("status") == "queued":
+        return True
+    return job.get("status") == "running" and time.time() - (job.get("startedAt") or 0) < RUNNING_STALE_AFTER
+
+
+def get_job(course_id: str) -> dict:
+    """Current job record, or a synthesized one for provisioned / unknown courses."""
+    job = kv_get(job_key(course_id))
+    if isinstance(job, dict):
+        return job
+    if is_provisioned(course_id):
+        return {"status": "done", "courseId": course_id}
+    return {"status": "not_started", "courseId": course_id}
+
+
+# ── Enqueue ──────────────────────────────────────────────────────────
+
+def enqueue(course_id: str, start_worker: bool = True, retry: bool = False) -> dict:
+    """Queue provisioning for a course (idempotent). Returns the job record.
+
+    A job that failed MAX_ATTEMPTS times stays failed unless ``retry``.
+    """
+    if is_provisioned(course_id):
+        return {"status": "done", "courseId": course_id}
+    job = kv_get(job_key(course_id))
+    if _is_active(job):
+        return job
+    attempts = job.get("attempts", 0) if isinstance(job, dict) else 0
+    if attempts >= MAX_ATTEMPTS and not retry:
+        return job
+
+    job = {
+        "status": "queued",
+        "courseId": course_id,
+        "attempts": 0 if retry else attempts,
+        "enqueuedAt": time.time(),
+    }
+    kv_set(job_key(course_id), job)
+    kv_rpush(QUEUE_KEY, course_id)
+    if start_worker:
+        threading.Thread(target=drain, daemon=True).start()
+    return job
+
+
+# ── Worker ───────────────────────────────────────────────────────────
+
+def _post(url: str, payload: dict, timeout: int):
+    headers = api_headers()
+    resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
+    if resp.status_code == 401:
+        resp = requests.post(url, headers=api_headers(), json=payload, timeout=timeout)
+    return resp.status_code
+
+
+def _step(steps: list, name: str, url: str, payload: dict, timeout: int):
+    try:
+        steps.append({"step": name, "status": _post(url, payload, timeout)})
+    except Exception as e:
+        steps.append({"step": name, "error": str(e)})
+
+
+def provision(course_id: str) -> dict:
+    """Enroll the service account, sync, and confirm a lesson plan exists.
+
+    Enroll and sync failures (a sync that times out may still complete) are
+    recorded but don't stop the lesson-plan check. Callers must hold the
+    course's claim (see drain()).
+    """
+    job = kv_get(job_key(course_id))
+    job = job if isinstance(job, dict) else {"courseId": course_id, "attempts": 0}
+    job.update({"status": "running", "startedAt": time.time(), "attempts": job.get("attempts", 0) + 1})
+    kv_set(job_key(course_id), job)
+
+    steps = []
+    _step(steps, "enroll", f"{API_BASE}/edubridge/enrollments/enroll/{SERVICE_USER_ID}/{course_id}",
+          {"role": "student"}, 15)
+    _step(steps, "sync", f"{API_BASE}/powerpath/lessonPlans/course/{course_id}/sync", {}, SYNC_TIMEOUT)
+    try:
+        tree = try_tree(f"{API_BASE}/powerpath/lessonPlans/{course_id}/{SERVICE_USER_ID}", api_headers())
+    except Exception as e:
+        steps.append({"step": "tree", "error": str(e)})
+        tree = None
+
+    job.update({"finishedAt": time.time(), "steps": steps})
+    if tree:
+        put_tree(course_id, tree)
+        _mark_provisioned(course_id)
+        job["status"] = "done"
+    else:
+        job["status"] = "failed"
+        job["error"] = "No lesson plan after enroll + sync"
+    kv_set(job_key(course_id), job)
+    return job
+
+
+def _migrate_legacy_queue():
+    legacy = kv_list_get(LEGACY_QUEUE_KEY)
+    if legacy:
+        kv_delete(LEGACY_QUEUE_KEY)
+        kv_rpush(QUEUE_KEY, *legacy)
+
+
+def drain(deadline: float | None = None) -> list[dict]:
+    """Process queued jobs in FIFO order until the queue is empty or ``deadline``.
+
+    Each job is claimed with SET NX before any work, so a course is never
+    provisioned by two instances at once; a job whose claim is held
+    elsewhere is skipped. Failed jobs are re-queued until MAX_ATTEMPTS.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        return []
+    results = []
+    attempted = set()
+    try:
+        _migrate_legacy_queue()
+        while not deadline or time.time() < deadline:
+            course_id = kv_lpop_item(QUEUE_KEY)
+            if not course_id:
+                break
+            if course_id in attempted:
+                kv_rpush(QUEUE_KEY, course_id)
+                break  # only jobs that already failed this pass are left
+            attempted.add(course_id)
+            if is_provisioned(course_id):
+                continue
+            claim = f"provision_claim:{course_id}"
+            token = uuid.uuid4().hex
+            if not kv_set_nx(claim, token, RUNNING_STALE_AFTER):
+                continue  # another instance is running it
+            try:
+                if is_provisioned(course_id):
+                    continue
+                job = provision(course_id)
+            finally:
+                kv_delete_if(claim, token)
+            results.append({"courseId": course_id, "status": job["status"]})
+            if job["status"] == "failed" and job.get("attempts", 0) < MAX_ATTEMPTS:
+                job["status"] = "queued"
+                kv_set(job_key(course_id), job)
+                kv_rpush(QUEUE_KEY, course_id)
+    finally:
+        _drain_lock.release()
+    return results
@@ -0,0 +1,371 @@
+"""
+Shared QTI fetching and assessment-test resolution.
+
+Used by /api/qti-item (one test per request), /api/qti-batch (many tests
+per request) and /api/warm-course. A QtiFetcher owns one token, one thread
+pool and a memo of every URL it has requested, so items and stimuli shared
+between tests are fetched once. Successful GETs are also kept in KV for
+QTI_CACHE_TTL, so the first student to open a warmed lesson is served from
+cache. Student-facing fetchers treat a copy older than QTI_FRESH as stale:
+it is still served, but refetched in the background, so an item fixed
+upstream shows up on the next read. The warmer accepts any cached copy.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from api._helpers import CLIENT_ID, CLIENT_SECRET, get_token
+from api._kv import kv_get, kv_list_get, kv_set
+
+COGNITO_URL = "https://prod-beyond-timeback-api-2-idp.auth.us-east-1.amazoncognito.com/oauth2/token"
+QTI_BASE = "https://qti.alpha-1edtech.ai"
+
+QTI_CACHE_TTL = 24 * 3600  # how long a cached GET is kept
+QTI_FRESH = 15 * 60        # served without revalidation for this long
+
+_revalidating = set()      # URLs with a background refetch in flight
+_revalidate_lock = threading.Lock()
+
+
+# ── Auth ─────────────────────────────────────────────────────────────
+
+def qti_token() -> str:
+    """Get Cognito token, try QTI admin scope first."""
+    try:
+        resp = requests.post(
+            COGNITO_URL,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            data={
+                "grant_type": "client_credentials",
+                "client_id": CLIENT_ID,
+                "client_secret": CLIENT_SECRET,
+                "scope": "qti/v3/scope/admin",
+            },
+            timeout=10,
+        )
+        if resp.status_code == 200:
+            return resp.json()["access_token"]
+    except Exception:
+        pass
+    return get_token()
+
+
+def qti_headers() -> dict:
+    return {"Authorization": f"Bearer {qti_token()}", "Accept": "application/json"}
+
+
+# ── IDs and blocked questions ────────────────────────────────────────
+
+def resolve_bank_to_qti(bank_id: str) -> list[str]:
+    """Transform a PowerPath bank ID to candidate QTI test IDs.
+
+    HUMG20-r173056-bank-v1 → HUMG20-qti173056-test-v1, HUMG20-r173056-test-v1,
+    HUMG20-r173056-v1
+    """
+    ids = []
+    if "-bank-" in bank_id:
+        ids.append(re.sub(r'-r(\d+)-bank-', r'-qti\1-test-', bank_id))
+        ids.append(bank_id.replace("-bank-", "-test-"))
+        ids.append(bank_id.replace("-bank-", "-"))
+    elif "-r" in bank_id:
+        ids.append(re.sub(r'-r(\d+)-', r'-qti\1-', bank_id))
+    return ids
+
+
+def get_blocked_question_ids() -> set:
+    """Question IDs hidden from students (globally hidden + permanently bad + AI-flagged irrelevant)."""
+    try:
+        hidden = set(kv_list_get("globally_hidden_questions"))
+        bad = set(kv_list_get("bad_questions"))
+        irrelevant = set(kv_list_get("ai_irrelevant_questions"))
+        return hidden | bad | irrelevant
+    except Exception:
+        return set()
+
+
+def filter_blocked(questions: list, blocked: set) -> list:
+    """Remove any questions whose ID is in the blocked set."""
+    if not blocked:
+        return questions
+    return [
+        q for q in questions
+        if not isinstance(q, dict) or (q.get("identifier") or q.get("id") or "") not in blocked
+    ]
+
+
+def is_test(data) -> bool:
+    """True if a QTI payload is an assessment test with parts to resolve."""
+    test = data.get("qti-assessment-test", data) if isinstance(data, dict) else data
+    return isinstance(test, dict) and bool(test.get("qti-test-part") or test.get("testParts"))
+
+
+# ── Fetcher ──────────────────────────────────────────────────────────
+
+def _fetch(url, headers):
+    """Fetch a URL, return (json_data, status) or (None, status)."""
+    try:
+        resp = requests.get(url, headers=headers, timeout=30)
+        if resp.status_code == 200:
+            return resp.json(), 200
+        return None, resp.status_code
+    except Exception:
+        return None, 0
+
+
+def cache_key(url: str) -> str:
+    """KV key for a cached QTI GET (URLs contain slashes, so hash them)."""
+    return f"qti_cache:{hashlib.sha1(url.encode()).hexdigest()}"
+
+
+def _store(url, data):
+    kv_set(cache_key(url), {"at": time.time(), "data": data}, ttl=QTI_CACHE_TTL)
+
+
+def _revalidate(url, headers):
+    try:
+        data, _ = _fetch(url, headers)
+        if data:
+            _store(url, data)
+    finally:
+        with _revalidate_lock:
+            _revalidating.discard(url)
+
+
+def _cached_fetch(url, headers, max_age=QTI_FRESH):
+    """_fetch with a KV read-through cache for successful GETs.
+
+    A cached copy older than ``max_age`` is returned as is and refetched
+    in a background thread (stale-while-revalidate).
+    """
+    cached = kv_get(cache_key(url))
+    if isinstance(cached, dict) and cached.get("data"):
+        if time.time() - (cached.get("at") or 0) >= max_age:
+            with _revalidate_lock:
+                start = url not in _revalidating
+                _revalidating.add(url)
+            if start:
+                threading.Thread(target=_revalidate, args=(url, headers), daemon=True).start()
+        return cached["data"], 200
+    data, st = _fetch(url, headers)
+    if data:
+        _store(url, data)
+    return data, st
+
+
+class QtiFetcher:
+    """Thread-pooled GETs with per-URL de-duplication.
+
+    Concurrent requests for the same URL share one in-flight future, and
+    completed results are remembered for the fetcher's lifetime. With
+    ``cache`` on (the default) results are also read from and written to KV;
+    copies older than ``max_age`` are revalidated in the background.
+    """
+
+    def __init__(self, headers: dict, max_workers: int = 5, cache: bool = True, max_age: int = QTI_FRESH):
+        self.headers = headers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._cache = cache
+        self._max_age = max_age
+
+    def submit(self, url: str):
+        with self._lock:
+            fut = self._futures.get(url)
+            if fut is None:
+                if self._cache:
+                    fut = self._pool.submit(_cached_fetch, url, self.headers, self._max_age)
+                else:
+                    fut = self._pool.submit(_fetch, url, self.headers)
+                self._futures[url] = fut
+            return fut
+
+    def get(self, url: str):
+        """Blocking fetch → (data, status). Safe to call from any thread but the pool's own."""
+        try:
+            return self.submit(url).result()
+        except Exception:
+            return None, 0
+
+    def first(self, urls):
+        """Try URLs in order, return the first (data, status) with data."""
+        for url in urls:
+            data, st = self.get(url)
+            if data:
+                return data, st
+        return None, 404
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+def find_test(test_id: str, fetcher: QtiFetcher):
+    """Locate a QTI test or item by ID, trying bank-ID transforms first.
+
+    Returns ``(qti_id, data)`` or ``("", None)``.
+    """
+    for try_id in resolve_bank_to_qti(test_id) + [test_id]:
+        for endpoint in ["assessment-tests", "assessment-items"]:
+            data, st = fetcher.get(f"{QTI_BASE}/api/{endpoint}/{try_id}")
+            if data:
+                return try_id, data
+    return "", None
+
+
+# ── Test resolution ──────────────────────────────────────────────────
+
+def _collect_refs(test: dict):
+    """Pass 1: item hrefs in order, item → stimulus key, stimulus key → URL."""
+    parts = test.get("qti-test-part", test.get("testParts", []))
+    if not isinstance(parts, list):
+        parts = [parts]
+
+    item_hrefs = []
+    section_stim_map = {}  # item_href → stimulus_key
+    stim_keys_to_fetch = {}  # stim_key → best URL to fetch
+
+    for part in parts:
+        sections = part.get("qti-assessment-section", part.get("sections", []))
+        if not isinstance(sections, list):
+            sections = [sections]
+        for section in sections:
+            # Section-level stimulus
+            sec_stim_key = ""
+            stim_refs = section.get("qti-assessment-stimulus-ref", [])
+            if not isinstance(stim_refs, list):
+                stim_refs = [stim_refs]
+            for sref in (stim_refs or []):
+                if not sref:
+                    continue
+                if isinstance(sref, str):
+                    sec_stim_key = sref
+                    stim_keys_to_fetch[sref] = sref
+                else:
+                    attrs = sref.get("_attributes", sref)
+                    shref = attrs.get("href", "")
+                    sid = attrs.get("identifier", "")
+                    sec_stim_key = shref or sid
+                    if shref:
+                        stim_keys_to_fetch[sec_stim_key] = shref
+                    elif sid:
+                        stim_keys_to_fetch[sec_stim_key] = f"{QTI_BASE}/api/stimuli/{sid}"
+
+            # Item refs
+            refs = section.get("qti-assessment-item-ref", section.get("itemRefs", section.get("items", [])))
+            if not isinstance(refs, list):
+                refs = [refs]
+            for ref in refs:
+                href = ""
+                if isinstance(ref, str):
+                    href = ref
+                else:
+                    href = ref.get("href", "") or (ref.get("_attributes") or {}).get("href", "")
+                    if not href:
+                        ref_id = ref.get("identifier", ref.get("id", ""))
+                        if ref_id:
+                            href = f"{QTI_BASE}/api/assessment-items/{ref_id}"
+                if href:
+                    item_hrefs.append(href)
+                    if sec_stim_key:
+                        section_stim_map[href] = sec_stim_key
+
+    return item_hrefs, section_stim_map, stim_keys_to_fetch
+
+
+def _embedded_stim_ref(item: dict):
+    """Stimulus ref embedded in an item (can be at multiple nesting levels)."""
+    stim_ref = None
+    # Level 1: item.content.qti-assessment-item.qti-assessment-stimulus-ref
+    if isinstance(item.get("content"), dict):
+        qi = item["content"].get("qti-assessment-item", {})
+        if isinstance(qi, dict):
+            stim_ref = qi.get("qti-assessment-stimulus-ref")
+    # Level 2: item.qti-assessment-stimulus-ref (top level)
+    if not stim_ref:
+        stim_ref = item.get("qti-assessment-stimulus-ref")
+    # Level 3: metadata stimulus ID
+    if not stim_ref and isinstance(item.get("metadata"), dict):
+        sid = item["metadata"].get("stimulusId") or item["metadata"].get("stimulus_id") or ""
+        if sid:
+            stim_ref = {"_attributes": {"identifier": sid}}
+    return stim_ref
+
+
+def _stimulus_urls(key: str, primary_url: str) -> list[str]:
+    """Primary stimulus URL followed by alternate URL patterns."""
+    sid = key.split("/")[-1] if "/" in key else key
+    urls = [primary_url]
+    for alt in [
+        f"{QTI_BASE}/api/stimuli/{sid}",
+        f"{QTI_BASE}/api/assessment-stimuli/{sid}",
+        f"{QTI_BASE}/api/assessment-items/{sid}",
+    ]:
+        if alt != primary_url:
+            urls.append(alt)
+    return urls
+
+
+def resolve_test(test: dict, fetcher: QtiFetcher):
+    """Resolve a test's items and stimuli.
+
+    Returns ``(questions, stimuli)``: the items in test order, each tagged
+    with ``_stimulusRef`` when it has a passage, and a table of stimulus
+    key → stimulus payload. Items are fetched in parallel, then unique
+    stimuli. Blocked-question filtering is left to the caller.
+    """
+    item_hrefs, section_stim_map, stim_keys_to_fetch = _collect_refs(test)
+
+    # Pass 2: fetch all items in parallel
+    futures = {h: fetcher.submit(h) for h in item_hrefs}
+    items_by_href = {}
+    for href, fut in futures.items():
+        try:
+            data, st = fut.result()
+            if data:
+                items_by_href[href] = data
+        except Exception:
+            pass
+
+    for href, item in items_by_href.items():
+        if href in section_stim_map or not isinstance(item, dict):
+            continue
+        stim_ref = _embedded_stim_ref(item)
+        if stim_ref:
+            attrs = stim_ref.get("_attributes", stim_ref) if isinstance(stim_ref, dict) else {}
+            shref = attrs.get("href", "")
+            sid = attrs.get("identifier", "")
+            key = shref or sid
+            if key:
+                section_stim_map[href] = key
+                if key not in stim_keys_to_fetch:
+                    stim_keys_to_fetch[key] = shref or f"{QTI_BASE}/api/stimuli/{sid}"
+
+    # Pass 3: fetch unique stimuli (primary URLs in parallel, alternates on miss)
+    for key, url in stim_keys_to_fetch.items():
+        if url:
+            fetcher.submit(url)
+    stimuli = {}
+    for key, url in stim_keys_to_fetch.items():
+        if not url:
+            continue
+        data, st = fetcher.first(_stimulus_urls(key, url))
+        if data:
+            stimuli[key] = data
+
+    questions = []
+    for href in item_hrefs:
+        item = items_by_href.get(href)
+        if not item:
+            continue
+        if isinstance(item, dict):
+            stim_key = section_stim_map.get(href)
+            if stim_key and stim_key in stimuli:
+                # tag a copy: the fetcher memoizes items and shares them across tests
+                item = {**item, "_stimulusRef": stim_key}
+        questions.append(item)
+
+    return questions, stimuli
@@ -0,0 +1,272 @@
+"""
+Incremental QTI 3.0 XML parsing shared by the question and article endpoints.
+
+Pulls the prompt, choices, correct response and stimulus body out of a
+``rawXml`` document in a single streaming pass (``XMLPullParser``).  Elements
+are cleared as soon as they have been consumed, so a long reading passage is
+never held as a full DOM alongside the rest of the item.  Malformed documents
+fall back to the regex extraction the endpoints used previously.
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from html.entities import name2codepoint
+
+CHUNK_SIZE = 16384
+STIMULUS_TEXT_LIMIT = 4000
+
+_XML_ENTITIES = {"amp", "lt", "gt", "quot", "apos"}
+_ENTITY_RE = re.compile(r"&([A-Za-z][A-Za-z0-9]*);")
+_WS_RE = re.compile(r"\s+")
+
+# Regex fallback (only used when the document is not well-formed XML)
+_TAG_RE = re.compile(r"<[^>]+>")
+_NUM_ENTITY_RE = re.compile(r"&#\d+;")
+_PROMPT_RE = re.compile(r"<qti-prompt[^>]*>(.*?)</qti-prompt>", re.DOTALL)
+_CHOICE_RE = re.compile(r'<qti-simple-choice\s+[^>]*identifier="([^"]+)"[^>]*>(.*?)</qti-simple-choice>', re.DOTALL)
+_FEEDBACK_RE = re.compile(r"<qti-feedback-inline[^>]*>.*?</qti-feedback-inline>", re.DOTALL)
+_CORRECT_RE = re.compile(r"<qti-correct-response>\s*<qti-value>([^<]+)</qti-value>")
+_ITEM_ID_RE = re.compile(r'<qti-assessment-item[^>]+identifier="([^"]+)"')
+_STIM_REF_RE = re.compile(r'<qti-assessment-stimulus-ref[^>]+identifier="([^"]+)"')
+_STIMULUS_RES = (
+    re.compile(r"<qti-stimulus-body[^>]*>(.*?)</qti-stimulus-body>", re.DOTALL | re.IGNORECASE),
+    re.compile(r"<stimulus-body[^>]*>(.*?)</stimulus-body>", re.DOTALL | re.IGNORECASE),
+)
+
+_STIMULUS_BODY_TAGS = {"qti-stimulus-body", "stimulus-body"}
+
+
+# ── Helpers ──────────────────────────────────────────────────────────
+
+def _local(tag) -> str:
+    """Strip any ``{namespace}`` prefix and lowercase the tag name."""
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1].lower()
+
+
+def _xmlify_entities(text: str) -> str:
+    """Rewrite HTML named entities (``&nbsp;`` etc.) as numeric references expat accepts."""
+    def repl(m):
+        name = m.group(1)
+        if name in _XML_ENTITIES:
+            return m.group(0)
+        cp = name2codepoint.get(name)
+        return f"&#{cp};" if cp else m.group(0)
+    return _ENTITY_RE.sub(repl, text)
+
+
+def _collapse(text: str) -> str:
+    return _WS_RE.sub(" ", text).strip()
+
+
+def _element_text(el, skip=()) -> str:
+    """Whitespace-normalised text of an element, ignoring subtrees tagged in ``skip``."""
+    parts = []
+
+    def walk(node):
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            if _local(child.tag) not in skip:
+                walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(el)
+    return _collapse(" ".join(parts))
+
+
+def strip_html(html: str) -> str:
+    """Regex tag stripper kept for callers handed HTML fragments rather than XML."""
+    if not html:
+        return ""
+    text = _TAG_RE.sub(" ", html)
+    for ent, rep in [("&amp;", "&"), ("&lt;", "<"), ("&gt;", ">"), ("&nbsp;", " "), ("&quot;", '"')]:
+        text = text.replace(ent, rep)
+    text = _NUM_ENTITY_RE.sub("", text)
+    return _collapse(text)
+
+
+def _iter_events(raw_xml: str):
+    """Yield (event, element) pairs while feeding the document in chunks."""
+    parser = ET.XMLPullParser(events=("start", "end"))
+    text = _xmlify_entities(raw_xml)
+    for i in range(0, len(text), CHUNK_SIZE):
+        parser.feed(text[i:i + CHUNK_SIZE])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+# ── Public API ───────────────────────────────────────────────────────
+
+def parse_qti(raw_xml: str, render_stimulus=None) -> dict:
+    """
+    Extract prompt, choices, correct response and stimulus from QTI XML.
+
+    Returns ``{"prompt", "choices": [{"id", "text"}], "correctId", "stimulus"}``.
+    When ``render_stimulus`` is given it is called with the stimulus-body
+    element (before it is discarded) and its result is returned as
+    ``stimulusHtml``.
+    """
+    result = {"prompt": "", "choices": [], "correctId": "", "stimulus": ""}
+    if render_stimulus is not None:
+        result["stimulusHtml"] = ""
+    if not raw_xml or not raw_xml.strip():
+        return result
+
+    try:
+        _parse_stream(raw_xml, result, render_stimulus)
+    except ET.ParseError:
+        return _parse_regex(raw_xml, render_stimulus is not None)
+    return result
+
+
+def correct_response(raw_xml: str) -> str:
+    """
+    Return the first ``qti-correct-response`` value, or "".
+
+    Stops reading as soon as the value is seen — response declarations come
+    before the item body, so the rest of the document is never parsed.
+    """
+    if not raw_xml:
+        return ""
+    in_correct = False
+    try:
+        for event, el in _iter_events(raw_xml):
+            name = _local(el.tag)
+            if name == "qti-correct-response":
+                in_correct = event == "start"
+            elif in_correct and event == "end" and name == "qti-value":
+                return (el.text or "").strip()
+    except ET.ParseError:
+        m = _CORRECT_RE.search(raw_xml)
+        return m.group(1).strip() if m else ""
+    return ""
+
+
+def item_summary(raw_xml: str) -> dict:
+    """
+    Read the head of an assessment item: identifier, correct response and
+    stimulus references.
+
+    Returns ``{"identifier", "correctId", "stimulusRefs": [{"identifier", "href"}]}``.
+    Parsing stops at ``qti-item-body``, since everything needed sits above it.
+    """
+    result = {"identifier": "", "correctId": "", "stimulusRefs": []}
+    if not raw_xml:
+        return result
+    in_correct = False
+    try:
+        for event, el in _iter_events(raw_xml):
+            name = _local(el.tag)
+            if event == "start":
+                if name == "qti-assessment-item" and not result["identifier"]:
+                    result["identifier"] = el.get("identifier", "")
+                elif name == "qti-correct-response":
+                    in_correct = True
+                elif name == "qti-assessment-stimulus-ref":
+                    result["stimulusRefs"].append({
+                        "identifier": el.get("identifier", ""),
+                        "href": el.get("href", ""),
+                    })
+                elif name == "qti-item-body":
+                    break
+            elif name == "qti-correct-response":
+                in_correct = False
+            elif name == "qti-value" and in_correct and not result["correctId"]:
+                result["correctId"] = (el.text or "").strip()
+    except ET.ParseError:
+        m = _ITEM_ID_RE.search(raw_xml)
+        result["identifier"] = m.group(1) if m else ""
+        m = _CORRECT_RE.search(raw_xml)
+        result["correctId"] = m.group(1).strip() if m else ""
+        result["stimulusRefs"] = [
+            {"identifier": m.group(1), "href": ""} for m in _STIM_REF_RE.finditer(raw_xml)
+        ]
+    return result
+
+
+# ── Streaming pass ───────────────────────────────────────────────────
+
+def _parse_stream(raw_xml: str, result: dict, render_stimulus):
+    capture = 0          # >0 while inside an element we still need to read on "end"
+    in_correct = False
+    root = None
+    keep_root = False    # a bare stimulus document with no body wrapper renders its root
+    body_seen = False
+
+    for event, el in _iter_events(raw_xml):
+        name = _local(el.tag)
+
+        if event == "start":
+            if root is None:
+                root = el
+                keep_root = "stimulus" in name and "item" not in name
+            if name in ("qti-prompt", "qti-simple-choice") or name in _STIMULUS_BODY_TAGS:
+                capture += 1
+            elif name == "qti-correct-response":
+                in_correct = True
+            continue
+
+        # event == "end"
+        if name == "qti-prompt":
+            capture -= 1
+            if not result["prompt"]:
+                result["prompt"] = _element_text(el)
+        elif name == "qti-simple-choice":
+            capture -= 1
+            cid = el.get("identifier", "")
+            text = _element_text(el, skip=("qti-feedback-inline",))
+            if cid and text:
+                result["choices"].append({"id": cid, "text": text})
+        elif name in _STIMULUS_BODY_TAGS:
+            capture -= 1
+            if not body_seen:
+                body_seen = True
+                keep_root = False
+                result["stimulus"] = _element_text(el)[:STIMULUS_TEXT_LIMIT]
+                if render_stimulus is not None:
+                    result["stimulusHtml"] = render_stimulus(el)
+        elif name == "qti-correct-response":
+            in_correct = False
+        elif name == "qti-value" and in_correct and not result["correctId"]:
+            result["correctId"] = (el.text or "").strip()
+
+        if el is root:
+            if keep_root and not body_seen:
+                result["stimulus"] = _element_text(el)[:STIMULUS_TEXT_LIMIT]
+                if render_stimulus is not None:
+                    result["stimulusHtml"] = render_stimulus(el)
+        elif capture == 0 and not keep_root:
+            el.clear()
+
+
+def _parse_regex(raw_xml: str, want_html: bool) -> dict:
+    result = {"prompt": "", "choices": [], "correctId": "", "stimulus": ""}
+    if want_html:
+        result["stimulusHtml"] = ""
+
+    m = _PROMPT_RE.search(raw_xml)
+    if m:
+        result["prompt"] = strip_html(m.group(1))
+
+    for m in _CHOICE_RE.finditer(raw_xml):
+        text = strip_html(_FEEDBACK_RE.sub("", m.group(2)))
+        if text:
+            result["choices"].append({"id": m.group(1), "text": text})
+
+    m = _CORRECT_RE.search(raw_xml)
+    if m:
+        result["correctId"] = m.group(1).strip()
+
+    for pat in _STIMULUS_RES:
+        m = pat.search(raw_xml)
+        if m and m.group(1).strip():
+            result["stimulus"] = strip_html(m.group(1))[:STIMULUS_TEXT_LIMIT]
+            if want_html:
+                result["stimulusHtml"] = m.group(1).strip()
+            break
+
+    return result
@@ -0,0 +1,164 @@
+"""
+Per-student index of OneRoster assessment results, synced incrementally.
+
+/api/course-content merges OneRoster results into PowerPath's course
+progress. Rather than downloading every result for the student on each
+page load, this module keeps an ALI → best-result index in KV and only
+fetches results modified since the last sync:
+
+  KV ``student_results:{userId}`` → { watermark, syncedAt, fullAt, z }
+    z = zlib + base64 JSON of { assessmentLineItemId: result }
+
+"Best" result per line item is the newest "fully graded" one, else the
+newest of any status — the same preference the merge always used. Results
+are fetched page by page (``dateLastModified >= watermark``), so nothing
+is lost to the server's default page size. A full resync runs every
+FULL_SYNC_AFTER seconds to drop results deleted upstream.
+"""
+
+import base64
+import json
+import time
+import zlib
+
+import requests
+
+from api._helpers import API_BASE, PAGE_SIZE, api_headers
+from api._kv import kv_get, kv_set
+
+RESULTS_URL = f"{API_BASE}/ims/oneroster/gradebook/v1p2/assessmentResults"
+FULL_SYNC_AFTER = 24 * 3600
+INDEX_TTL = 30 * 24 * 3600
+
+
+def index_key(user_id: str) -> str:
+    return f"student_results:{user_id}"
+
+
+# ── Storage ──────────────────────────────────────────────────────────
+
+def _read(user_id: str) -> dict | None:
+    stored = kv_get(index_key(user_id))
+    if not isinstance(stored, dict) or "z" not in stored:
+        return None
+    try:
+        results = json.loads(zlib.decompress(base64.b64decode(stored["z"])))
+    except Exception:
+        return None
+    return {
+        "watermark": stored.get("watermark", ""),
+        "syncedAt": stored.get("syncedAt", 0),
+        "fullAt": stored.get("fullAt", 0),
+        "results": results,
+    }
+
+
+def _save(user_id: str, index: dict):
+    blob = base64.b64encode(zlib.compress(json.dumps(index["results"], separators=(",", ":")).encode(), 6)).decode()
+    kv_set(index_key(user_id), {
+        "watermark": index["watermark"],
+        "syncedAt": index["syncedAt"],
+        "fullAt": index["fullAt"],
+        "z": blob,
+    }, ttl=INDEX_TTL)
+
+
+# ── Fetching ─────────────────────────────────────────────────────────
+
+def _fetch_since(user_id: str, watermark: str, headers: dict) -> list | None:
+    """Every result for the student modified at or after ``watermark``
+    (all results if empty). Returns None if a page fails."""
+    flt = f"student.sourcedId='{user_id}'"
+    if watermark:
+        flt += f" AND dateLastModified>='{watermark}'"
+    items = []
+    offset = 0
+    while True:
+        params = {"filter": flt, "limit": PAGE_SIZE, "offset": offset}
+        resp = requests.get(RESULTS_URL, headers=headers, params=params, timeout=30)
+        if resp.status_code == 401:
+            headers = api_headers()
+            resp = requests.get(RESULTS_URL, headers=headers, params=params, timeout=30)
+        if resp.status_code != 200:
+            return None
+        page = resp.json().get("assessmentResults", [])
+        items.extend(page)
+        if len(page) < PAGE_SIZE:
+            return items
+        offset += PAGE_SIZE
+
+
+def _compact(r: dict) -> dict:
+    """The result fields copied into courseProgress lineItems."""
+    return {
+        "sourcedId": r.get("sourcedId", ""),
+        "scoreStatus": r.get("scoreStatus", ""),
+        "score": r.get("score"),
+        "scoreDate": r.get("scoreDate", ""),
+        "textScore": r.get("textScore", ""),
+        "metadata": r.get("metadata"),
+    }
+
+
+def _apply(index: dict, rows: list):
+    """Fold fetched results into the ALI → best-result map (dict lookups only)."""
+    results = index["results"]
+    for r in rows:
+        modified = r.get("dateLastModified") or ""
+        if modified > index["watermark"]:
+            index["watermark"] = modified
+        ali = (r.get("assessmentLineItem") or {}).get("sourcedId", "")
+        if not ali:
+            continue
+        current = results.get(ali)
+        if (r.get("status") or "active") != "active":
+            if current and current["sourcedId"] == r.get("sourcedId"):
+                results.pop(ali)
+            continue
+        graded = r.get("scoreStatus") == "fully graded"
+        if (
+            not current
+            or current["sourcedId"] == r.get("sourcedId")
+            or graded
+            or current.get("scoreStatus") != "fully graded"
+        ):
+            results[ali] = _compact(r)
+
+
+def sync_student_results(user_id: str, headers: dict | None = None) -> dict:
+    """Bring a student's index up to date and return its ALI → result map.
+
+    Costs one delta query (usually a single short page). Falls back to
+    the stored map if OneRoster is unavailable.
+    """
+    headers = headers or api_headers()
+    index = _read(user_id)
+    now = time.time()
+    full = index is None or now - index["fullAt"] > FULL_SYNC_AFTER
+    rows = _fetch_since(user_id, "" if full else index["watermark"], headers)
+    if rows is None:
+        return index["results"] if index else {}
+    if full:
+        index = {"watermark": "", "syncedAt": 0, "fullAt": now, "results": {}}
+
+    # Oldest first, so later rows win
+    rows.sort(key=lambda r: r.get("dateLastModified") or "")
+    _apply(index, rows)
+    index["syncedAt"] = now
+    if full or rows:
+        _save(user_id, index)
+    return index["results"]
+
+
+# ── Merge ────────────────────────────────────────────────────────────
+
+def merge_into_progress(course_progress: dict, results: dict):
+    """Append indexed results missing from courseProgress lineItems."""
+    for item in course_progress.get("lineItems") or []:
+        r = results.get(item.get("assessmentLineItemSourcedId", ""))
+        if not r:
+            continue
+        existing = item.get("results") or []
+        if r["sourcedId"] in {x.get("sourcedId") for x in existing}:
+            continue
+        item["results"] = existing + [dict(r)]
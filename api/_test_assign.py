@@ -0,0 +1,259 @@
+"""
+Test-out assignment, for one student or as a resumable bulk job.
+
+assign_one() is the single-student flow /api/assign-test has always run:
+delete the student's existing assignment for the subject, ensure the
+placement-class enrollment, then POST ``powerpath/test-assignments``.
+
+Bulk jobs run the same flow for a whole roster (a OneRoster class, or an
+explicit list of students), BATCH_SIZE students at a time with up to
+WORKERS in flight. Each batch first prefetches every student's existing
+assignments concurrently, then assigns. Progress is saved to KV after every
+batch, so a job that runs out of time resumes where it stopped:
+
+  assign_job:{jobId}        { jobId, status: queued|running|done, subject,
+                              grade, classId, students, cursor, results:
+                              { studentId: { status, assignmentId, lessonId,
+                              error } }, counts, createdAt, startedAt,
+                              updatedAt, finishedAt }
+  assign_job_lease:{jobId}  held by the worker running the job
+
+Workers start on create and are restarted by status polls once the lease
+has lapsed. LEASE_TTL outlasts a worst-case batch; the worker renews it
+(compare-and-expire) before each batch and before saving, and stops
+without writing if another worker has taken the job over. MasteryTrack provisioning (makeExternalTestAssignment) needs
+the admin's browser session, so it stays a client-side step driven by the
+returned lessonIds.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api._helpers import API_BASE, api_headers, fetch_all_paginated
+from api._kv import kv_delete_if, kv_get, kv_renew_if, kv_set, kv_set_nx
+
+PP = f"{API_BASE}/powerpath"
+OR = f"{API_BASE}/ims/oneroster"
+
+PLACEMENT_CLASSES = {
+    "math":     {"classId": "514efb44-d13b-41bd-8d6a-dc380b2e5ca2", "schoolId": "cf49acb1-1e67-48c6-8d53-8b3c6a404852"},
+    "language":  {"classId": "0b7b2884-cf93-4a09-b1ac-6ebfe9f96f39", "schoolId": "f47ac10b-58cc-4372-a567-0e02b2c3d479"},
+    "science":  {"classId": "science-placement-tests-class-timeback", "schoolId": "cf49acb1-1e67-48c6-8d53-8b3c6a404852"},
+    "writing":  {"classId": "writing-placement-tests-class-timeback", "schoolId": "cf49acb1-1e67-48c6-8d53-8b3c6a404852"},
+}
+PLACEMENT_CLASSES["reading"] = PLACEMENT_CLASSES["language"]
+PLACEMENT_CLASSES["vocabulary"] = PLACEMENT_CLASSES["language"]
+PLACEMENT_CLASSES["social studies"] = PLACEMENT_CLASSES["science"]
+PLACEMENT_CLASSES["fastmath"] = PLACEMENT_CLASSES["math"]
+
+BATCH_SIZE = 25
+WORKERS = 8
+MAX_STUDENTS = 2000
+# Worst case for one student: list assignments (8s), one delete (6s),
+# enrollment (8s) and the POST (12s); a batch runs ceil(BATCH_SIZE / WORKERS)
+# rounds of those. The lease must outlast a whole batch.
+STUDENT_WORST = 8 + 6 + 8 + 12
+LEASE_TTL = -(-BATCH_SIZE // WORKERS) * STUDENT_WORST + 60
+JOB_TTL = 7 * 24 * 3600
+
+
+# ── Single student ───────────────────────────────────────────────────
+
+def ensure_enrollment(headers, student_id, subject):
+    key = subject.lower()
+    cls = PLACEMENT_CLASSES.get(key)
+    if not cls:
+        return
+    try:
+        requests.post(
+            f"{OR}/rostering/v1p2/enrollments",
+            headers=headers,
+            json={"enrollment": {
+                "sourcedId": f"enroll-{student_id}-{key}-{int(time.time())}",
+                "status": "active", "role": "student", "primary": "false",
+                "user": {"sourcedId": student_id},
+                "class": {"sourcedId": cls["classId"]},
+                "school": {"sourcedId": cls["schoolId"]},
+            }},
+            timeout=8,
+        )
+    except Exception:
+        pass
+
+
+def list_assignments(headers, student_id) -> list | None:
+    """The student's test assignments, or None if the lookup failed."""
+    try:
+        resp = requests.get(f"{PP}/test-assignments", headers=headers, params={"student": student_id}, timeout=8)
+        if resp.status_code == 200:
+            return resp.json().get("testAssignments", [])
+    except Exception:
+        pass
+    return None
+
+
+def assign_one(headers, student_id, subject, grade, existing=None):
+    """Replace the student's test-out for ``subject`` with one at ``grade``.
+
+    ``existing`` is the student's prefetched assignment list (looked up here
+    when None). Returns (success, data, http_status).
+    """
+    # Step 1: Delete any existing assignment for this subject
+    if existing is None:
+        existing = list_assignments(headers, student_id) or []
+    for a in existing:
+        if (a.get("subject") or "").lower() == subject.lower():
+            old = a.get("sourcedId") or ""
+            if old:
+                try:
+                    requests.delete(f"{PP}/test-assignments/{old}", headers=headers, timeout=6)
+                except Exception:
+                    pass
+
+    # Step 2: Ensure enrollment in placement class
+    ensure_enrollment(headers, student_id, subject)
+
+    # Step 3: Create test-out assignment (NO placement reset — that makes it placement type)
+    payload = {"student": student_id, "subject": subject, "grade": grade}
+    resp = requests.post(f"{PP}/test-assignments", headers=headers, json=payload, timeout=12)
+    try:
+        data = resp.json()
+    except Exception:
+        data = {"raw": resp.text[:500]}
+    return resp.status_code in (200, 201), data, resp.status_code
+
+
+# ── Bulk jobs ────────────────────────────────────────────────────────
+
+def job_key(job_id: str) -> str:
+    return f"assign_job:{job_id}"
+
+
+def roster_students(class_id: str) -> list:
+    """sourcedIds of a OneRoster class's students."""
+    users = fetch_all_paginated(f"/ims/oneroster/rostering/v1p2/classes/{class_id}/students", "users")
+    return [u["sourcedId"] for u in users if u.get("sourcedId") and (u.get("status") or "active") == "active"]
+
+
+def _counts(job: dict) -> dict:
+    results = job["results"]
+    done = sum(1 for r in results.values() if r["status"] == "assigned")
+    failed = sum(1 for r in results.values() if r["status"] == "failed")
+    return {"total": len(job["students"]), "assigned": done, "failed": failed,
+            "remaining": len(job["students"]) - done - failed}
+
+
+def create_job(subject: str, grade: str, student_ids=None, class_id: str = "", start_worker: bool = True) -> dict:
+    """Create a bulk assignment job for a roster. Returns the job record."""
+    students = list(dict.fromkeys(student_ids or []))
+    if class_id:
+        students = list(dict.fromkeys(students + roster_students(class_id)))
+    job = {
+        "jobId": uuid.uuid4().hex,
+        "status": "queued",
+        "subject": subject,
+        "grade": grade,
+        "classId": class_id,
+        "students": students[:MAX_STUDENTS],
+        "cursor": 0,
+        "results": {},
+        "createdAt": time.time(),
+    }
+    job["counts"] = _counts(job)
+    if not job["students"]:
+        job.update(status="done", finishedAt=time.time())
+    kv_set(job_key(job["jobId"]), job, ttl=JOB_TTL)
+    if start_worker and job["status"] != "done":
+        threading.Thread(target=run_job, args=(job["jobId"],), daemon=True).start()
+    return job
+
+
+def get_job(job_id: str, resume: bool = True) -> dict | None:
+    """Job record; restarts an unfinished job whose worker has gone away."""
+    job = kv_get(job_key(job_id))
+    if not isinstance(job, dict):
+        return None
+    if resume and job["status"] != "done" and kv_get(f"assign_job_lease:{job_id}") is None:
+        threading.Thread(target=run_job, args=(job_id,), daemon=True).start()
+    return job
+
+
+def _assign_student(headers, job, student_id, existing):
+    try:
+        ok, data, status = assign_one(headers, student_id, job["subject"], job["grade"], existing)
+    except Exception as e:
+        return {"status": "failed", "error": str(e)}
+    if ok and isinstance(data, dict):
+        return {"status": "assigned", "assignmentId": data.get("assignmentId", ""), "lessonId": data.get("lessonId", "")}
+    err = (data.get("error") or data.get("imsx_description") or "") if isinstance(data, dict) else ""
+    return {"status": "failed", "httpStatus": status, "error": err or f"PowerPath returned {status}"}
+
+
+def run_job(job_id: str, deadline: float | None = None) -> dict | None:
+    """Work through a job's remaining students batch by batch, saving
+    progress after each batch. Returns the job, or None if another worker
+    holds it."""
+    lease_key = f"assign_job_lease:{job_id}"
+    token = uuid.uuid4().hex
+    if not kv_set_nx(lease_key, token, LEASE_TTL):
+        return None
+    try:
+        job = kv_get(job_key(job_id))
+        if not isinstance(job, dict) or job["status"] == "done":
+            return job
+        job["status"] = "running"
+        job.setdefault("startedAt", time.time())
+        headers = api_headers()
+
+        while job["cursor"] < len(job["students"]):
+            if deadline and time.time() >= deadline:
+                break
+            if not kv_renew_if(lease_key, token, LEASE_TTL):
+                return None  # another worker has the job now
+            batch = [s for s in job["students"][job["cursor"]:job["cursor"] + BATCH_SIZE]
+                     if job["results"].get(s, {}).get("status") != "assigned"]
+            with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+                # One pass over the batch's existing assignments, then assign
+                existing = dict(zip(batch, pool.map(lambda s: list_assignments(headers, s), batch)))
+                outcomes = pool.map(lambda s: _assign_student(headers, job, s, existing[s]), batch)
+                job["results"].update(zip(batch, outcomes))
+            job["cursor"] = min(job["cursor"] + BATCH_SIZE, len(job["students"]))
+            job["counts"] = _counts(job)
+            job["updatedAt"] = time.time()
+            if not kv_renew_if(lease_key, token, LEASE_TTL):
+                return None  # lost the lease mid-batch; don't overwrite the new holder's progress
+            kv_set(job_key(job_id), job, ttl=JOB_TTL)
+
+        if job["cursor"] >= len(job["students"]):
+            job.update(status="done", finishedAt=time.time())
+        job["counts"] = _counts(job)
+        if not kv_renew_if(lease_key, token, LEASE_TTL):
+            return None
+        kv_set(job_key(job_id), job, ttl=JOB_TTL)
+        return job
+    finally:
+        kv_delete_if(lease_key, token)
+
+
+def retry_failed(job_id: str) -> dict | None:
+    """Queue a finished job's failed students again. A job that isn't done
+    yet is returned unchanged (its worker still owns the student list)."""
+    job = kv_get(job_key(job_id))
+    if not isinstance(job, dict):
+        return None
+    failed = [s for s, r in job["results"].items() if r["status"] == "failed"]
+    if job["status"] != "done" or not failed:
+        return job
+    job["students"] = [s for s in job["students"] if s not in failed] + failed
+    job["cursor"] = len(job["students"]) - len(failed)
+    for s in failed:
+        job["results"].pop(s, None)
+    job.update(status="queued", counts=_counts(job))
+    job.pop("finishedAt", None)
+    kv_set(job_key(job_id), job, ttl=JOB_TTL)
+    threading.Thread(target=run_job, args=(job_id,), daemon=True).start()
+    return job
@@ -0,0 +1,153 @@
+"""
+Shared, versioned cache of PowerPath lesson-plan trees.
+
+Every tree consumer goes through get_tree(course_id) instead of calling
+``/powerpath/lessonPlans/tree/{id}`` itself. Trees are stored twice:
+
+  - KV ``lesson_tree:{courseId}`` → { v, fetchedAt, z } where ``z`` is the
+    zlib-compressed, base64-encoded JSON tree (trees run to hundreds of KB)
+  - an in-process dict holding the parsed tree, so warm function instances
+    skip both the KV read and the JSON parse
+
+``lesson_tree_version:{courseId}`` is bumped by /api/sync-lesson-plan and
+/api/edit-course-save. A cached tree from an older version is refetched
+synchronously; a current-version tree older than FRESH_SECONDS is served
+as-is and revalidated in a background thread (stale-while-revalidate).
+
+Returned trees are shared between callers — treat them as read-only.
+"""
+
+import base64
+import json
+import threading
+import time
+import zlib
+
+from api._course_tree import fetch_tree, index_for
+from api._kv import kv_get, kv_incr, kv_set
+
+FRESH_SECONDS = 10 * 60
+KV_TTL = 7 * 24 * 3600
+
+_mem = {}            # course_id → {"v", "fetchedAt", "tree"}
+_refreshing = set()  # course_ids with a background revalidation in flight
+_lock = threading.Lock()
+
+
+def _tree_key(course_id: str) -> str:
+    return f"lesson_tree:{course_id}"
+
+
+def _version_key(course_id: str) -> str:
+    return f"lesson_tree_version:{course_id}"
+
+
+# ── Versioning ───────────────────────────────────────────────────────
+
+def tree_version(course_id: str) -> int:
+    v = kv_get(_version_key(course_id))
+    try:
+        return int(v or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def bump_tree_version(course_id: str) -> int:
+    """Invalidate every cached copy of a course's tree. Returns the new version."""
+    version = kv_incr(_version_key(course_id))
+    with _lock:
+        _mem.pop(course_id, None)
+    return version
+
+
+# ── Storage ──────────────────────────────────────────────────────────
+
+def _pack(tree) -> str:
+    raw = json.dumps(tree, separators=(",", ":")).encode()
+    return base64.b64encode(zlib.compress(raw, 6)).decode()
+
+
+def _unpack(blob: str):
+    return json.loads(zlib.decompress(base64.b64decode(blob)))
+
+
+def _store(course_id: str, version: int, tree) -> dict:
+    entry = {"v": version, "fetchedAt": time.time(), "tree": tree}
+    with _lock:
+        _mem[course_id] = entry
+    kv_set(_tree_key(course_id), {"v": version, "fetchedAt": entry["fetchedAt"], "z": _pack(tree)}, ttl=KV_TTL)
+    return entry
+
+
+def _load(course_id: str, version: int) -> dict | None:
+    """Cached entry for a course (memory first, then KV), any version."""
+    with _lock:
+        entry = _mem.get(course_id)
+    if entry and entry["v"] == version:
+        return entry
+    stored = kv_get(_tree_key(course_id))
+    if isinstance(stored, dict) and stored.get("z"):
+        try:
+            kv_entry = {"v": stored.get("v", 0), "fetchedAt": stored.get("fetchedAt", 0), "tree": _unpack(stored["z"])}
+        except Exception:
+            return entry
+        if not entry or kv_entry["v"] >= entry["v"]:
+            entry = kv_entry
+            with _lock:
+                _mem[course_id] = entry
+    return entry
+
+
+def put_tree(course_id: str, tree):
+    """Store a tree fetched elsewhere (e.g. right after an enroll + sync)."""
+    if tree:
+        _store(course_id, tree_version(course_id), tree)
+
+
+# ── Read path ────────────────────────────────────────────────────────
+
+def _revalidate(course_id: str, version: int):
+    try:
+        tree = fetch_tree(course_id)
+        if tree:
+            _store(course_id, version, tree)
+    finally:
+        with _lock:
+            _refreshing.discard(course_id)
+
+
+def _revalidate_async(course_id: str, version: int):
+    with _lock:
+        if course_id in _refreshing:
+            return
+        _refreshing.add(course_id)
+    threading.Thread(target=_revalidate, args=(course_id, version), daemon=True).start()
+
+
+def get_tree(course_id: str) -> dict | None:
+    """Lesson-plan tree for a course, or None if PowerPath has none.
+
+    Uses the same lookup as fetch_tree (generic tree, then the service
+    account's lesson plan, each also via the cached PP100 alias).
+    """
+    if not course_id:
+        return None
+    version = tree_version(course_id)
+    entry = _load(course_id, version)
+
+    if entry and entry["v"] == version:
+        if time.time() - entry["fetchedAt"] > FRESH_SECONDS:
+            _revalidate_async(course_id, version)
+        return entry["tree"]
+
+    tree = fetch_tree(course_id)
+    if tree:
+        return _store(course_id, version, tree)["tree"]
+    # Upstream failed: an older version beats nothing
+    return entry["tree"] if entry else None
+
+
+def get_index(course_id: str):
+    """CourseIndex for a course's cached tree (built once per tree version), or None."""
+    tree = get_tree(course_id)
+    return index_for(tree) if tree else None
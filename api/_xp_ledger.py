@@ -0,0 +1,309 @@
+"""
+Materialized per-student XP ledger.
+
+/api/user-xp used to find a student's results (up to six path/filter
+combinations, falling back to a scan of every result) and sum
+``timeback.xp`` on every page view. The sum is now kept in KV and updated
+by the endpoints that write results:
+
+  KV ``xp_ledger:{userId}`` → { reconciledAt, resultsXP, enrollmentXP, z }
+    z = zlib + base64 JSON of
+        { results:     { resultId: summary + "xp" },
+          pending:     { runId: xp },      # activity-record XP not yet in enrollments
+          enrollments: [...], timeSaved: {...} }
+
+  submit-result / update-result → record_result()
+  delete-result                 → remove_result()
+  activity-record               → record_activity()
+
+read_xp() answers from the ledger with one KV read. A missing ledger is
+built synchronously; one older than RECONCILE_AFTER is served and rebuilt
+in a background thread from the full recompute (user_xp), which also
+folds pending activity XP into the fresh enrollment totals. Concurrent
+writers can race on the read-modify-write; reconciliation repairs that.
+"""
+
+import base64
+import json
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from api._helpers import Upstream, fetch_all_paginated
+from api._kv import kv_get, kv_set
+
+GRADEBOOK_PATH = "/ims/oneroster/gradebook/v1p2"
+RECONCILE_AFTER = 6 * 3600
+LEDGER_TTL = 90 * 24 * 3600
+
+# OneRoster gradebook paths to try (assessmentResults is what submit-result creates)
+RESULTS_PATHS = [
+    f"{GRADEBOOK_PATH}/assessmentResults",
+    f"{GRADEBOOK_PATH}/results",
+    "/ims/oneroster/v1p2/results",
+]
+
+_refreshing = set()
+_lock = threading.Lock()
+
+
+def ledger_key(user_id: str) -> str:
+    return f"xp_ledger:{user_id}"
+
+
+def owner_key(result_id: str) -> str:
+    return f"xp_result_owner:{result_id}"
+
+
+# ── Full recompute ───────────────────────────────────────────────────
+
+def fetch_user_results(user_id: str, up: Upstream) -> list:
+    """Fetch results for a specific student, trying multiple paths and filter formats."""
+    # Try multiple filter formats (OneRoster uses different syntax per endpoint)
+    filters = [
+        f"student.sourcedId='{user_id}'",
+        f"studentSourcedId='{user_id}'",
+    ]
+
+    for path in RESULTS_PATHS:
+        for filter_param in filters:
+            try:
+                data, status = up.get(path, {"filter": filter_param, "limit": 100}, timeout=60)
+                if data and status == 200:
+                    # Response key can be "results" or "assessmentResults"
+                    results = data.get("assessmentResults", data.get("results", []))
+                    if not results:
+                        for val in data.values():
+                            if isinstance(val, list):
+                                results = val
+                                break
+                    if results:
+                        return list(results)
+            except Exception:
+                continue
+
+    # Fallback: fetch all and filter client-side
+    for path in RESULTS_PATHS:
+        collection_key = "assessmentResults" if "assessmentResults" in path else "results"
+        try:
+            fetched = fetch_all_paginated(path, collection_key)
+            if fetched:
+                return [
+                    r for r in fetched
+                    if (r.get("student", {}) or {}).get("sourcedId") == user_id
+                ]
+        except Exception:
+            continue
+
+    return []
+
+
+def result_xp(result: dict) -> int:
+    """XP points from one result's metadata."""
+    meta = result.get("metadata", {}) or {}
+    try:
+        return int(meta.get("timeback.xp", 0))
+    except (ValueError, TypeError):
+        return 0
+
+
+def sum_xp(results: list) -> int:
+    """Sum XP points from results metadata."""
+    return sum(result_xp(r) for r in results)
+
+
+def result_summary(raw: dict) -> dict:
+    """Slim result record for the XP response."""
+    line_item = raw.get("lineItem", {}) or {}
+    return {
+        "sourcedId": raw.get("sourcedId", ""),
+        "lineItemSourcedId": line_item.get("sourcedId", ""),
+        "score": raw.get("score", ""),
+        "scoreStatus": raw.get("scoreStatus", ""),
+        "scoreDate": raw.get("scoreDate", ""),
+        "metadata": raw.get("metadata", {}),
+    }
+
+
+def enrollment_list(enrollments_data) -> list:
+    """Enrollment rows from an EduBridge enrollments response."""
+    if isinstance(enrollments_data, list):
+        return enrollments_data
+    if not isinstance(enrollments_data, dict):
+        return []
+    enrollments = enrollments_data.get("enrollments", enrollments_data.get("data", []))
+    return [enrollments] if isinstance(enrollments, dict) else enrollments
+
+
+def user_xp(up: Upstream, user_id: str) -> dict:
+    """Full recompute: OneRoster results XP + EduBridge enrollment XP + time saved."""
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results_f = pool.submit(fetch_user_results, user_id, up)
+        enr_f = pool.submit(up.get, f"/edubridge/enrollments/user/{user_id}")
+        ts_f = pool.submit(up.get, f"/edubridge/time-saved/user/{user_id}")
+
+    raw_results = results_f.result()
+    total_xp = sum_xp(raw_results)
+
+    enrollments_data, enr_status = enr_f.result()
+    enrollments = enrollment_list(enrollments_data) if enr_status == 200 else []
+
+    # Sum XP earned from EduBridge enrollments
+    enrollment_xp = 0
+    for e in enrollments:
+        try:
+            enrollment_xp += int(e.get("xpEarned", 0))
+        except (ValueError, TypeError):
+            pass
+
+    time_data, ts_status = ts_f.result()
+
+    return {
+        "userId": user_id,
+        # Combined XP = OneRoster results XP + EduBridge enrollment XP
+        "totalXP": total_xp + enrollment_xp,
+        "enrollmentXP": enrollment_xp,
+        "resultsXP": total_xp,
+        "enrollments": enrollments,
+        "timeSaved": time_data if time_data and ts_status == 200 else {},
+        "results": [result_summary(r) for r in raw_results],
+    }
+
+
+# ── Storage ──────────────────────────────────────────────────────────
+
+def _load(user_id: str) -> dict | None:
+    stored = kv_get(ledger_key(user_id))
+    if not isinstance(stored, dict) or not stored.get("z"):
+        return None
+    try:
+        body = json.loads(zlib.decompress(base64.b64decode(stored["z"])))
+    except Exception:
+        return None
+    body.update({k: stored.get(k, 0) for k in ("reconciledAt", "resultsXP", "enrollmentXP")})
+    return body
+
+
+def _save(user_id: str, ledger: dict):
+    body = {k: ledger.get(k) for k in ("results", "pending", "enrollments", "timeSaved")}
+    blob = base64.b64encode(zlib.compress(json.dumps(body, separators=(",", ":")).encode(), 6)).decode()
+    kv_set(ledger_key(user_id), {
+        "reconciledAt": ledger["reconciledAt"],
+        "resultsXP": ledger["resultsXP"],
+        "enrollmentXP": ledger["enrollmentXP"],
+        "z": blob,
+    }, ttl=LEDGER_TTL)
+
+
+# ── Reconcile ────────────────────────────────────────────────────────
+
+def reconcile(user_id: str, up: Upstream | None = None) -> dict:
+    """Rebuild a student's ledger from upstream. Returns the ledger."""
+    snapshot = user_xp(up or Upstream(), user_id)
+    # The summaries came from the same results, so re-derive XP per row
+    results = {}
+    for i, s in enumerate(snapshot["results"]):
+        results[s["sourcedId"] or f"_{i}"] = {**s, "xp": result_xp(s)}
+    ledger = {
+        "reconciledAt": time.time(),
+        "resultsXP": snapshot["resultsXP"],
+        "enrollmentXP": snapshot["enrollmentXP"],
+        "results": results,
+        "pending": {},
+        "enrollments": snapshot["enrollments"],
+        "timeSaved": snapshot["timeSaved"],
+    }
+    _save(user_id, ledger)
+    return ledger
+
+
+def _reconcile_bg(user_id: str):
+    try:
+        reconcile(user_id)
+    finally:
+        with _lock:
+            _refreshing.discard(user_id)
+
+
+def _reconcile_async(user_id: str):
+    with _lock:
+        if user_id in _refreshing:
+            return
+        _refreshing.add(user_id)
+    threading.Thread(target=_reconcile_bg, args=(user_id,), daemon=True).start()
+
+
+def mark_stale(user_id: str):
+    """Force a background reconcile on the next read (e.g. after an enrollment change)."""
+    ledger = _load(user_id)
+    if ledger:
+        ledger["reconciledAt"] = 0
+        _save(user_id, ledger)
+
+
+# ── Read ─────────────────────────────────────────────────────────────
+
+def read_xp(user_id: str, up: Upstream | None = None) -> dict:
+    """The /api/user-xp body, served from the ledger."""
+    ledger = _load(user_id)
+    if ledger is None:
+        ledger = reconcile(user_id, up)
+    elif time.time() - ledger["reconciledAt"] > RECONCILE_AFTER:
+        _reconcile_async(user_id)
+
+    pending_xp = sum(ledger.get("pending", {}).values())
+    enrollment_xp = ledger["enrollmentXP"] + pending_xp
+    return {
+        "userId": user_id,
+        # Combined XP = OneRoster results XP + EduBridge enrollment XP
+        "totalXP": ledger["resultsXP"] + enrollment_xp,
+        "enrollmentXP": enrollment_xp,
+        "resultsXP": ledger["resultsXP"],
+        "enrollments": ledger.get("enrollments") or [],
+        "timeSaved": ledger.get("timeSaved") or {},
+        "results": [{k: v for k, v in r.items() if k != "xp"} for r in ledger["results"].values()],
+        "reconciledAt": ledger["reconciledAt"],
+    }
+
+
+# ── Writes ───────────────────────────────────────────────────────────
+
+def record_result(student_id: str, result: dict):
+    """Upsert one written result (an ``assessmentResult`` body) into the ledger."""
+    result_id = result.get("sourcedId", "")
+    if not student_id or not result_id:
+        return
+    kv_set(owner_key(result_id), student_id, ttl=LEDGER_TTL)
+    ledger = _load(student_id)
+    if ledger is None:
+        return  # built in full (including this result) on first read
+    entry = {**result_summary(result), "xp": result_xp(result)}
+    previous = ledger["results"].get(result_id)
+    ledger["resultsXP"] += entry["xp"] - (previous["xp"] if previous else 0)
+    ledger["results"][result_id] = entry
+    _save(student_id, ledger)
+
+
+def remove_result(result_id: str, student_id: str = ""):
+    """Drop a deleted result from its student's ledger."""
+    student_id = student_id or kv_get(owner_key(result_id)) or ""
+    ledger = _load(student_id) if student_id else None
+    if not ledger or result_id not in ledger["results"]:
+        return
+    ledger["resultsXP"] -= ledger["results"].pop(result_id)["xp"]
+    _save(student_id, ledger)
+
+
+def record_activity(user_id: str, run_id: str, xp) -> None:
+    """Count XP sent through activity-record until the next reconcile picks
+    it up from the enrollment totals."""
+    try:
+        xp = int(xp or 0)
+    except (ValueError, TypeError):
+        return
+    ledger = _load(user_id)
+    if ledger is None or not xp:
+        return
+    ledger.setdefault("pending", {})[run_id] = xp
+    _save(user_id, ledger)
@@ -1,8 +1,9 @@
 """POST /api/activity-record — Record activity completion via SDK-style pipeline.
 
 This mimics what @timeback/sdk's timeback.activity.record() does:
-1. Sends ActivityCompletedEvent to Caliper
-2. Triggers the full pipeline including gradebook and XP
+1. Posts to the SDK activity record endpoint
+2. Falls back to queueing an ActivityCompletedEvent in the Caliper outbox
+   (api/_caliper.py), which triggers the full pipeline including gradebook and XP
 
 Body:
   userId: string (required) - student sourcedId
@@ -21,16 +22,15 @@ Docs: https://docs.timeback.com/beta/build-on-timeback/sdk/activity-tracking/ref
 
 import json
 import uuid
-from datetime import datetime, timezone
 from http.server import BaseHTTPRequestHandler
+from api._caliper import SENSOR_ID, caliper_time, enqueue_events
 from api._helpers import API_BASE, get_token, send_json
+from api._xp_ledger import record_activity
 
 import requests
 
 # The SDK uses this endpoint - let's try it
 ACTIVITY_RECORD_URL = f"{API_BASE}/activity/record"
-CALIPER_URL = "https://caliper.alpha-1edtech.ai/caliper/event"
-SENSOR_ID = "https://alphalearn.alpha.school"
 
 
 class handler(BaseHTTPRequestHandler):
@@ -103,6 +103,7 @@ class handler(BaseHTTPRequestHandler):
             })
             
             if resp.status_code in (200, 201):
+                record_activity(user_id, run_id, xp_earned)
                 send_json(self, {
                     "status": "success",
                     "method": "sdk_activity_record",
@@ -114,8 +115,8 @@ class handler(BaseHTTPRequestHandler):
             debug.append({"step": "1_sdk_activity_record", "error": str(e)})
 
         # Try 2: Caliper ActivityCompletedEvent with SDK-style format
-        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        
+        now = caliper_time()
+
         metrics = [
             {"type": "xpEarned", "value": xp_earned}
         ]
@@ -178,35 +179,8 @@ class handler(BaseHTTPRequestHandler):
             }
         }
 
-        envelope = {
-            "sensor": SENSOR_ID,
-            "sendTime": now,
-            "dataVersion": "http://purl.imsglobal.org/ctx/caliper/v1p2",
-            "data": [caliper_event]
-        }
-
         try:
-            resp = requests.post(CALIPER_URL, headers=headers, json=envelope, timeout=30)
-            debug.append({
-                "step": "2_caliper_event",
-                "url": CALIPER_URL,
-                "status": resp.status_code,
-                "body": resp.text[:500]
-            })
-            
-            if resp.status_code in (200, 201, 204):
-                send_json(self, {
-                    "status": "success",
-                    "method": "caliper_event",
-                    "response": resp.json() if resp.text else {},
-                    "debug": debug
-                })
-            else:
-                send_json(self, {
-                    "status": "error",
-                    "message": f"Both methods failed",
-                    "debug": debug
-                }, 502)
+            queued = enqueue_events([caliper_event])
         except Exception as e:
             debug.append({"step": "2_caliper_event", "error": str(e)})
             send_json(self, {
@@ -214,5 +188,22 @@ class handler(BaseHTTPRequestHandler):
                 "message": str(e),
                 "debug": debug
             }, 500)
+            return
+        debug.append({"step": "2_caliper_event", **queued})
+
+        if queued.get("status") is not None and not queued.get("sent"):
+            send_json(self, {
+                "status": "error",
+                "message": "Both methods failed",
+                "debug": debug
+            }, 502)
+            return
+        record_activity(user_id, run_id, xp_earned)
+        send_json(self, {
+            "status": "success",
+            "method": "caliper_event",
+            "queued": bool(queued["queued"]),
+            "debug": debug
+        })
 
 # Cache bust 20260212090915
@@ -1,10 +1,13 @@
 """GET /api/analytics?email=...&startDate=...&endDate=... — Activity facts (EduBridge)
 
 Docs: https://docs.timeback.com/beta/api-reference/beyond-ai/edubridge/analytics/list-all-facts-for-a-given-date-range-by-email-or-studentid
+
+Closed days are served from a per-day cache (api/_analytics_cache.py).
 """
 
 from http.server import BaseHTTPRequestHandler
-from api._helpers import fetch_with_params, send_json, get_query_params
+from api._analytics_cache import cached_facts
+from api._helpers import send_json, get_query_params
 
 
 class handler(BaseHTTPRequestHandler):
@@ -33,8 +36,8 @@ class handler(BaseHTTPRequestHandler):
             if timezone:
                 api_params["timezone"] = timezone
 
-            data, status = fetch_with_params(
-                "/edubridge/analytics/activity", api_params
+            data, status = cached_facts(
+                "/edubridge/analytics/activity", api_params, "student", [email, student_id]
             )
             if data:
                 send_json(self, data)
@@ -20,8 +20,10 @@ from http.server import BaseHTTPRequestHandler
 
 import requests
 
-from api._helpers import API_BASE, api_headers, send_json, get_query_params, get_token, CLIENT_ID, CLIENT_SECRET
+from api._helpers import API_BASE, send_json, get_query_params, get_token, CLIENT_ID, CLIENT_SECRET
 from api._kv import kv_get, kv_set
+from api._course_tree import index_for
+from api._tree_cache import get_tree
 
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
 ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
@@ -31,96 +33,25 @@ MODEL = "claude-sonnet-4-20250514"
 COGNITO_URL = "https://prod-beyond-timeback-api-2-idp.auth.us-east-1.amazoncognito.com/oauth2/token"
 QTI_BASE = "https://qti.alpha-1edtech.ai"
 
-SERVICE_USER_ID = "8ea2b8e1-1b04-4cab-b608-9ab524c059c2"
-
-
-# ── Tree fetching (mirrors edit-course-load.py) ─────────────────────
-
-def _try_tree(url, headers):
-    try:
-        resp = requests.get(url, headers=headers, timeout=30)
-        if resp.status_code == 401:
-            headers = api_headers()
-            resp = requests.get(url, headers=headers, timeout=30)
-        if resp.status_code == 200:
-            data = resp.json()
-            if data:
-                return data
-    except Exception:
-        pass
-    return None
-
-
-def _fetch_tree(course_id):
-    headers = api_headers()
-    ids_to_try = [course_id]
-    cached_pp100 = kv_get(f"pp100_course_id:{course_id}")
-    if cached_pp100 and cached_pp100 != course_id:
-        ids_to_try.append(cached_pp100)
-
-    for cid in ids_to_try:
-        tree = _try_tree(f"{API_BASE}/powerpath/lessonPlans/tree/{cid}", headers)
-        if tree:
-            return tree
-    for cid in ids_to_try:
-        tree = _try_tree(f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}", headers)
-        if tree:
-            return tree
-    return None
-
 
 # ── Extract video+article URLs per lesson from tree ─────────────────
 
-def _parse_resource_meta(res_wrapper):
-    res = res_wrapper.get("resource", res_wrapper) if isinstance(res_wrapper, dict) else res_wrapper
-    if not isinstance(res, dict):
-        return "", "", "", ""
-    meta = res.get("metadata") or {}
-    rurl = meta.get("url", "") or res.get("url", "") or meta.get("href", "") or res.get("href", "")
-    rtype = (meta.get("type", "") or res.get("type", "")).lower()
-    res_title = res.get("title", "") or ""
-    res_id = res.get("id", "") or res.get("sourcedId", "") or ""
-    return rurl, res_id, res_title, rtype
-
-
 def _extract_lessons_with_content(tree):
-    """Walk the tree and extract lessons that have both a video URL and article URL."""
-    inner = tree.get("lessonPlan", tree) if isinstance(tree, dict) else tree
-    if isinstance(inner, dict) and inner.get("lessonPlan"):
-        inner = inner["lessonPlan"]
-
-    unit_list = inner.get("subComponents", []) if isinstance(inner, dict) else (inner if isinstance(inner, list) else [])
-
+    """Find lessons in the course index that have both a video URL and article URL."""
+    index = index_for(tree)
     lessons = []
-    for unit in unit_list:
-        if not isinstance(unit, dict):
-            continue
-        unit_title = unit.get("title", "")
-
-        for lesson in unit.get("subComponents", []):
-            if not isinstance(lesson, dict):
-                continue
-            lesson_title = lesson.get("title", "")
-            lesson_id = lesson.get("sourcedId") or lesson.get("id") or ""
-
-            video_url = ""
-            article_url = ""
-            for rw in lesson.get("componentResources", []):
-                rurl, _rid, _rtitle, rtype = _parse_resource_meta(rw)
-                if rtype == "video" and rurl:
-                    video_url = video_url or rurl
-                elif rurl and "stimuli" in rurl.lower():
-                    article_url = article_url or rurl
-
-            if video_url and article_url:
-                lessons.append({
-                    "lessonId": lesson_id,
-                    "lessonTitle": lesson_title,
-                    "unitTitle": unit_title,
-                    "videoUrl": video_url,
-                    "articleUrl": article_url,
-                })
-
+    for li, lesson in enumerate(index.lessons):
+        resources = index.lesson_resources(li)
+        video_url = next((r["url"] for r in resources if r["kind"] == "video" and r["url"]), "")
+        article_url = next((r["url"] for r in resources if r["kind"] == "article"), "")
+        if video_url and article_url:
+            lessons.append({
+                "lessonId": lesson["id"],
+                "lessonTitle": lesson["title"],
+                "unitTitle": index.parent_unit(lesson)["title"],
+                "videoUrl": video_url,
+                "articleUrl": article_url,
+            })
     return lessons
 
 
@@ -471,7 +402,7 @@ class handler(BaseHTTPRequestHandler):
         # Fetch tree and discover lessons SYNCHRONOUSLY (fast, ~2s)
         # so we know the real totalLessons before responding.
         try:
-            tree = _fetch_tree(course_id)
+            tree = get_tree(course_id)
         except Exception as e:
             send_json(self, {"error": f"Failed to fetch course tree: {e}"}, 500)
             return
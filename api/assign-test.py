@@ -5,30 +5,24 @@ Flow:
      → Creates unlisted test-out → { assignmentId, lessonId, resourceId }
   2. Frontend calls makeExternalTestAssignment with lessonId
      → Provisions on MasteryTrack → { testId, testUrl }
+
+Bulk (whole class): POST { subject, grade, classId? , students?: [id] }
+  → 202 { jobId, ... }; poll GET ?action=job&id=jobId for progress.
+  POST { action: "retry", jobId } re-queues the job's failed students
+  (409 while the job is still queued or running).
+  See api/_test_assign.py.
 """
 
 import json
-import time
-import uuid
 from http.server import BaseHTTPRequestHandler
 
 import requests
 from api._helpers import API_BASE, api_headers, send_json
+from api._test_assign import PLACEMENT_CLASSES, assign_one, create_job, get_job, retry_failed
 
 PP = f"{API_BASE}/powerpath"
 OR = f"{API_BASE}/ims/oneroster"
 
-PLACEMENT_CLASSES = {
-    "math":     {"classId": "514efb44-d13b-41bd-8d6a-dc380b2e5ca2", "schoolId": "cf49acb1-1e67-48c6-8d53-8b3c6a404852"},
-    "language":  {"classId": "0b7b2884-cf93-4a09-b1ac-6ebfe9f96f39", "schoolId": "f47ac10b-58cc-4372-a567-0e02b2c3d479"},
-    "science":  {"classId": "science-placement-tests-class-timeback", "schoolId": "cf49acb1-1e67-48c6-8d53-8b3c6a404852"},
-    "writing":  {"classId": "writing-placement-tests-class-timeback", "schoolId": "cf49acb1-1e67-48c6-8d53-8b3c6a404852"},
-}
-PLACEMENT_CLASSES["reading"] = PLACEMENT_CLASSES["language"]
-PLACEMENT_CLASSES["vocabulary"] = PLACEMENT_CLASSES["language"]
-PLACEMENT_CLASSES["social studies"] = PLACEMENT_CLASSES["science"]
-PLACEMENT_CLASSES["fastmath"] = PLACEMENT_CLASSES["math"]
-
 
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
@@ -58,6 +52,13 @@ class handler(BaseHTTPRequestHandler):
         if action == "admin":
             _proxy(self, headers, f"{PP}/test-assignments/admin", {})
             return
+        if action == "job":
+            job = get_job(params.get("id", [""])[0])
+            if job is None:
+                send_json(self, {"error": "Unknown job"}, 404)
+            else:
+                send_json(self, job)
+            return
         if action == "get":
             _proxy(self, headers, f"{PP}/test-assignments/{params.get('id', [''])[0]}", {})
             return
@@ -105,40 +106,33 @@ class handler(BaseHTTPRequestHandler):
                 return
 
             body = json.loads(raw)
-            sid = (body.get("student") or body.get("studentId") or "").strip()
+            if body.get("action") == "retry":
+                job_id = body.get("jobId", "")
+                job = get_job(job_id, resume=False)
+                if job is None:
+                    send_json(self, {"error": "Unknown job", "success": False}, 404)
+                elif job["status"] != "done":
+                    send_json(self, {"error": "Job is still running", "success": False, **job}, 409)
+                else:
+                    job = retry_failed(job_id) or job
+                    send_json(self, {"success": True, **job}, 202)
+                return
+
             subject = (body.get("subject") or "").strip()
             grade = (body.get("grade") or body.get("gradeLevel") or "").strip()
+            if "students" in body or body.get("classId"):
+                self._create_job(body, subject, grade)
+                return
 
+            sid = (body.get("student") or body.get("studentId") or "").strip()
             if not sid or not subject or not grade:
                 send_json(self, {"error": "Need student, subject, and grade", "success": False}, 400)
                 return
 
             headers = api_headers()
+            ok, data, status = assign_one(headers, sid, subject, grade)
 
-            # Step 1: Delete any existing assignment for this subject
-            try:
-                lr = requests.get(f"{PP}/test-assignments", headers=headers, params={"student": sid}, timeout=8)
-                if lr.status_code == 200:
-                    for a in lr.json().get("testAssignments", []):
-                        if (a.get("subject") or "").lower() == subject.lower():
-                            old = a.get("sourcedId") or ""
-                            if old:
-                                requests.delete(f"{PP}/test-assignments/{old}", headers=headers, timeout=6)
-            except Exception:
-                pass
-
-            # Step 2: Ensure enrollment in placement class
-            _ensure_enrollment(headers, sid, subject)
-
-            # Step 3: Create test-out assignment (NO placement reset — that makes it placement type)
-            payload = {"student": sid, "subject": subject, "grade": grade}
-            resp = requests.post(f"{PP}/test-assignments", headers=headers, json=payload, timeout=12)
-            try:
-                data = resp.json()
-            except Exception:
-                data = {"raw": resp.text[:500]}
-
-            if resp.status_code in (200, 201):
+            if ok:
                 lesson_id = data.get("lessonId", "") if isinstance(data, dict) else ""
                 send_json(self, {
                     "success": True,
@@ -153,8 +147,8 @@ class handler(BaseHTTPRequestHandler):
                     err = data.get("error") or data.get("imsx_description") or ""
                 send_json(self, {
                     "success": False,
-                    "error": err or f"PowerPath returned {resp.status_code}",
-                    "httpStatus": resp.status_code,
+                    "error": err or f"PowerPath returned {status}",
+                    "httpStatus": status,
                     "powerpathResponse": data,
                 }, 422)
 
@@ -163,27 +157,20 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             send_json(self, {"error": str(e), "success": False}, 500)
 
-
-def _ensure_enrollment(headers, student_id, subject):
-    key = subject.lower()
-    cls = PLACEMENT_CLASSES.get(key)
-    if not cls:
-        return
-    try:
-        requests.post(
-            f"{OR}/rostering/v1p2/enrollments",
-            headers=headers,
-            json={"enrollment": {
-                "sourcedId": f"enroll-{student_id}-{key}-{int(time.time())}",
-                "status": "active", "role": "student", "primary": "false",
-                "user": {"sourcedId": student_id},
-                "class": {"sourcedId": cls["classId"]},
-                "school": {"sourcedId": cls["schoolId"]},
-            }},
-            timeout=8,
-        )
-    except Exception:
-        pass
+    def _create_job(self, body, subject, grade):
+        students = body.get("students") or []
+        class_id = (body.get("classId") or "").strip()
+        if not subject or not grade:
+            send_json(self, {"error": "Need subject and grade", "success": False}, 400)
+            return
+        if not isinstance(students, list) or not all(isinstance(s, str) for s in students):
+            send_json(self, {"error": "students must be a list of sourcedIds", "success": False}, 400)
+            return
+        job = create_job(subject, grade, [s.strip() for s in students if s.strip()], class_id)
+        if not job["students"]:
+            send_json(self, {"error": "No students to assign", "success": False, **job}, 400)
+            return
+        send_json(self, {"success": True, **job}, 202)
 
 
 def _cleanup_placement_enrollment(headers, student_id, subject):
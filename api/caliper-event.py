@@ -1,23 +1,22 @@
-"""POST /api/caliper-event — Proxy Caliper events to the Alpha Caliper API.
+"""POST /api/caliper-event — Queue Caliper events for the Alpha Caliper API.
+GET  /api/caliper-event — Flush the Caliper outbox (cron) and report metrics.
 
-Accepts a JSON body with an array of Caliper event objects and wraps them
-in a Caliper Envelope before forwarding to caliper.alpha-1edtech.ai.
+Events are appended to the Caliper outbox (api/_caliper.py) and sent to
+caliper.alpha-1edtech.ai in batched envelopes; the response doesn't wait
+for delivery. Events are deduplicated by ``id``.
 
 Auth uses the same Cognito credentials as the rest of the platform
 (TIMEBACK_CLIENT_ID / TIMEBACK_CLIENT_SECRET).
 
 Body:  { "data": [ { ...caliper event... }, ... ] }
+GET params: flush=0 to only read metrics
 """
 
 import json
-from datetime import datetime, timezone
+import time
 from http.server import BaseHTTPRequestHandler
-from api._helpers import get_token, send_json
-
-import requests
-
-CALIPER_URL = "https://caliper.alpha-1edtech.ai/caliper/event"
-SENSOR_ID = "https://alphalearn.alpha.school"
+from api._caliper import enqueue_events, flush, get_metrics
+from api._helpers import get_query_params, send_json
 
 
 class handler(BaseHTTPRequestHandler):
@@ -28,6 +27,13 @@ class handler(BaseHTTPRequestHandler):
         self.send_header("Access-Control-Allow-Headers", "Content-Type")
         self.end_headers()
 
+    def do_GET(self):
+        params = get_query_params(self)
+        run = None
+        if params.get("flush", "1") != "0":
+            run = flush(deadline=time.time() + 45)
+        send_json(self, {"flush": run, "metrics": get_metrics()})
+
     def do_POST(self):
         try:
             cl = int(self.headers.get("Content-Length", 0))
@@ -40,49 +46,14 @@ class handler(BaseHTTPRequestHandler):
         if not events:
             send_json(self, {"error": "No events provided"}, 400)
             return
+        if not all(isinstance(e, dict) for e in events):
+            send_json(self, {"error": "Events must be objects"}, 400)
+            return
 
-        # Build Caliper Envelope
-        envelope = {
-            "sensor": SENSOR_ID,
-            "sendTime": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-            "dataVersion": "http://purl.imsglobal.org/ctx/caliper/v1p2",
-            "data": events,
-        }
-
-        try:
-            token = get_token()
-            resp = requests.post(
-                CALIPER_URL,
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json",
-                },
-                json=envelope,
-                timeout=15,
-            )
-
-            if resp.status_code in (200, 201, 204):
-                result = {}
-                try:
-                    result = resp.json()
-                except Exception:
-                    pass
-                send_json(self, {
-                    "status": "success",
-                    "sent": len(events),
-                    "response": result,
-                })
-            else:
-                error_body = ""
-                try:
-                    error_body = resp.text[:500]
-                except Exception:
-                    pass
-                send_json(self, {
-                    "status": "error",
-                    "httpStatus": resp.status_code,
-                    "body": error_body,
-                    "sent": 0,
-                }, resp.status_code if resp.status_code < 500 else 502)
-        except Exception as e:
-            send_json(self, {"status": "error", "error": str(e), "sent": 0}, 500)
+        result = enqueue_events(events)
+        if "status" in result and not result["sent"]:
+            # KV unavailable and the direct send failed
+            send_json(self, {"status": "error", "httpStatus": result["status"], "sent": 0}, 502)
+            return
+        send_json(self, {"status": "queued" if result["queued"] else "success", **result},
+                  202 if result["queued"] else 200)
@@ -1,8 +1,15 @@
 """GET /api/compute-skill-scores?studentId=...&courseId=... — Compute skill mastery scores.
 
-Read-only computation. Does NOT store anything.
 Loads skill tree + question analysis from KV, fetches student quiz results
-from PowerPath, computes per-skill scores with decay.
+from PowerPath, computes per-skill scores with decay. PowerPath answers are
+harvested by api/_answer_harvest.py.
+
+Writes to KV (nothing upstream):
+  skill_scores:{student}:{course}    the computed scores, on every request
+  answer_harvest:{student}:{course}  harvested PowerPath answers per CR, on
+                                     every harvest (inline or background)
+  student_answers:{student}:{course} harvested answers backfilled into the
+                                     answer log, marked source "powerpath"
 
 Scoring model (evidence-based):
   - Each skill starts at 0 (unknown), max 100 (mastered)
@@ -17,10 +24,10 @@ import re
 import time
 from http.server import BaseHTTPRequestHandler
 
-import requests
-
-from api._helpers import API_BASE, api_headers, send_json, get_query_params
+from api._answer_harvest import harvest_answers, refresh_in_background, start_harvest
+from api._helpers import send_json, get_query_params
 from api._kv import kv_get, kv_set
+from api._pp100_index import best_pp100_id
 
 # Scoring constants
 CORRECT_POINTS = 15
@@ -28,6 +35,7 @@ WRONG_POINTS = -10
 DAILY_DECAY = 0.98  # ~2% daily loss → ~50% retained after 35 days
 MAX_SCORE = 100
 MIN_SCORE = 0
+HARVEST_BUDGET = 25  # seconds a request may spend reading PowerPath answers
 
 
 def _parse_skill_nodes(mermaid_code: str) -> dict:
@@ -64,47 +72,16 @@ def _build_skill_to_questions(q_to_skills: dict) -> dict:
 
 def _resolve_pp100_course_id(course_id: str) -> str:
     """Find the PP100 course ID for a given admin course ID.
-    Checks KV first, then searches all courses as fallback."""
+    Checks the confirmed KV alias first, then the PP100 alias index."""
     # Check KV cache first
     pp100_id = kv_get(f"pp100_course_id:{course_id}")
     if pp100_id:
         return pp100_id
 
-    # Fallback: search courses for PP100 version
     try:
-        from api._helpers import fetch_one, fetch_all_paginated
-        course_data, status = fetch_one(f"/ims/oneroster/rostering/v1p2/courses/{course_id}")
-        if not course_data:
-            return course_id
-        course_obj = course_data.get("course", course_data)
-        original_title = (course_obj.get("title") or "").lower()
-
-        stop_words = {"the", "and", "for", "with", "a", "an", "in", "of", "to"}
-        keywords = [w for w in original_title.replace("-", " ").replace(":", " ").split() if w and w not in stop_words]
-
-        expanded = original_title
-        for abbr, full in [("us ", "united states "), ("u.s. ", "united states ")]:
-            expanded = expanded.replace(abbr, full)
-
-        all_courses = fetch_all_paginated("/ims/oneroster/rostering/v1p2/courses", "courses")
-        for c in all_courses:
-            cid = c.get("sourcedId", "")
-            title = (c.get("title") or "").lower()
-            if cid == course_id:
-                continue
-            if "pp100" not in title and "pp100" not in cid.lower():
-                continue
-            match_count = sum(1 for kw in keywords if kw in title)
-            for word in expanded.replace("-", " ").split():
-                if len(word) >= 4 and word in title:
-                    match_count += 1
-            if match_count >= 1:
-                from api._kv import kv_set as _kv_set
-                _kv_set(f"pp100_course_id:{course_id}", cid)
-                return cid
+        return best_pp100_id(course_id) or course_id
     except Exception:
-        pass
-    return course_id
+        return course_id
 
 
 def _fetch_student_answers(student_id: str, course_id: str) -> dict:
@@ -135,123 +112,20 @@ def _fetch_student_answers(student_id: str, course_id: str) -> dict:
                             "timestamp": entry.get("timestamp", 0),
                         }
 
-    # Secondary source: PowerPath assessment progress (for adaptive quizzes)
+    # Secondary source: PowerPath assessment progress (for adaptive quizzes),
+    # harvested concurrently and backfilled into the KV log above
     if not answers:
-        answers = _fetch_powerpath_answers(student_id, course_id, pp100_id)
-
-    return answers
-
-
-def _fetch_powerpath_answers(student_id: str, course_id: str, pp100_id: str) -> dict:
-    """Fallback: fetch answers from PowerPath getAssessmentProgress."""
-    answers = {}
-    headers = api_headers()
-
-    tree = None
-    ids_to_try = [pp100_id]
-    if course_id != pp100_id:
-        ids_to_try.append(course_id)
-
-    for cid in ids_to_try:
-        for url in [
-            f"{API_BASE}/powerpath/lessonPlans/{cid}/{student_id}",
-            f"{API_BASE}/powerpath/lessonPlans/tree/{cid}",
-        ]:
-            try:
-                resp = requests.get(url, headers=headers, timeout=30)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if data:
-                        tree = data
-                        break
-            except Exception:
-                continue
-        if tree:
-            break
-
-    if not tree:
-        return answers
-
-    cr_ids = _extract_assessment_cr_ids(tree)
-    for cr_id in cr_ids[:100]:
-        try:
-            resp = requests.get(
-                f"{API_BASE}/powerpath/getAssessmentProgress",
-                headers=headers,
-                params={"student": student_id, "lesson": cr_id},
-                timeout=10,
-            )
-            if resp.status_code == 200:
-                progress = resp.json()
-                for q in progress.get("questions", []):
-                    qid = q.get("id", "")
-                    answered = q.get("answered", False)
-                    correct = q.get("correct")
-                    if qid and (answered or correct is not None):
-                        answers[qid] = {
-                            "correct": bool(correct),
-                            "answered": True,
-                        }
-        except Exception:
-            continue
+        harvest = harvest_answers(student_id, course_id, pp100_id, deadline=time.time() + HARVEST_BUDGET)
+        if harvest["pending"] or harvest["busy"]:
+            start_harvest(student_id, course_id, pp100_id)
+        answers = harvest["answers"]
+    else:
+        # Answers backfilled by an earlier harvest: pick up changed CRs for next time
+        refresh_in_background(student_id, course_id, pp100_id)
 
     return answers
 
 
-def _extract_assessment_cr_ids(tree) -> list[str]:
-    """Walk the PowerPath lesson plan tree and extract component resource
-    sourcedIds for assessment-type resources (quiz/bank CRs).
-    The CR sourcedId (e.g., USHI23-l2-r104063-bank-v1) is what PowerPath
-    uses as the lesson ID in getAssessmentProgress."""
-    cr_ids = []
-
-    # Navigate to the lesson plan
-    inner = tree
-    if isinstance(inner, dict):
-        inner = inner.get("lessonPlan", inner)
-        if isinstance(inner, dict) and inner.get("lessonPlan"):
-            inner = inner["lessonPlan"]
-
-    units = inner.get("subComponents", []) if isinstance(inner, dict) else []
-    if isinstance(inner, list):
-        units = inner
-
-    for unit in units:
-        if not isinstance(unit, dict):
-            continue
-
-        lessons = unit.get("subComponents", [])
-        # Also handle unit-level resources
-        all_items = lessons + [unit]
-
-        for lesson in all_items:
-            if not isinstance(lesson, dict):
-                continue
-            for cr in lesson.get("componentResources", []):
-                if not isinstance(cr, dict):
-                    continue
-                cr_sid = cr.get("sourcedId", "")
-                res = cr.get("resource", {})
-                if not isinstance(res, dict):
-                    continue
-                meta = res.get("metadata") or {}
-                rtype = (meta.get("type", "") or res.get("type", "")).lower()
-                rurl = meta.get("url", "") or ""
-
-                # Skip videos and article stimuli
-                if rtype == "video":
-                    continue
-                if "stimuli" in rurl:
-                    continue
-
-                # Assessment-type CRs: use the CR sourcedId as the lesson ID
-                if cr_sid and ("bank" in cr_sid.lower() or "assessment" in rtype or (rurl and "assessment" in rurl)):
-                    if cr_sid not in cr_ids:
-                        cr_ids.append(cr_sid)
-
-    return cr_ids
-
-
 def _compute_scores(skill_nodes: dict, skill_to_questions: dict, answers: dict) -> dict:
     """Compute per-skill mastery scores with Ebbinghaus daily decay.
 
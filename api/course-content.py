@@ -4,17 +4,25 @@ Fetches the lesson plan tree and student progress from the PowerPath API,
 supplemented with direct OneRoster gradebook results.
 
 Endpoints used:
-  /powerpath/lessonPlans/tree/{courseId} — full tree (units → lessons → items)
+  /powerpath/lessonPlans/tree/{courseId} — full tree (units → lessons → items),
+      read through the shared tree cache (api/_tree_cache.py)
   /powerpath/lessonPlans/{courseId}/{userId} — student-specific lesson plan
   /powerpath/lessonPlans/getCourseProgress/{courseId}/student/{userId} — progress
-  /ims/oneroster/gradebook/v1p2/assessmentResults — direct gradebook results
+  /ims/oneroster/gradebook/v1p2/assessmentResults — direct gradebook results,
+      synced incrementally into a per-student index (api/_results_index.py)
+
+All four are requested concurrently. The merged response is memoized per
+(course, student) for a short TTL (api/_content_cache.py); result writers
+invalidate it. Pass fresh=1 to bypass the cache.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler
 import requests
+from api._content_cache import get_cached, put_cached
 from api._helpers import API_BASE, api_headers, send_json, get_query_params
-
-GRADEBOOK = f"{API_BASE}/ims/oneroster/gradebook/v1p2"
+from api._results_index import merge_into_progress, sync_student_results
+from api._tree_cache import get_tree
 
 
 class handler(BaseHTTPRequestHandler):
@@ -34,63 +42,59 @@ class handler(BaseHTTPRequestHandler):
             send_json(self, {"error": "Need courseId"}, 400)
             return
 
+        if user_id and params.get("fresh") != "1":
+            cached = get_cached(course_id, user_id)
+            if cached:
+                send_json(self, {**cached, "cached": True})
+                return
+
         result = {"lessonPlan": None, "courseProgress": None, "tree": None}
 
         try:
             headers = api_headers()
 
-            # 1. Student-specific lesson plan (best: personalized + has completion status)
-            if user_id:
-                try:
-                    resp = requests.get(
-                        f"{API_BASE}/powerpath/lessonPlans/{course_id}/{user_id}",
-                        headers=headers,
-                        timeout=30,
-                    )
-                    if resp.status_code == 200:
-                        result["lessonPlan"] = resp.json()
-                except Exception:
-                    pass
+            # All four sources are independent — issue them together.
+            # The tree (fallback when there is no student lesson plan) comes
+            # from the shared cache, so fetching it speculatively is cheap.
+            # A cold tree fetch that turns out not to be needed finishes in the
+            # background (and fills the cache) rather than delaying the response.
+            pool = ThreadPoolExecutor(max_workers=4)
+            try:
+                tree_f = pool.submit(get_tree, course_id)
+                if user_id:
+                    # 1. Student-specific lesson plan (best: personalized + has completion status)
+                    plan_f = pool.submit(
+                        _get_json, f"{API_BASE}/powerpath/lessonPlans/{course_id}/{user_id}", headers, 30)
+                    # 3. Student progress (completion status for assessments)
+                    progress_f = pool.submit(
+                        _get_json,
+                        f"{API_BASE}/powerpath/lessonPlans/getCourseProgress/{course_id}/student/{user_id}",
+                        headers, 30)
+                    # 4. Direct OneRoster assessment results: incremental sync of
+                    #    the student's ALI → result index (merged below)
+                    or_f = pool.submit(sync_student_results, user_id, headers)
 
-            # 2. Full lesson plan tree (fallback: structure without student-specific status)
-            if not result["lessonPlan"]:
-                try:
-                    resp = requests.get(
-                        f"{API_BASE}/powerpath/lessonPlans/tree/{course_id}",
-                        headers=headers,
-                        timeout=30,
-                    )
-                    if resp.status_code == 200:
-                        result["tree"] = resp.json()
-                except Exception:
-                    pass
+                    result["lessonPlan"] = _result_or_none(plan_f)
+                    result["courseProgress"] = _result_or_none(progress_f)
 
-            # 3. Student progress (completion status for assessments)
-            if user_id:
-                try:
-                    resp = requests.get(
-                        f"{API_BASE}/powerpath/lessonPlans/getCourseProgress/{course_id}/student/{user_id}",
-                        headers=headers,
-                        timeout=30,
-                    )
-                    if resp.status_code == 200:
-                        result["courseProgress"] = resp.json()
-                except Exception:
-                    pass
+                # 2. Full lesson plan tree (fallback: structure without student-specific status)
+                if not result["lessonPlan"]:
+                    result["tree"] = _result_or_none(tree_f)
+            finally:
+                pool.shutdown(wait=False)
 
-            # 4. Supplement with direct OneRoster assessment results
             # PowerPath's getCourseProgress may not include results written
-            # directly to OneRoster via submit-result. Fetch them separately
-            # and merge into courseProgress so the course page sees completions.
+            # directly to OneRoster via submit-result. Merge them into
+            # courseProgress so the course page sees completions.
             if user_id and result.get("courseProgress"):
                 try:
-                    _merge_oneroster_results(
-                        result["courseProgress"], user_id, headers
-                    )
+                    merge_into_progress(result["courseProgress"], _result_or_none(or_f) or {})
                 except Exception:
                     pass
 
             result["success"] = True
+            if user_id:
+                put_cached(course_id, user_id, result)
             send_json(self, result)
 
         except Exception as e:
@@ -99,78 +103,13 @@ class handler(BaseHTTPRequestHandler):
             send_json(self, result, 500)
 
 
-def _merge_oneroster_results(course_progress, user_id, headers):
-    """Fetch assessment results from OneRoster and merge missing ones
-    into courseProgress lineItems so the course page sees them."""
-    line_items = course_progress.get("lineItems") or []
-    if not line_items:
-        return
-
-    # Build set of ALI UUIDs we care about
-    ali_set = set()
-    for item in line_items:
-        ali = item.get("assessmentLineItemSourcedId", "")
-        if ali:
-            ali_set.add(ali)
-
-    if not ali_set:
-        return
-
-    # Fetch all assessment results for this student from OneRoster
+def _result_or_none(future):
     try:
-        resp = requests.get(
-            f"{GRADEBOOK}/assessmentResults",
-            headers=headers,
-            params={"filter": f"student.sourcedId='{user_id}'"},
-            timeout=15,
-        )
-        if resp.status_code != 200:
-            return
-        or_results = resp.json().get("assessmentResults", [])
+        return future.result()
     except Exception:
-        return
-
-    if not or_results:
-        return
-
-    # Build map: ALI sourcedId -> best result (prefer "fully graded")
-    ali_to_result = {}
-    for r in or_results:
-        ali = (r.get("assessmentLineItem") or {}).get("sourcedId", "")
-        if not ali or ali not in ali_set:
-            continue
-        existing = ali_to_result.get(ali)
-        if not existing or r.get("scoreStatus") == "fully graded":
-            ali_to_result[ali] = r
-
-    if not ali_to_result:
-        return
-
-    # Merge into courseProgress lineItems
-    for item in line_items:
-        ali = item.get("assessmentLineItemSourcedId", "")
-        if ali not in ali_to_result:
-            continue
-
-        or_result = ali_to_result[ali]
-        or_id = or_result.get("sourcedId", "")
-
-        # Check if this result is already in the lineItem
-        existing_results = item.get("results") or []
-        already_there = any(
-            r.get("sourcedId") == or_id for r in existing_results
-        )
-        if already_there:
-            continue
-
-        # Add the OneRoster result to this lineItem
-        if not item.get("results"):
-            item["results"] = []
-        item["results"].append({
-            "sourcedId": or_id,
-            "scoreStatus": or_result.get("scoreStatus", ""),
-            "score": or_result.get("score"),
-            "scoreDate": or_result.get("scoreDate", ""),
-            "textScore": or_result.get("textScore", ""),
-            "metadata": or_result.get("metadata"),
-        })
+        return None
+
+
+def _get_json(url, headers, timeout):
+    resp = requests.get(url, headers=headers, timeout=timeout)
+    return resp.json() if resp.status_code == 200 else None
@@ -0,0 +1,63 @@
+"""GET /api/dashboard?userId=...&email=...&startDate=...&endDate=...&timezone=...
+
+One call for the student dashboard. Runs the requested sections
+concurrently with a single access token and deduplicated upstream calls
+(see api/_dashboard.py):
+
+  xp           — same body as /api/user-xp
+  enrollments  — same body as /api/enrollments (GET)
+  timeSaved    — same body as /api/time-saved
+  goals        — same body as /api/goals (GET)
+  lessonCount  — same body as /api/lesson-count (startDate/endDate)
+  analytics    — same body as /api/analytics (email or studentId, dates, timezone)
+
+Query params:
+  sections — comma-separated subset (default: all; analytics only when
+             email or studentId is given)
+  fresh=1  — bypass the per-section KV cache
+
+Returns:
+  { userId, sections: { name: body | null }, errors: { name: message },
+    meta: { name: { cached, age | ms } } }
+A failing section doesn't fail the request.
+"""
+
+from http.server import BaseHTTPRequestHandler
+
+from api._dashboard import DEFAULT_SECTIONS, SECTIONS, build_dashboard
+from api._helpers import send_json, get_query_params
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self):
+        params = get_query_params(self)
+        user_id = params.get("userId", "").strip()
+
+        if not user_id:
+            send_json(self, {"error": "Missing 'userId' query param"}, 400)
+            return
+
+        if params.get("sections"):
+            sections = [s.strip() for s in params["sections"].split(",") if s.strip()]
+            unknown = [s for s in sections if s not in SECTIONS]
+            if unknown:
+                send_json(self, {"error": f"Unknown sections: {', '.join(unknown)}"}, 400)
+                return
+        else:
+            sections = [s for s in DEFAULT_SECTIONS
+                        if s != "analytics" or params.get("email") or params.get("studentId")]
+
+        args = {k: params.get(k, "") for k in ("email", "studentId", "startDate", "endDate", "timezone")}
+        args["userId"] = user_id
+
+        try:
+            send_json(self, build_dashboard(args, sections, fresh=params.get("fresh") == "1"))
+        except Exception as e:
+            send_json(self, {"error": str(e), "userId": user_id}, 500)
@@ -2,11 +2,14 @@
 
 Query params:
   id: string (required) - The result sourcedId to delete
+  studentId: string (optional) - owner, for the XP ledger when the result
+      wasn't written through this app
 """
 
 from http.server import BaseHTTPRequestHandler
 import requests
 from api._helpers import API_BASE, api_headers, send_json, get_query_params
+from api._xp_ledger import remove_result
 
 
 GRADEBOOK = f"{API_BASE}/ims/oneroster/gradebook/v1p2"
@@ -45,6 +48,7 @@ class handler(BaseHTTPRequestHandler):
                 resp = requests.delete(url, headers=headers, timeout=30)
             
             if resp.status_code in (200, 204):
+                remove_result(result_id, params.get("studentId", ""))
                 send_json(self, {
                     "status": "success",
                     "deleted": result_id
@@ -1,6 +1,7 @@
 """POST /api/edit-course-save
 
-Saves the editable course structure to KV.
+Saves the editable course structure to KV and bumps the course's cached
+lesson-plan tree version (see api/_tree_cache.py).
 Body: { courseId: string, units: [...] }
 """
 
@@ -10,6 +11,7 @@ from http.server import BaseHTTPRequestHandler
 
 from api._helpers import send_json
 from api._kv import kv_set
+from api._tree_cache import bump_tree_version
 
 
 class handler(BaseHTTPRequestHandler):
@@ -48,6 +50,7 @@ class handler(BaseHTTPRequestHandler):
 
         ok = kv_set(f"course_edit:{course_id}", data)
         if ok:
+            bump_tree_version(course_id)
             send_json(self, {"success": True, "lastModified": data["lastModified"]})
         else:
             send_json(self, {"error": "Failed to save to KV"}, 500)
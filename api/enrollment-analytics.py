@@ -1,10 +1,13 @@
 """GET /api/enrollment-analytics?enrollmentId=...&startDate=...&endDate=... — Per-enrollment facts (EduBridge)
 
 Docs: https://docs.timeback.com/beta/api-reference/beyond-ai/edubridge/analytics/list-all-facts-for-a-given-enrollment
+
+Closed days are served from a per-day cache (api/_analytics_cache.py).
 """
 
 from http.server import BaseHTTPRequestHandler
-from api._helpers import fetch_with_params, send_json, get_query_params
+from api._analytics_cache import cached_facts
+from api._helpers import send_json, get_query_params
 
 
 class handler(BaseHTTPRequestHandler):
@@ -29,8 +32,8 @@ class handler(BaseHTTPRequestHandler):
             if timezone:
                 api_params["timezone"] = timezone
 
-            data, status = fetch_with_params(
-                f"/edubridge/analytics/enrollment/{enrollment_id}", api_params
+            data, status = cached_facts(
+                f"/edubridge/analytics/enrollment/{enrollment_id}", api_params, "enrollment", [enrollment_id]
             )
             if data:
                 send_json(self, data)
@@ -12,7 +12,9 @@ import json
 from http.server import BaseHTTPRequestHandler
 
 import requests
+from api._dashboard import invalidate_sections
 from api._helpers import API_BASE, api_headers, fetch_one, send_json, get_query_params
+from api._xp_ledger import mark_stale
 
 
 class handler(BaseHTTPRequestHandler):
@@ -92,6 +94,11 @@ class handler(BaseHTTPRequestHandler):
                     pass
 
             if deleted:
+                # Callers that know the student get a fresh dashboard immediately
+                user_id = (body.get("userId") or "").strip()
+                if user_id:
+                    invalidate_sections(user_id, "enrollments")
+                    mark_stale(user_id)
                 send_json(self, {"success": True, "message": "Enrollment removed"})
             else:
                 send_json(self, {"success": False, "error": "Could not remove enrollment"}, 422)
@@ -136,6 +143,8 @@ class handler(BaseHTTPRequestHandler):
                 data = {"status": resp.status_code}
 
             if resp.status_code in (200, 201):
+                invalidate_sections(user_id, "enrollments")
+                mark_stale(user_id)
                 send_json(self, {"success": True, "enrollment": data.get("data", data)}, 201)
             else:
                 err = ""
@@ -6,13 +6,21 @@ Body:
   studentId: string (required) - student sourcedId
   lessonId: string (required) - lesson sourcedId (e.g. "USHI23-l10-r104084-bank-v1")
   score: number (optional) - score percentage (0-100), included in finalize if provided
+
+Responses still in the write-behind queue (api/_answer_queue.py) are
+flushed first; if they can't be, the reply is 503 { retry, pending } and
+the client should try again. Responses PowerPath rejected come back as
+``rejected``.
 """
 
 import json
 from http.server import BaseHTTPRequestHandler
 
 import requests
+from api._answer_queue import failed_answers, flush_answers, pending_answers
+from api._content_cache import invalidate_student
 from api._helpers import API_BASE, api_headers, send_json
+from api._progress_cache import get_progress
 
 
 class handler(BaseHTTPRequestHandler):
@@ -39,6 +47,17 @@ class handler(BaseHTTPRequestHandler):
             send_json(self, {"error": "Missing studentId or lessonId"}, 400)
             return
 
+        # Every queued response must reach PowerPath before it scores the attempt
+        if not flush_answers(student_id, lesson_id):
+            send_json(self, {
+                "status": "error",
+                "message": "Responses are still being saved — try again",
+                "pending": len(pending_answers(student_id, lesson_id)),
+                "retry": True,
+            }, 503)
+            return
+        rejected = failed_answers(student_id, lesson_id)
+
         headers = api_headers()
         debug = []
 
@@ -56,7 +75,8 @@ class handler(BaseHTTPRequestHandler):
             if resp.status_code == 401:
                 headers = api_headers()
                 resp = requests.post(url, headers=headers, json=payload, timeout=30)
-            
+            invalidate_student(student_id)
+
             debug.append({
                 "step": "finalStudentAssessmentResponse",
                 "url": url,
@@ -81,14 +101,9 @@ class handler(BaseHTTPRequestHandler):
             pp_score = None
             pp_accuracy = None
             try:
-                progress_resp = requests.get(
-                    f"{API_BASE}/powerpath/getAssessmentProgress",
-                    headers=headers,
-                    params={"student": student_id, "lesson": lesson_id},
-                    timeout=10
-                )
-                if progress_resp.status_code == 200:
-                    progress = progress_resp.json()
+                # max_age=0: read past the snapshot; the fresh payload replaces it
+                progress, progress_status = get_progress(student_id, lesson_id, headers, max_age=0, timeout=10)
+                if progress is not None:
                     xp_earned = progress.get("xp", 0)
                     multiplier = progress.get("multiplier", 1)
                     pp_score = progress.get("score")
@@ -103,8 +118,7 @@ class handler(BaseHTTPRequestHandler):
                 else:
                     debug.append({
                         "step": "getAssessmentProgress",
-                        "status": progress_resp.status_code,
-                        "body": progress_resp.text[:300]
+                        "status": progress_status,
                     })
             except Exception as e:
                 debug.append({"step": "getAssessmentProgress", "error": str(e)})
@@ -120,6 +134,7 @@ class handler(BaseHTTPRequestHandler):
                     "powerpathScore": pp_score,
                     "powerpathAccuracy": pp_accuracy,
                     "response": finalize_data,
+                    "rejected": rejected,
                     "debug": debug
                 })
             else:
@@ -131,6 +146,7 @@ class handler(BaseHTTPRequestHandler):
                     "multiplier": multiplier,
                     "powerpathScore": pp_score,
                     "powerpathAccuracy": pp_accuracy,
+                    "rejected": rejected,
                     "debug": debug
                 }, 200 if xp_earned > 0 else (resp.status_code if resp.status_code < 500 else 502))
 
@@ -1,294 +1,81 @@
 """POST /api/find-course-tests — Find all quiz/assessment resources for a course.
 
 Receives { courseId, courseCode }.
-Uses the PowerPath lesson plan tree (with enroll+sync if needed) to discover
-all assessment resources. Falls back to OneRoster component resources.
-Returns { tests: [{ id, title, url, lessonType, lessonTitle }, ...], count }.
+Uses the PowerPath lesson plan tree (shared tree cache) to discover all
+assessment resources. Falls back to OneRoster component resources.
+If no tree exists yet, enroll + sync is queued (see /api/provision-course)
+and the response carries provisioning: true plus provisioningCourseIds to
+poll via /api/provision-status; call again once they are done.
+Returns { tests: [{ id, title, url, lessonType, lessonTitle }, ...], count,
+provisioning, provisioningCourseIds }.
 """
 
 import json
 import re
 from http.server import BaseHTTPRequestHandler
 
-import requests
-
-from api._helpers import (
-    API_BASE, CLIENT_ID, CLIENT_SECRET,
-    api_headers, fetch_all_paginated, fetch_one, send_json, get_token,
-)
+from api._helpers import fetch_all_paginated, send_json
+from api._course_tree import extract_assessments as _extract_assessments_from_tree
 from api._kv import kv_set
-
-# Staging/service account (pehal64861@aixind.com)
-SERVICE_USER_ID = "8ea2b8e1-1b04-4cab-b608-9ab524c059c2"
+from api._pp100_index import pp100_ids
+from api._provisioning import enqueue
+from api._tree_cache import get_tree, put_tree
 
 
-# ── PowerPath tree: enroll + sync + fetch ────────────────────────────
+# ── PowerPath tree: fetch, or queue enroll + sync ────────────────────
 
 def _find_pp100_course_ids(course_id: str) -> list[str]:
-    """Find PP100 course IDs that correspond to the given course.
-    Searches for courses with 'PP100' in the title matching the same subject."""
+    """Find PP100 course IDs that correspond to the given course, best match
+    first, from the PP100 alias index (see api/_pp100_index.py)."""
     try:
-        # Get the original course's title to match against
-        from api._helpers import fetch_one
-        course_data, status = fetch_one(f"/ims/oneroster/rostering/v1p2/courses/{course_id}")
-        if not course_data:
-            return []
-        course_obj = course_data.get("course", course_data)
-        original_title = (course_obj.get("title") or "").lower()
-
-        # Extract key subject words from the title (keep short words like "us", "ap")
-        stop_words = {"the", "and", "for", "with", "a", "an", "in", "of", "to"}
-        keywords = []
-        for word in original_title.replace("-", " ").replace(":", " ").split():
-            word = word.strip()
-            if word and word not in stop_words:
-                keywords.append(word)
-
-        # Also extract from course code (e.g., "APUSH" → "apush")
-        course_code_lower = (course_obj.get("courseCode") or "").lower().strip()
-        if course_code_lower:
-            keywords.append(course_code_lower)
-
-        # Build subject fingerprint: expand abbreviations
-        expanded = original_title
-        for abbr, full in [("us ", "united states "), ("u.s. ", "united states "), ("govt", "government"), ("gov ", "government ")]:
-            expanded = expanded.replace(abbr, full)
-
-        # Fetch all courses and find PP100 versions
-        all_courses = fetch_all_paginated(
-            "/ims/oneroster/rostering/v1p2/courses", "courses"
-        )
-        pp100_ids = []
-        for c in all_courses:
-            cid = c.get("sourcedId", "")
-            title = (c.get("title") or "").lower()
-            if cid == course_id:
-                continue
-            if "pp100" not in title and "pp100" not in cid.lower():
-                continue
-            # Check if this PP100 course matches the subject
-            # Match on: any keyword from title, expanded title match, or code substring
-            match_count = sum(1 for kw in keywords if kw in title)
-            # Also check if expanded title shares words
-            for word in expanded.replace("-", " ").split():
-                if len(word) >= 4 and word in title:
-                    match_count += 1
-            if match_count >= 1:  # At least 1 keyword match
-                pp100_ids.append(cid)
-
-        return pp100_ids
+        return pp100_ids(course_id)
     except Exception:
         return []
 
 
-def _get_powerpath_tree(course_id: str) -> tuple[dict | None, list]:
-    """Get the PowerPath lesson plan tree, enrolling + syncing if needed.
+def _get_powerpath_tree(course_id: str) -> tuple[dict | None, list, list]:
+    """Get the PowerPath lesson plan tree, queueing provisioning if needed.
     Also searches for PP100 course versions if the original ID fails.
-    Returns (tree_data, debug_log)."""
+    Returns (tree_data, debug_log, provisioning_course_ids)."""
     debug = []
-    headers = api_headers()
+
+    # Step 0: Shared tree cache (generic + service-user tree, cached PP100 alias)
+    tree = get_tree(course_id)
+    if tree:
+        debug.append("tree_cache: ok")
+        return tree, debug, []
 
     # Build list of IDs to try: original + PP100 versions
     ids_to_try = [course_id]
-    pp100_ids = _find_pp100_course_ids(course_id)
-    for pid in pp100_ids:
+    pp100_candidates = _find_pp100_course_ids(course_id)
+    for pid in pp100_candidates:
         if pid not in ids_to_try:
             ids_to_try.append(pid)
     debug.append(f"ids_to_try={ids_to_try}")
 
-    # Helper: save the PP100 mapping when we find the correct course
-    def _save_pp100(cid):
+    # Helper: save the PP100 mapping (and cache the tree under the original ID)
+    def _save_pp100(cid, tree):
         if cid != course_id:
             kv_set(f"pp100_course_id:{course_id}", cid)
+        put_tree(course_id, tree)
 
-    # Step 1: Try generic tree endpoint for each ID
-    for cid in ids_to_try:
-        tree = _try_tree(f"{API_BASE}/powerpath/lessonPlans/tree/{cid}", headers)
+    # Steps 1-2: generic tree, then service user tree, for each PP100 ID
+    for cid in ids_to_try[1:]:
+        tree = get_tree(cid)
         if tree:
-            _save_pp100(cid)
-            debug.append(f"tree_generic: ok ({cid})")
-            return tree, debug
-    debug.append("tree_generic: all failed")
+            _save_pp100(cid, tree)
+            debug.append(f"tree_cache: ok ({cid})")
+            return tree, debug, []
+    debug.append("tree_cache: all failed")
 
-    # Step 2: Try with service user ID for each
+    # Step 3: Queue enroll + sync for each ID not yet provisioned (never inline)
+    provisioning = []
     for cid in ids_to_try:
-        tree = _try_tree(f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}", headers)
-        if tree:
-            _save_pp100(cid)
-            debug.append(f"tree_user: ok ({cid})")
-            return tree, debug
-    debug.append("tree_user: all failed")
-
-    # Step 3: Enroll + sync for each ID, then retry
-    for cid in ids_to_try:
-        _enroll_service_account(cid, headers)
-        _sync_course(cid, headers)
-        debug.append(f"enrolled+synced: {cid}")
-
-        headers = api_headers()  # refresh token
-        tree = _try_tree(f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}", headers)
-        if tree:
-            _save_pp100(cid)
-            debug.append(f"tree_after_sync: ok ({cid})")
-            return tree, debug
-
-    debug.append("tree_after_sync: all failed")
-    return None, debug
-
-
-def _try_tree(url: str, headers: dict) -> dict | None:
-    """Try to fetch a tree from a URL. Returns parsed JSON or None."""
-    try:
-        resp = requests.get(url, headers=headers, timeout=30)
-        if resp.status_code == 401:
-            headers = api_headers()
-            resp = requests.get(url, headers=headers, timeout=30)
-        if resp.status_code == 200:
-            data = resp.json()
-            if data:
-                return data
-    except Exception:
-        pass
-    return None
-
-
-def _enroll_service_account(course_id: str, headers: dict):
-    """Enroll the service account in a course via EduBridge."""
-    try:
-        requests.post(
-            f"{API_BASE}/edubridge/enrollments/enroll/{SERVICE_USER_ID}/{course_id}",
-            headers=headers,
-            json={"role": "student"},
-            timeout=15,
-        )
-    except Exception:
-        pass
-
-
-def _sync_course(course_id: str, headers: dict):
-    """Trigger PowerPath to provision lesson plans for the course."""
-    try:
-        resp = requests.post(
-            f"{API_BASE}/powerpath/lessonPlans/course/{course_id}/sync",
-            headers=headers,
-            json={},
-            timeout=60,
-        )
-        if resp.status_code == 401:
-            headers = api_headers()
-            requests.post(
-                f"{API_BASE}/powerpath/lessonPlans/course/{course_id}/sync",
-                headers=headers,
-                json={},
-                timeout=60,
-            )
-    except Exception:
-        pass
-
-
-# ── Extract assessments from tree ────────────────────────────────────
-
-def _extract_assessments_from_tree(tree: dict) -> list[dict]:
-    """Walk the PowerPath tree and extract all assessment resources.
-
-    Also captures video and article/stimulus URLs per lesson and attaches
-    them to each test object as ``videoUrl`` and ``articleUrl`` so that
-    downstream consumers (e.g. relevance analysis) can pair questions with
-    their lesson's learning content.
-    """
-    tests = []
-
-    # Navigate to the actual tree data
-    inner = tree.get("lessonPlan", tree) if isinstance(tree, dict) else tree
-    if isinstance(inner, dict) and inner.get("lessonPlan"):
-        inner = inner["lessonPlan"]
-
-    units = inner.get("subComponents", []) if isinstance(inner, dict) else []
-    if isinstance(inner, list):
-        units = inner
-
-    for unit in units:
-        if not isinstance(unit, dict):
-            continue
-        unit_title = unit.get("title", "")
-        lessons = unit.get("subComponents", [])
-
-        # Handle unit-level resources (e.g., unit tests)
-        unit_resources = unit.get("componentResources", [])
-        if not lessons and unit_resources:
-            _extract_lesson_resources(unit_resources, unit_title, unit_title, tests)
-
-        for lesson in lessons:
-            if not isinstance(lesson, dict):
-                continue
-            lesson_title = lesson.get("title", "")
-            _extract_lesson_resources(
-                lesson.get("componentResources", []),
-                lesson_title,
-                unit_title,
-                tests,
-            )
-
-    return tests
-
-
-def _parse_resource_meta(res_wrapper: dict) -> tuple[str, str, str, str]:
-    """Return (url, res_id, title, rtype) from a componentResource wrapper."""
-    res = res_wrapper.get("resource", res_wrapper) if isinstance(res_wrapper, dict) else res_wrapper
-    if not isinstance(res, dict):
-        return "", "", "", ""
-    meta = res.get("metadata") or {}
-    rurl = meta.get("url", "") or res.get("url", "") or meta.get("href", "") or res.get("href", "")
-    res_id = res.get("id", "") or res.get("sourcedId", "") or ""
-    res_title = res.get("title", "") or ""
-    rtype = (meta.get("type", "") or res.get("type", "")).lower()
-    return rurl, res_id, res_title, rtype
-
-
-def _extract_lesson_resources(
-    component_resources: list,
-    lesson_title: str,
-    unit_title: str,
-    tests: list,
-):
-    """Extract assessments from a lesson's componentResources list.
-
-    First pass collects the lesson's video and article URLs.
-    Second pass adds assessment entries with those URLs attached.
-    """
-    video_url = ""
-    article_url = ""
-
-    # First pass: find video and article URLs for this lesson
-    for rw in component_resources:
-        rurl, _rid, _rtitle, rtype = _parse_resource_meta(rw)
-        if rtype == "video" and rurl:
-            video_url = video_url or rurl
-        elif rurl and "stimuli" in rurl.lower():
-            article_url = article_url or rurl
-
-    # Second pass: collect assessment resources and attach content URLs
-    for rw in component_resources:
-        rurl, res_id, res_title, rtype = _parse_resource_meta(rw)
-
-        # Skip non-assessment resources
-        if rtype == "video":
-            continue
-        if rurl and "stimuli" in rurl.lower():
-            continue
-
-        if res_id or rurl:
-            if not any(t["id"] == res_id for t in tests):
-                tests.append({
-                    "id": res_id,
-                    "title": res_title or lesson_title,
-                    "url": rurl,
-                    "unitTitle": unit_title,
-                    "lessonTitle": lesson_title,
-                    "lessonType": rtype or "assessment",
-                    "videoUrl": video_url,
-                    "articleUrl": article_url,
-                })
+        job = enqueue(cid)
+        debug.append(f"provision {cid}: {job.get('status')}")
+        if job.get("status") in ("queued", "running"):
+            provisioning.append(cid)
+    return None, debug, provisioning
 
 
 # ── Fallback: OneRoster component resources ──────────────────────────
@@ -384,7 +171,7 @@ class handler(BaseHTTPRequestHandler):
         debug_log = []
 
         # Tier 1: PowerPath lesson plan tree (enroll + sync if needed)
-        tree, tree_debug = _get_powerpath_tree(course_id)
+        tree, tree_debug, provisioning = _get_powerpath_tree(course_id)
         debug_log.extend(tree_debug)
 
         if tree:
@@ -409,5 +196,7 @@ class handler(BaseHTTPRequestHandler):
             "tests": all_tests,
             "count": len(all_tests),
             "sources": sources,
+            "provisioning": bool(provisioning),
+            "provisioningCourseIds": provisioning,
             "_debug": debug_log,
         })
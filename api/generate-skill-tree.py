@@ -13,8 +13,10 @@ from http.server import BaseHTTPRequestHandler
 
 import requests
 
-from api._helpers import API_BASE, api_headers, send_json
+from api._helpers import send_json
 from api._kv import kv_get, kv_set, kv_delete
+from api._course_tree import index_for
+from api._tree_cache import get_tree
 
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
 ANTHROPIC_BATCH_URL = "https://api.anthropic.com/v1/messages/batches"
@@ -30,59 +32,26 @@ def _anthropic_headers():
     }
 
 
-def _fetch_lesson_tree(course_id: str) -> list[dict]:
-    """Fetch the PowerPath lesson plan tree for a course.
-    Returns a list of unit dicts with nested lesson names."""
+def _fetch_lesson_tree(course_id: str):
+    """Fetch the PowerPath lesson plan tree for a course (None if unavailable)."""
     try:
-        headers = api_headers()
-        resp = requests.get(
-            f"{API_BASE}/powerpath/lessonPlans/tree/{course_id}",
-            headers=headers,
-            timeout=30,
-        )
-        if resp.status_code != 200:
-            return []
-        data = resp.json()
-        return data if isinstance(data, list) else [data]
+        return get_tree(course_id)
     except Exception:
-        return []
+        return None
 
 
 def _extract_lesson_names(tree_data) -> str:
-    """Walk the tree structure and extract unit/lesson names as a formatted string."""
+    """List unit/lesson names from the course index as a formatted string."""
+    if not tree_data:
+        return "No lesson data available."
+    index = index_for(tree_data)
     lines = []
-
-    def walk(node, depth=0):
-        if isinstance(node, dict):
-            name = (
-                node.get("title")
-                or node.get("name")
-                or node.get("label")
-                or ""
-            )
-            ntype = (node.get("type") or node.get("nodeType") or "").lower()
-            if name:
-                indent = "  " * depth
-                prefix = "Unit" if "unit" in ntype or depth == 0 else "Lesson"
-                lines.append(f"{indent}- {prefix}: {name}")
-
-            # Recurse into children
-            children = (
-                node.get("children")
-                or node.get("lessons")
-                or node.get("items")
-                or node.get("units")
-                or []
-            )
-            if isinstance(children, list):
-                for child in children:
-                    walk(child, depth + 1)
-
-        elif isinstance(node, list):
-            for item in node:
-                walk(item, depth)
-
-    walk(tree_data)
+    for ui, unit in enumerate(index.units):
+        if unit["title"]:
+            lines.append(f"- Unit: {unit['title']}")
+        for lesson in index.unit_lessons(ui):
+            if lesson["title"]:
+                lines.append(f"  - Lesson: {lesson['title']}")
     return "\n".join(lines) if lines else "No lesson data available."
 
 
@@ -1,7 +1,10 @@
 """POST /api/log-answer — Log a student's question answer to KV.
 
 Fire-and-forget endpoint. Appends to: student_answers:{studentId}:{courseId}
-Each entry: { questionId, choiceId, correct, timestamp }
+Each entry: { questionId, choiceId, correct, timestamp }. Updating an entry
+the answer harvester backfilled (``source: "powerpath"``) makes it the
+viewer's own, so later backfills leave it alone. Writes hold the log's
+lock (api/_answer_harvest.py) when they can get it.
 
 This is a silent observer -- it doesn't affect the quiz flow.
 """
@@ -10,6 +13,7 @@ import json
 import time
 from http.server import BaseHTTPRequestHandler
 
+from api._answer_harvest import lock_answer_log, unlock_answer_log
 from api._helpers import send_json
 from api._kv import kv_get, kv_set
 
@@ -43,6 +47,7 @@ class handler(BaseHTTPRequestHandler):
 
         key = f"student_answers:{student_id}:{course_id}" if course_id else f"student_answers:{student_id}:unknown"
 
+        token = lock_answer_log(key)  # proceed without it rather than drop the answer
         try:
             answers = kv_get(key)
             if not isinstance(answers, list):
@@ -55,6 +60,7 @@ class handler(BaseHTTPRequestHandler):
                     a["choiceId"] = choice_id
                     a["correct"] = correct
                     a["timestamp"] = time.time()
+                    a.pop("source", None)
                     found = True
                     break
 
@@ -71,3 +77,6 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception:
             send_json(self, {"ok": False}, 500)
+        finally:
+            if token:
+                unlock_answer_log(key, token)
@@ -14,8 +14,10 @@ from http.server import BaseHTTPRequestHandler
 
 import requests
 
-from api._helpers import API_BASE, api_headers, fetch_all_paginated, send_json
+from api._helpers import fetch_all_paginated, send_json
 from api._kv import kv_get, kv_set, kv_delete
+from api._course_tree import index_for
+from api._tree_cache import get_tree
 
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
 ANTHROPIC_BATCH_URL = "https://api.anthropic.com/v1/messages/batches"
@@ -59,37 +61,19 @@ def _get_lesson_names(course_id: str, mermaid_code: str) -> list[str]:
 
 
 def _try_powerpath_tree(course_id: str) -> list[str]:
-    """Tier 1: Fetch lesson names from the PowerPath lesson plan tree."""
+    """Tier 1: Lesson names from the PowerPath lesson plan tree (course index).
+    A unit without lessons contributes its own title."""
     try:
-        headers = api_headers()
-        resp = requests.get(
-            f"{API_BASE}/powerpath/lessonPlans/tree/{course_id}",
-            headers=headers,
-            timeout=30,
-        )
-        if resp.status_code != 200:
+        data = get_tree(course_id)
+        if not data:
             return []
-        data = resp.json()
-        tree_data = data if isinstance(data, list) else [data]
+        index = index_for(data)
         names = []
-
-        def walk(node, depth=0):
-            if isinstance(node, dict):
-                name = node.get("title") or node.get("name") or node.get("label") or ""
-                if name and depth > 0:
-                    names.append(name)
-                children = (
-                    node.get("children") or node.get("lessons")
-                    or node.get("items") or node.get("units") or []
-                )
-                if isinstance(children, list):
-                    for child in children:
-                        walk(child, depth + 1)
-            elif isinstance(node, list):
-                for item in node:
-                    walk(item, depth)
-
-        walk(tree_data)
+        for ui, unit in enumerate(index.units):
+            lessons = index.unit_lessons(ui)
+            if not lessons and unit["title"]:
+                names.append(unit["title"])
+            names.extend(les["title"] for les in lessons if les["title"])
         return names
     except Exception:
         return []
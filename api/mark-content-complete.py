@@ -2,7 +2,8 @@
 
 Two-pronged approach (both tested and verified working):
 1. OneRoster assessmentResult — writes to the resource's own ALI
-2. Caliper ActivityCompletedEvent — the official Timeback completion signal
+2. Caliper ActivityCompletedEvent — the official Timeback completion signal,
+   queued in the Caliper outbox (api/_caliper.py)
 
 Body:
   studentId: string (required)
@@ -14,19 +15,149 @@ Body:
   email: string (required for Caliper) - student email
   courseId: string (optional) - course sourcedId
   courseName: string (optional)
+
+Bulk: send ``resources: [{resourceId, componentResId,
+assessmentLineItemSourcedId, contentType?, title?}, ...]`` with the
+student / email / course fields once. Results are written concurrently,
+the Caliper events are queued together (one envelope), and the
+course-content cache is invalidated once.
 """
 
 import json
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from http.server import BaseHTTPRequestHandler
 
 import requests
-from api._helpers import API_BASE, api_headers, get_token, send_json
+from api._caliper import SENSOR_ID, caliper_time, enqueue_events
+from api._content_cache import invalidate_student
+from api._helpers import API_BASE, api_headers, send_json
+
+MAX_BULK = 100
+PUT_WORKERS = 8
+
+
+def _write_result(student_id: str, res: dict, now: datetime, headers: dict) -> dict:
+    """OneRoster: write an assessmentResult to the resource's own ALI."""
+    out = {"oneroster": False}
+    result_id = str(uuid.uuid4())
+    try:
+        result_payload = {
+            "assessmentResult": {
+                "sourcedId": result_id,
+                "status": "active",
+                "dateLastModified": now.isoformat(),
+                "assessmentLineItem": {"sourcedId": res["lineItemId"]},
+                "student": {"sourcedId": student_id},
+                "score": 0,
+                "scoreDate": caliper_time(now),
+                "scoreStatus": "fully graded",
+                "comment": f"{res['title']} - {res['contentType']} completed",
+                "inProgress": "false",
+                "incomplete": "false",
+                "late": "false",
+                "missing": "false",
+                "metadata": {
+                    "timeback.xp": 0,
+                    "timeback.passed": True,
+                    "timeback.contentType": res["contentType"],
+                },
+            }
+        }
+        url = f"{API_BASE}/ims/oneroster/gradebook/v1p2/assessmentResults/{result_id}"
+        resp = requests.put(url, headers=headers, json=result_payload, timeout=15)
+        if resp.status_code == 401:
+            resp = requests.put(url, headers=api_headers(), json=result_payload, timeout=15)
+        out["oneroster"] = resp.status_code in (200, 201)
+        if not out["oneroster"]:
+            out["oneroster_status"] = resp.status_code
+            out["oneroster_body"] = resp.text[:300]
+    except Exception as e:
+        out["oneroster_error"] = str(e)
+    return out
+
+
+def _completed_event(student_id: str, email: str, res: dict, course_id: str, course_name: str,
+                     now: datetime) -> dict:
+    """Caliper ActivityCompletedEvent (official Timeback format)."""
+    run_id = str(uuid.uuid4())
+    component_res_id = res["componentResId"]
+    return {
+        "@context": "http://purl.imsglobal.org/ctx/caliper/v1p2",
+        "id": f"urn:uuid:{run_id}",
+        "type": "ActivityEvent",
+        "action": "Completed",
+        "profile": "TimebackProfile",
+        "eventTime": caliper_time(now),
+        "actor": {
+            "id": f"{API_BASE}/ims/oneroster/rostering/v1p2/users/{student_id}",
+            "type": "TimebackUser",
+            "email": email,
+        },
+        "object": {
+            "id": f"{SENSOR_ID}/activities/{component_res_id}",
+            "type": "TimebackActivityContext",
+            "subject": "Social Studies",
+            "app": {"name": "AlphaLearn"},
+            "activity": {
+                "id": f"{SENSOR_ID}/activities/{component_res_id}",
+                "name": component_res_id,
+            },
+            "course": {
+                "code": course_id or component_res_id.split("-")[0],
+                "name": course_name or "",
+            },
+            "process": True,
+        },
+        "generated": {
+            "id": f"{API_BASE}/ims/metrics/collections/activity/{run_id}",
+            "type": "TimebackActivityMetricsCollection",
+            "items": [{"type": "xpEarned", "value": 0}],
+        },
+        "edApp": SENSOR_ID,
+        "extensions": {"runId": run_id, "courseId": course_id},
+    }
 
 
-CALIPER_URL = "https://caliper.alpha-1edtech.ai/caliper/event"
-SENSOR_ID = "https://alphalearn.alpha.school"
+def _resource(raw: dict) -> dict:
+    resource_id = raw.get("resourceId", "")
+    return {
+        "resourceId": resource_id,
+        "componentResId": raw.get("componentResId", "") or resource_id,
+        "lineItemId": raw.get("assessmentLineItemSourcedId", ""),
+        "contentType": raw.get("contentType", "content"),
+        "title": raw.get("title", resource_id),
+    }
+
+
+def _complete(student_id: str, email: str, course_id: str, course_name: str, resources: list) -> list:
+    """Write every resource's result concurrently and queue their Caliper
+    events together. Returns one ``results`` dict per resource."""
+    now = datetime.now(timezone.utc)
+    headers = api_headers()
+    with ThreadPoolExecutor(max_workers=max(1, min(PUT_WORKERS, len(resources)))) as pool:
+        outcomes = list(pool.map(lambda res: _write_result(student_id, res, now, headers), resources))
+    for out in outcomes:
+        out["caliper"] = False
+
+    if email:
+        try:
+            events = [_completed_event(student_id, email, res, course_id, course_name, now) for res in resources]
+            queued = enqueue_events(events)
+            ok = bool(queued["queued"] or queued.get("sent"))
+            for out in outcomes:
+                out["caliper"] = ok
+                out["caliper_queued"] = bool(queued["queued"])
+                if not ok:
+                    out["caliper_status"] = queued.get("status")
+        except Exception as e:
+            for out in outcomes:
+                out["caliper_error"] = str(e)
+
+    if any(out["oneroster"] or out["caliper"] for out in outcomes):
+        invalidate_student(student_id)
+    return outcomes
 
 
 class handler(BaseHTTPRequestHandler):
@@ -46,128 +177,61 @@ class handler(BaseHTTPRequestHandler):
             return
 
         student_id = body.get("studentId", "")
-        resource_id = body.get("resourceId", "")
-        component_res_id = body.get("componentResId", "") or resource_id
-        line_item_id = body.get("assessmentLineItemSourcedId", "")
-        content_type = body.get("contentType", "content")
-        title = body.get("title", resource_id)
         email = body.get("email", "")
         course_id = body.get("courseId", "")
         course_name = body.get("courseName", "")
 
-        if not student_id or not line_item_id:
+        if "resources" in body:
+            self._handle_bulk(student_id, email, course_id, course_name, body.get("resources"))
+            return
+
+        res = _resource(body)
+        if not student_id or not res["lineItemId"]:
             send_json(self, {
                 "error": "Missing studentId or assessmentLineItemSourcedId",
-                "receivedALI": line_item_id,
-                "receivedComponentResId": component_res_id,
+                "receivedALI": res["lineItemId"],
+                "receivedComponentResId": res["componentResId"],
             }, 400)
             return
 
-        now = datetime.now(timezone.utc)
-        run_id = str(uuid.uuid4())
-        result_id = str(uuid.uuid4())
-        results = {"oneroster": False, "caliper": False}
-
-        # ── 1. OneRoster: write assessmentResult to the resource's own ALI ──
-        try:
-            headers = api_headers()
-            result_payload = {
-                "assessmentResult": {
-                    "sourcedId": result_id,
-                    "status": "active",
-                    "dateLastModified": now.isoformat(),
-                    "assessmentLineItem": {"sourcedId": line_item_id},
-                    "student": {"sourcedId": student_id},
-                    "score": 0,
-                    "scoreDate": now.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-                    "scoreStatus": "fully graded",
-                    "comment": f"{title} - {content_type} completed",
-                    "inProgress": "false",
-                    "incomplete": "false",
-                    "late": "false",
-                    "missing": "false",
-                    "metadata": {
-                        "timeback.xp": 0,
-                        "timeback.passed": True,
-                        "timeback.contentType": content_type,
-                    },
-                }
-            }
-            resp = requests.put(
-                f"{API_BASE}/ims/oneroster/gradebook/v1p2/assessmentResults/{result_id}",
-                headers=headers,
-                json=result_payload,
-                timeout=15,
-            )
-            results["oneroster"] = resp.status_code in (200, 201)
-            if not results["oneroster"]:
-                results["oneroster_status"] = resp.status_code
-                results["oneroster_body"] = resp.text[:300]
-        except Exception as e:
-            results["oneroster_error"] = str(e)
-
-        # ── 2. Caliper: ActivityCompletedEvent (official Timeback format) ──
-        if email:
-            try:
-                token = get_token()
-                caliper_event = {
-                    "@context": "http://purl.imsglobal.org/ctx/caliper/v1p2",
-                    "id": f"urn:uuid:{run_id}",
-                    "type": "ActivityEvent",
-                    "action": "Completed",
-                    "profile": "TimebackProfile",
-                    "eventTime": now.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-                    "actor": {
-                        "id": f"{API_BASE}/ims/oneroster/rostering/v1p2/users/{student_id}",
-                        "type": "TimebackUser",
-                        "email": email,
-                    },
-                    "object": {
-                        "id": f"{SENSOR_ID}/activities/{component_res_id}",
-                        "type": "TimebackActivityContext",
-                        "subject": "Social Studies",
-                        "app": {"name": "AlphaLearn"},
-                        "activity": {
-                            "id": f"{SENSOR_ID}/activities/{component_res_id}",
-                            "name": component_res_id,
-                        },
-                        "course": {
-                            "code": course_id or component_res_id.split("-")[0],
-                            "name": course_name or "",
-                        },
-                        "process": True,
-                    },
-                    "generated": {
-                        "id": f"{API_BASE}/ims/metrics/collections/activity/{run_id}",
-                        "type": "TimebackActivityMetricsCollection",
-                        "items": [{"type": "xpEarned", "value": 0}],
-                    },
-                    "edApp": SENSOR_ID,
-                    "extensions": {"runId": run_id, "courseId": course_id},
-                }
-                envelope = {
-                    "sensor": SENSOR_ID,
-                    "sendTime": now.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-                    "dataVersion": "http://purl.imsglobal.org/ctx/caliper/v1p2",
-                    "data": [caliper_event],
-                }
-                resp = requests.post(
-                    CALIPER_URL,
-                    headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-                    json=envelope,
-                    timeout=15,
-                )
-                results["caliper"] = resp.status_code == 200
-                if not results["caliper"]:
-                    results["caliper_status"] = resp.status_code
-                    results["caliper_body"] = resp.text[:300]
-            except Exception as e:
-                results["caliper_error"] = str(e)
-
+        results = _complete(student_id, email, course_id, course_name, [res])[0]
         send_json(self, {
             "success": results["oneroster"] or results["caliper"],
-            "resourceId": resource_id,
-            "componentResId": component_res_id,
-            "contentType": content_type,
+            "resourceId": res["resourceId"],
+            "componentResId": res["componentResId"],
+            "contentType": res["contentType"],
             "results": results,
         })
+
+    def _handle_bulk(self, student_id, email, course_id, course_name, raw):
+        if not student_id:
+            send_json(self, {"error": "Missing studentId"}, 400)
+            return
+        if not isinstance(raw, list) or not raw or not all(isinstance(r, dict) for r in raw):
+            send_json(self, {"error": "resources must be a non-empty list of objects"}, 400)
+            return
+        if len(raw) > MAX_BULK:
+            send_json(self, {"error": f"At most {MAX_BULK} resources per request"}, 400)
+            return
+
+        resources = [_resource(r) for r in raw]
+        valid = [r for r in resources if r["lineItemId"]]
+        outcomes = iter(_complete(student_id, email, course_id, course_name, valid) if valid else [])
+        items = []
+        for res in resources:
+            entry = {"resourceId": res["resourceId"], "componentResId": res["componentResId"],
+                     "contentType": res["contentType"]}
+            if not res["lineItemId"]:
+                entry.update(success=False, error="Missing assessmentLineItemSourcedId")
+            else:
+                results = next(outcomes)
+                entry.update(success=results["oneroster"] or results["caliper"], results=results)
+            items.append(entry)
+
+        succeeded = sum(1 for i in items if i["success"])
+        send_json(self, {
+            "success": succeeded == len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "resources": items,
+        })
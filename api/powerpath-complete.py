@@ -1,7 +1,7 @@
 """POST /api/powerpath-complete — Complete a lesson via PowerPath.
 
 For quiz/MCQ content: reset + finalize assessment
-For video/article content: record completion via Caliper event
+For video/article content: queue a Caliper completion event (api/_caliper.py)
 
 Body:
   studentId: string (required)
@@ -14,15 +14,13 @@ Body:
 
 import json
 import uuid
-from datetime import datetime, timezone
 from http.server import BaseHTTPRequestHandler
 
 import requests
-from api._helpers import API_BASE, api_headers, get_token, send_json
-
-
-CALIPER_URL = "https://caliper.alpha-1edtech.ai/caliper/event"
-SENSOR_ID = "https://alphalearn.alpha.school"
+from api._caliper import SENSOR_ID, caliper_time, enqueue_events
+from api._content_cache import invalidate_student
+from api._helpers import API_BASE, api_headers, send_json
+from api._progress_cache import get_progress, invalidate_progress
 
 
 class handler(BaseHTTPRequestHandler):
@@ -96,18 +94,13 @@ class handler(BaseHTTPRequestHandler):
                 # Get XP from finalize response or fetch it
         except Exception as e:
             debug.append({"step": "2_finalize", "error": str(e)})
+        invalidate_progress(student_id, lesson_id)
 
         # Step 3: Get final progress to extract XP
         if quiz_success:
             try:
-                resp = requests.get(
-                    f"{API_BASE}/powerpath/getAssessmentProgress",
-                    headers=headers,
-                    params={"student": student_id, "lesson": lesson_id},
-                    timeout=10
-                )
-                if resp.status_code == 200:
-                    progress = resp.json()
+                progress, _ = get_progress(student_id, lesson_id, headers, max_age=0, timeout=10)
+                if progress is not None:
                     xp_earned = progress.get("xp", 0)
                     final_score = progress.get("score", score)
                     debug.append({
@@ -119,12 +112,12 @@ class handler(BaseHTTPRequestHandler):
             except Exception as e:
                 debug.append({"step": "3_get_progress", "error": str(e)})
 
-        # If quiz finalize failed (e.g., video/article content), send Caliper event
+        # If quiz finalize failed (e.g., video/article content), queue a Caliper event
         if not quiz_success and email:
             try:
-                now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+                now = caliper_time()
                 run_id = str(uuid.uuid4())
-                
+
                 caliper_event = {
                     "@context": "http://purl.imsglobal.org/ctx/caliper/v1p2",
                     "id": f"urn:uuid:{run_id}",
@@ -163,29 +156,14 @@ class handler(BaseHTTPRequestHandler):
                     },
                     "edApp": SENSOR_ID
                 }
-                
-                envelope = {
-                    "sensor": SENSOR_ID,
-                    "sendTime": now,
-                    "dataVersion": "http://purl.imsglobal.org/ctx/caliper/v1p2",
-                    "data": [caliper_event]
-                }
-                
-                token = get_token()
-                resp = requests.post(
-                    CALIPER_URL,
-                    headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-                    json=envelope,
-                    timeout=15
-                )
-                debug.append({
-                    "step": "caliper_fallback",
-                    "status": resp.status_code,
-                    "body": resp.text[:200]
-                })
+                queued = enqueue_events([caliper_event])
+                debug.append({"step": "caliper_fallback", **queued})
             except Exception as e:
                 debug.append({"step": "caliper_fallback", "error": str(e)})
 
+        # resetAttempt may have changed progress even if finalize failed
+        invalidate_student(student_id)
+
         send_json(self, {
             "status": "success" if quiz_success else "partial",
             "quizFinalized": quiz_success,
@@ -1,18 +1,22 @@
-"""POST /api/pp-answer-batch — Answer a batch of questions correctly.
+"""POST /api/pp-answer-batch — Answer every question in a lesson in one request.
 
 Body:
   studentId: string (required)
   lessonId: string (required)
-  startIndex: number (default 0) - which question to start from
-  batchSize: number (default 5) - how many questions to answer
-  finalize: boolean (default false) - finalize after answering
+  questionIds: [string] (optional) - only these questions (default: all)
+  responses: {questionId: choice} (optional) - overrides; others get the correct answer
+  includeAnswered: boolean (default false) - re-submit questions already answered
+  finalize: boolean (default false) - finalize once every question is answered
+
+Responses are submitted concurrently (api/_pp_answers.py) with retries, and
+each question's outcome is reported under ``results``.
 """
 
 import json
 from http.server import BaseHTTPRequestHandler
 
-import requests
-from api._helpers import API_BASE, api_headers, send_json
+from api._helpers import api_headers, send_json
+from api._pp_answers import correct_answer, fetch_progress, finalize, is_answered, submit_answers
 
 
 class handler(BaseHTTPRequestHandler):
@@ -33,8 +37,9 @@ class handler(BaseHTTPRequestHandler):
 
         student_id = body.get("studentId", "")
         lesson_id = body.get("lessonId", "")
-        start_idx = body.get("startIndex", 0)
-        batch_size = body.get("batchSize", 5)
+        only_ids = set(body.get("questionIds") or [])
+        overrides = body.get("responses") or {}
+        include_answered = body.get("includeAnswered", False)
         do_finalize = body.get("finalize", False)
 
         if not student_id or not lesson_id:
@@ -42,72 +47,49 @@ class handler(BaseHTTPRequestHandler):
             return
 
         headers = api_headers()
-        
+
         # Get questions
-        progress_url = f"{API_BASE}/powerpath/getAssessmentProgress"
         try:
-            resp = requests.post(progress_url, headers=headers, 
-                               json={"student": student_id, "lesson": lesson_id}, timeout=15)
-            if resp.status_code != 200:
-                send_json(self, {"error": f"getAssessmentProgress failed: {resp.status_code}"}, 502)
-                return
-            progress = resp.json()
+            progress, status = fetch_progress(student_id, lesson_id, headers)
         except Exception as e:
             send_json(self, {"error": str(e)}, 500)
             return
+        if progress is None:
+            send_json(self, {"error": f"getAssessmentProgress failed: {status}"}, 502)
+            return
 
-        questions = progress.get("questions", [])
+        questions = [q for q in progress.get("questions", []) if q.get("id")]
         total = len(questions)
-        
-        # Answer batch
-        answered = 0
-        end_idx = min(start_idx + batch_size, total)
-        
-        for i in range(start_idx, end_idx):
-            q = questions[i]
-            q_id = q.get("id", "")
-            if not q_id:
-                continue
-            try:
-                resp = requests.post(
-                    f"{API_BASE}/powerpath/updateStudentQuestionResponse",
-                    headers=headers,
-                    json={
-                        "student": student_id,
-                        "lesson": lesson_id,
-                        "question": q_id,
-                        "answered": True,
-                        "correct": True
-                    },
-                    timeout=8
-                )
-                if resp.status_code in (200, 201):
-                    answered += 1
-            except:
-                pass
+        already = sum(1 for q in questions if is_answered(q))
+        todo = [
+            q for q in questions
+            if (not only_ids or q["id"] in only_ids) and (include_answered or not is_answered(q))
+        ]
+
+        answers = [(q["id"], overrides.get(q["id"]) or correct_answer(q)) for q in todo]
+        results = submit_answers(student_id, lesson_id, answers, headers)
+        answered = sum(1 for r in results if r["status"] == "success")
+        failed = len(results) - answered
+        done_ids = {q["id"] for q in questions if is_answered(q)}
+        done_ids |= {r["questionId"] for r in results if r["status"] == "success"}
+        all_answered = len(done_ids) >= total
 
         result = {
             "totalQuestions": total,
-            "startIndex": start_idx,
-            "endIndex": end_idx,
+            "alreadyAnswered": already,
+            "submitted": len(results),
             "answered": answered,
-            "remaining": total - end_idx,
-            "allAnswered": end_idx >= total
+            "failed": failed,
+            "allAnswered": all_answered,
+            "results": results,
         }
 
-        # Finalize if requested and all answered
-        if do_finalize and end_idx >= total:
-            try:
-                resp = requests.post(
-                    f"{API_BASE}/powerpath/finalStudentAssessmentResponse",
-                    headers=headers,
-                    json={"student": student_id, "lesson": lesson_id},
-                    timeout=15
-                )
-                result["finalized"] = resp.status_code in (200, 201)
-                if resp.status_code in (200, 201):
-                    result["finalizeResponse"] = resp.json() if resp.text else {}
-            except Exception as e:
-                result["finalizeError"] = str(e)
+        # Finalize if requested and every question is answered
+        if do_finalize:
+            if all_answered:
+                result.update(finalize(student_id, lesson_id, headers))
+            else:
+                result["finalized"] = False
+                result["finalizeError"] = f"{total - len(done_ids)} question(s) unanswered; not finalized"
 
         send_json(self, result)
@@ -4,22 +4,16 @@ Body:
   studentId: string (required)
   lessonId: string (required)
   questionIndex: number (default 0) - which question to answer
+  questionId: string (optional) - answer this question instead of questionIndex
   response: string (optional) - answer choice (A, B, C, D). If not provided, uses correct answer.
+  finalize: boolean (default false) - finalize if this leaves every question answered
 """
 
 import json
-import re
 from http.server import BaseHTTPRequestHandler
 
-import requests
-from api._helpers import API_BASE, api_headers, send_json
-
-
-def extract_correct_answer(question):
-    """Extract the correct answer from the question's QTI XML."""
-    raw_xml = question.get("content", {}).get("rawXml", "")
-    match = re.search(r'<qti-correct-response>\s*<qti-value>([^<]+)</qti-value>', raw_xml)
-    return match.group(1) if match else "A"
+from api._helpers import api_headers, send_json
+from api._pp_answers import correct_answer, fetch_progress, finalize, is_answered, submit_answers
 
 
 class handler(BaseHTTPRequestHandler):
@@ -41,36 +35,34 @@ class handler(BaseHTTPRequestHandler):
         student_id = body.get("studentId", "")
         lesson_id = body.get("lessonId", "")
         q_idx = body.get("questionIndex", 0)
+        question_id = body.get("questionId", "")
         user_response = body.get("response", None)
+        do_finalize = body.get("finalize", False)
 
         if not student_id or not lesson_id:
             send_json(self, {"error": "Missing studentId or lessonId"}, 400)
             return
 
         headers = api_headers()
-        
-        # Get questions (use GET, not POST)
+
+        # Get questions
         try:
-            resp = requests.get(
-                f"{API_BASE}/powerpath/getAssessmentProgress",
-                headers=headers, 
-                params={"student": student_id, "lesson": lesson_id}, 
-                timeout=15
-            )
-            if resp.status_code != 200:
-                send_json(self, {"error": f"getAssessmentProgress failed: {resp.status_code}"}, 502)
-                return
-            progress = resp.json()
+            progress, status = fetch_progress(student_id, lesson_id, headers)
         except Exception as e:
             send_json(self, {"error": str(e)}, 500)
             return
+        if progress is None:
+            send_json(self, {"error": f"getAssessmentProgress failed: {status}"}, 502)
+            return
 
         questions = progress.get("questions", [])
         total = len(questions)
-        
+
+        if question_id:
+            q_idx = next((i for i, q in enumerate(questions) if q.get("id") == question_id), total)
         if q_idx >= total:
             send_json(self, {
-                "error": "questionIndex out of range",
+                "error": "questionIndex out of range" if not question_id else "questionId not in lesson",
                 "totalQuestions": total,
                 "questionIndex": q_idx
             }, 400)
@@ -78,38 +70,35 @@ class handler(BaseHTTPRequestHandler):
 
         q = questions[q_idx]
         q_id = q.get("id", "")
-        
+
         if not q_id:
             send_json(self, {"error": "Question has no ID"}, 400)
             return
 
         # Determine answer
-        correct_answer = extract_correct_answer(q)
-        answer = user_response if user_response else correct_answer
+        correct = correct_answer(q)
+        answer = user_response if user_response else correct
 
-        # Answer the question (use PUT, not POST)
-        try:
-            resp = requests.put(
-                f"{API_BASE}/powerpath/updateStudentQuestionResponse",
-                headers=headers,
-                json={
-                    "student": student_id,
-                    "lesson": lesson_id,
-                    "question": q_id,
-                    "response": answer
-                },
-                timeout=10
-            )
-            
-            send_json(self, {
-                "status": "success" if resp.status_code == 200 else "error",
-                "questionIndex": q_idx,
-                "questionId": q_id,
-                "response": answer,
-                "correctAnswer": correct_answer,
-                "isCorrect": answer == correct_answer,
-                "totalQuestions": total,
-                "httpStatus": resp.status_code
-            })
-        except Exception as e:
-            send_json(self, {"error": str(e)}, 500)
+        # Answer the question (retried on transient failures)
+        result = submit_answers(student_id, lesson_id, [(q_id, answer)], headers)[0]
+        out = {
+            "status": result["status"],
+            "questionIndex": q_idx,
+            "questionId": q_id,
+            "response": answer,
+            "correctAnswer": correct,
+            "isCorrect": answer == correct,
+            "totalQuestions": total,
+            "httpStatus": result["httpStatus"],
+            "attempts": result["attempts"],
+        }
+        if "error" in result:
+            out["error"] = result["error"]
+
+        if do_finalize and result["status"] == "success":
+            others_done = all(is_answered(x) for i, x in enumerate(questions) if i != q_idx)
+            if others_done:
+                out.update(finalize(student_id, lesson_id, headers))
+            else:
+                out["finalized"] = False
+        send_json(self, out)
@@ -14,7 +14,9 @@ import re
 from http.server import BaseHTTPRequestHandler
 
 import requests
+from api._content_cache import invalidate_student
 from api._helpers import API_BASE, api_headers, send_json
+from api._progress_cache import get_progress, invalidate_progress
 
 
 def extract_correct_answer(question):
@@ -53,16 +55,10 @@ class handler(BaseHTTPRequestHandler):
 
         # Step 1: Get questions
         try:
-            resp = requests.get(
-                f"{API_BASE}/powerpath/getAssessmentProgress",
-                headers=headers,
-                params={"student": student_id, "lesson": lesson_id},
-                timeout=15
-            )
-            if resp.status_code != 200:
-                send_json(self, {"error": f"getAssessmentProgress failed: {resp.status_code}"}, 502)
+            progress, status = get_progress(student_id, lesson_id, headers)
+            if progress is None:
+                send_json(self, {"error": f"getAssessmentProgress failed: {status}"}, 502)
                 return
-            progress = resp.json()
         except Exception as e:
             send_json(self, {"error": str(e)}, 500)
             return
@@ -131,16 +127,12 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             finalize_ok = False
             finalize_data = {"error": str(e)}
+        invalidate_progress(student_id, lesson_id)
+        invalidate_student(student_id)
 
         # Step 4: Get final progress WITH XP
         try:
-            resp = requests.get(
-                f"{API_BASE}/powerpath/getAssessmentProgress",
-                headers=headers,
-                params={"student": student_id, "lesson": lesson_id},
-                timeout=10
-            )
-            final_progress = resp.json() if resp.status_code == 200 else {}
+            final_progress = get_progress(student_id, lesson_id, headers, max_age=0, timeout=10)[0] or {}
         except:
             final_progress = {}
 
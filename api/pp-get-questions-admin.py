@@ -14,6 +14,7 @@ from http.server import BaseHTTPRequestHandler
 
 import requests
 from api._helpers import API_BASE, CLIENT_ID, CLIENT_SECRET, api_headers, send_json, get_query_params, get_token
+from api._qti_xml import parse_qti, strip_html as _strip_html
 
 COGNITO_URL = "https://prod-beyond-timeback-api-2-idp.auth.us-east-1.amazoncognito.com/oauth2/token"
 QTI_BASE = "https://qti.alpha-1edtech.ai"
@@ -46,45 +47,6 @@ def _qti_headers():
     return {"Authorization": f"Bearer {_qti_token()}", "Accept": "application/json"}
 
 
-# ── QTI XML parsing ──────────────────────────────────────────────────
-
-def _extract_from_qti_xml(raw_xml: str) -> dict:
-    """Parse QTI XML to extract prompt, choices, and correct answer."""
-    result = {"prompt": "", "choices": [], "correctId": "", "stimulus": ""}
-    if not raw_xml:
-        return result
-
-    prompt_match = re.search(r'<qti-prompt[^>]*>(.*?)</qti-prompt>', raw_xml, re.DOTALL)
-    if prompt_match:
-        result["prompt"] = _strip_html(prompt_match.group(1))
-
-    for m in re.finditer(r'<qti-simple-choice\s+[^>]*identifier="([^"]+)"[^>]*>(.*?)</qti-simple-choice>', raw_xml, re.DOTALL):
-        choice_text = re.sub(r'<qti-feedback-inline[^>]*>.*?</qti-feedback-inline>', '', m.group(2), flags=re.DOTALL)
-        choice_text = _strip_html(choice_text).strip()
-        if choice_text:
-            result["choices"].append({"id": m.group(1), "text": choice_text})
-
-    correct_match = re.search(r'<qti-correct-response>\s*<qti-value>([^<]+)</qti-value>', raw_xml)
-    if correct_match:
-        result["correctId"] = correct_match.group(1).strip()
-
-    stim_match = re.search(r'<qti-stimulus-body[^>]*>(.*?)</qti-stimulus-body>', raw_xml, re.DOTALL)
-    if stim_match:
-        result["stimulus"] = _strip_html(stim_match.group(1))[:4000]
-
-    return result
-
-
-def _strip_html(html: str) -> str:
-    if not html:
-        return ""
-    text = re.sub(r'<[^>]+>', ' ', html)
-    for ent, rep in [('&amp;', '&'), ('&lt;', '<'), ('&gt;', '>'), ('&nbsp;', ' '), ('&quot;', '"')]:
-        text = text.replace(ent, rep)
-    text = re.sub(r'&#\d+;', '', text)
-    return re.sub(r'\s+', ' ', text).strip()
-
-
 # ── Bank ID → QTI ID transformation ─────────────────────────────────
 
 def _resolve_bank_to_qti(bank_id: str) -> list[str]:
@@ -152,7 +114,7 @@ def _try_powerpath(lesson_id: str, course_id: str) -> list[dict]:
             qid = q.get("id") or q.get("sourcedId") or ""
             title = q.get("title") or ""
             raw_xml = (q.get("content") or {}).get("rawXml", "")
-            extracted = _extract_from_qti_xml(raw_xml)
+            extracted = parse_qti(raw_xml)
             parsed.append({
                 "identifier": qid, "id": qid, "title": title,
                 "prompt": extracted["prompt"] or title,
@@ -292,7 +254,7 @@ def _normalize_single_question(data: dict, fallback_id: str = "") -> dict:
     # Try raw XML first
     raw_xml = inner.get("rawXml", "") or data.get("rawXml", "")
     if raw_xml:
-        extracted = _extract_from_qti_xml(raw_xml)
+        extracted = parse_qti(raw_xml)
         return {
             "identifier": qid, "id": qid, "title": title,
             "prompt": extracted["prompt"] or title,
@@ -2,22 +2,76 @@
 
 Query params:
   studentId: string (required)
-  lessonId: string (required)
+  lessonId: string (required unless lessonIds is given)
+  lessonIds: comma-separated lesson ids (optional) - batch mode, see below
+  maxAge: number (optional) - accept a cached progress snapshot up to this
+          many seconds old (0 = always ask PowerPath)
+
+Batch mode fetches every lesson's progress concurrently and returns one
+columnar record per lesson, in request order:
+  { studentId, lessons: [ { lessonId, score, finalized, attempt,
+    totalQuestions, ids: [...], answered: [bool], correct: [bool | null],
+    correctAnswer: [str | null] } | { lessonId, error, httpStatus? } ] }
+Blocked questions are dropped from the columns, as in single mode.
 """
 
-import re
+from concurrent.futures import ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler
 
-import requests
-from api._helpers import API_BASE, api_headers, send_json, get_query_params
-from api._kv import kv_list_get
+from api._helpers import api_headers, send_json, get_query_params
+from api._kv import kv_mget
+from api._progress_cache import get_progress
+from api._qti_xml import correct_response
+
+MAX_LESSONS = 50
+FETCH_WORKERS = 8
+BLOCKED_KEYS = ("globally_hidden_questions", "bad_questions", "ai_irrelevant_questions")
+
+# (question id, QTI hash) → correct answer; the same item is served to every
+# student, so warm instances parse each version of it once
+_answers = {}
 
 
 def extract_correct_answer(question):
     """Extract the correct answer from the question's QTI XML."""
-    raw_xml = question.get("content", {}).get("rawXml", "")
-    match = re.search(r'<qti-correct-response>\s*<qti-value>([^<]+)</qti-value>', raw_xml)
-    return match.group(1) if match else None
+    content = question.get("content")
+    raw_xml = content.get("rawXml", "") if isinstance(content, dict) else ""
+    if not raw_xml:
+        return None
+    key = (question.get("id"), hash(raw_xml))
+    if key not in _answers:
+        if len(_answers) > 20000:
+            _answers.clear()
+        _answers[key] = correct_response(raw_xml) or None
+    return _answers[key]
+
+
+def _blocked_ids() -> set:
+    """Globally hidden, permanently bad and AI-flagged irrelevant questions (one KV round-trip)."""
+    blocked = set()
+    try:
+        for ids in kv_mget(list(BLOCKED_KEYS)):
+            if isinstance(ids, list):
+                blocked.update(ids)
+    except Exception:
+        pass  # If KV fails, don't block question loading
+    return blocked
+
+
+def _columns(lesson_id: str, progress: dict, blocked: set) -> dict:
+    questions = progress.get("questions", [])
+    visible = [q for q in questions if q.get("id") not in blocked]
+    return {
+        "lessonId": lesson_id,
+        "score": progress.get("score"),
+        "finalized": progress.get("finalized"),
+        "attempt": progress.get("attempt"),
+        "totalQuestions": len(questions),
+        "ids": [q.get("id") for q in visible],
+        "answered": [q.get("correct") is not None for q in visible],
+        "correct": [q.get("correct") for q in visible],
+        "correctAnswer": [extract_correct_answer(q) for q in visible],
+    }
 
 
 class handler(BaseHTTPRequestHandler):
@@ -32,31 +86,39 @@ class handler(BaseHTTPRequestHandler):
         params = get_query_params(self)
         student_id = params.get("studentId", "")
         lesson_id = params.get("lessonId", "")
+        lesson_ids = list(dict.fromkeys(s.strip() for s in params.get("lessonIds", "").split(",") if s.strip()))
 
-        if not student_id or not lesson_id:
+        if not student_id or not (lesson_id or lesson_ids):
             send_json(self, {"error": "Missing studentId or lessonId"}, 400)
             return
 
+        try:
+            max_age = float(params["maxAge"]) if params.get("maxAge") else None
+        except ValueError:
+            send_json(self, {"error": "maxAge must be a number of seconds"}, 400)
+            return
+
+        if lesson_ids:
+            self._handle_batch(student_id, lesson_ids, max_age)
+            return
+
         headers = api_headers()
 
         try:
-            resp = requests.get(
-                f"{API_BASE}/powerpath/getAssessmentProgress",
-                headers=headers,
-                params={"student": student_id, "lesson": lesson_id},
-                timeout=15
-            )
-            
-            if resp.status_code != 200:
-                send_json(self, {"error": f"API returned {resp.status_code}"}, 502)
+            progress, status = get_progress(student_id, lesson_id, headers, max_age)
+
+            if progress is None:
+                send_json(self, {"error": f"API returned {status}"}, 502)
                 return
 
-            progress = resp.json()
             questions = progress.get("questions", [])
-            
+            blocked = _blocked_ids()
+
             # Simplify question data
             simplified = []
             for q in questions:
+                if q.get("id") in blocked:
+                    continue
                 simplified.append({
                     "id": q.get("id"),
                     "index": q.get("index"),
@@ -66,17 +128,6 @@ class handler(BaseHTTPRequestHandler):
                     "isCorrect": q.get("correct", False)
                 })
 
-            # Filter out globally hidden, permanently bad, and AI-flagged irrelevant questions
-            try:
-                hidden_ids = set(kv_list_get("globally_hidden_questions"))
-                bad_ids = set(kv_list_get("bad_questions"))
-                irrelevant_ids = set(kv_list_get("ai_irrelevant_questions"))
-                blocked = hidden_ids | bad_ids | irrelevant_ids
-                if blocked:
-                    simplified = [q for q in simplified if q.get("id") not in blocked]
-            except Exception:
-                pass  # If KV fails, don't block question loading
-            
             send_json(self, {
                 "score": progress.get("score"),
                 "finalized": progress.get("finalized"),
@@ -86,3 +137,32 @@ class handler(BaseHTTPRequestHandler):
             })
         except Exception as e:
             send_json(self, {"error": str(e)}, 500)
+
+    def _handle_batch(self, student_id, lesson_ids, max_age):
+        if len(lesson_ids) > MAX_LESSONS:
+            send_json(self, {"error": f"At most {MAX_LESSONS} lessonIds per request"}, 400)
+            return
+
+        headers = api_headers()
+
+        def fetch(lid):
+            try:
+                return get_progress(student_id, lid, headers, max_age)
+            except Exception as e:
+                return None, str(e)
+
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(lesson_ids))) as pool:
+            fetched = list(pool.map(fetch, lesson_ids))
+
+        blocked = _blocked_ids()
+        lessons = []
+        for lid, (progress, status) in zip(lesson_ids, fetched):
+            if progress is None:
+                entry = {"lessonId": lid, "error": status if isinstance(status, str) else f"API returned {status}"}
+                if isinstance(status, int):
+                    entry["httpStatus"] = status
+                lessons.append(entry)
+            else:
+                lessons.append(_columns(lid, progress, blocked))
+
+        send_json(self, {"studentId": student_id, "lessons": lessons})
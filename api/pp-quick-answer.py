@@ -12,6 +12,7 @@ from http.server import BaseHTTPRequestHandler
 
 import requests
 from api._helpers import API_BASE, api_headers, send_json
+from api._progress_cache import invalidate_progress
 
 
 class handler(BaseHTTPRequestHandler):
@@ -54,7 +55,8 @@ class handler(BaseHTTPRequestHandler):
                 },
                 timeout=8
             )
-            
+            invalidate_progress(student_id, lesson_id)
+
             send_json(self, {
                 "status": "success" if resp.status_code in (200, 201) else "error",
                 "questionId": question_id,
@@ -9,7 +9,9 @@ import json
 from http.server import BaseHTTPRequestHandler
 
 import requests
+from api._content_cache import invalidate_student
 from api._helpers import API_BASE, api_headers, send_json
+from api._progress_cache import invalidate_progress
 
 
 class handler(BaseHTTPRequestHandler):
@@ -47,7 +49,9 @@ class handler(BaseHTTPRequestHandler):
             if resp.status_code == 401:
                 headers = api_headers()
                 resp = requests.post(url, headers=headers, json=payload, timeout=30)
-            
+            invalidate_progress(student_id, lesson_id)
+            invalidate_student(student_id)
+
             if resp.status_code in (200, 201):
                 send_json(self, {
                     "status": "success",
@@ -9,7 +9,9 @@ import json
 from http.server import BaseHTTPRequestHandler
 
 import requests
+from api._content_cache import invalidate_student
 from api._helpers import API_BASE, api_headers, send_json
+from api._progress_cache import invalidate_progress
 
 
 class handler(BaseHTTPRequestHandler):
@@ -44,6 +46,8 @@ class handler(BaseHTTPRequestHandler):
                 json={"student": student_id, "lesson": lesson_id},
                 timeout=15
             )
+            invalidate_progress(student_id, lesson_id)
+            invalidate_student(student_id)
             
             if resp.status_code == 200:
                 data = resp.json()
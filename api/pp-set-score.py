@@ -11,7 +11,9 @@ import time
 from http.server import BaseHTTPRequestHandler
 
 import requests
+from api._content_cache import invalidate_student
 from api._helpers import API_BASE, api_headers, send_json
+from api._progress_cache import invalidate_progress
 
 
 class handler(BaseHTTPRequestHandler):
@@ -115,6 +117,8 @@ class handler(BaseHTTPRequestHandler):
                 debug.append({"step": "finalize", "status": resp.status_code, "body": resp.text[:300]})
         except Exception as e:
             debug.append({"step": "finalize", "error": str(e)})
+        invalidate_progress(student_id, lesson_id)
+        invalidate_student(student_id)
 
         send_json(self, {
             "status": "success",
@@ -0,0 +1,34 @@
+"""GET /api/pp100-index[?full=1] — Refresh the course → PP100 alias index.
+
+Scheduled (see "crons" in vercel.json). Applies OneRoster catalog changes
+since the stored dateLastModified watermark; full=1 rebuilds from the whole
+catalog. GET ?courseId=... returns the current aliases for one course.
+
+Returns { full, changed, pp100Courses, courses, aliased, watermark }.
+"""
+
+from http.server import BaseHTTPRequestHandler
+
+from api._helpers import send_json, get_query_params
+from api._pp100_index import pp100_ids, refresh_index
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self):
+        params = get_query_params(self)
+        course_id = params.get("courseId", "").strip()
+
+        try:
+            if course_id:
+                send_json(self, {"courseId": course_id, "pp100Ids": pp100_ids(course_id)})
+                return
+            send_json(self, refresh_index(full=params.get("full", "") in ("1", "true")))
+        except Exception as e:
+            send_json(self, {"error": str(e)}, 500)
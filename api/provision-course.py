@@ -0,0 +1,51 @@
+"""POST /api/provision-course — Queue service-account provisioning for a course.
+
+Receives { courseId, retry? }.
+Enrolls the service account and runs the PowerPath lesson plan sync in the
+background (see api/_provisioning.py). Idempotent: a course that is already
+queued, running or provisioned is not queued again. retry=true re-queues a
+course whose job has failed too many times.
+
+GET /api/provision-course is the scheduled entry point (see "crons" in
+vercel.json): it drains the queue within the function's time limit.
+
+Poll /api/provision-status?courseId=... for progress.
+"""
+
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+
+from api._helpers import send_json
+from api._provisioning import drain, enqueue
+
+DRAIN_BUDGET = 200  # seconds; one sync can take 90 s, leave headroom under maxDuration
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            body = json.loads(raw)
+        except Exception:
+            send_json(self, {"error": "Invalid JSON"}, 400)
+            return
+
+        course_id = (body.get("courseId") or "").strip()
+        if not course_id:
+            send_json(self, {"error": "Missing courseId"}, 400)
+            return
+
+        send_json(self, enqueue(course_id, retry=bool(body.get("retry"))))
+
+    def do_GET(self):
+        results = drain(deadline=time.time() + DRAIN_BUDGET)
+        send_json(self, {"processed": results, "count": len(results)})
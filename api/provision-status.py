@@ -0,0 +1,39 @@
+"""GET /api/provision-status?courseId=...  (or ?courseIds=a,b,c)
+
+Polls course provisioning jobs (see /api/provision-course). Returns:
+  - { status: "queued" | "running", courseId, attempts, ... } while pending
+  - { status: "done", courseId, ... } once the lesson plan exists
+  - { status: "failed", courseId, error, attempts } after a failed attempt
+  - { status: "not_started", courseId } if never queued
+With courseIds, returns { jobs: { courseId: job, ... }, pending: bool }.
+"""
+
+from http.server import BaseHTTPRequestHandler
+
+from api._helpers import send_json, get_query_params
+from api._provisioning import get_job
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self):
+        params = get_query_params(self)
+        course_id = params.get("courseId", "").strip()
+        course_ids = [c.strip() for c in params.get("courseIds", "").split(",") if c.strip()]
+
+        if course_id:
+            send_json(self, get_job(course_id))
+            return
+        if not course_ids:
+            send_json(self, {"error": "Missing courseId"}, 400)
+            return
+
+        jobs = {cid: get_job(cid) for cid in course_ids}
+        pending = any(j.get("status") in ("queued", "running") for j in jobs.values())
+        send_json(self, {"jobs": jobs, "pending": pending})
@@ -0,0 +1,133 @@
+"""POST /api/qti-batch — Resolve many QTI assessment tests in one call.
+
+Body: { ids: ["HUMG20-r173056-bank-v1", "some-qti-test-id", ...], stimuliTable?: bool }
+  (also GET ?ids=a,b,c&stimuliTable=1)
+
+Each ID may be a QTI test/item ID or a PowerPath bank ID (transformed the
+same way as /api/qti-item). All tests share one QTI token, one blocked-set
+read and one de-duplicating fetcher, so items and stimuli that appear in
+several tests are fetched once.
+
+Streams newline-delimited JSON, one line per test as it completes:
+  { "id", "success": true, "qtiId", "data": { title, questions, totalQuestions, stimuli? } }
+Passages are copied into each question's "_sectionStimulus", as in
+/api/qti-item; with stimuliTable they come once per test in "stimuli",
+keyed by each question's "_stimulusRef".
+  { "id", "success": false, "error" }
+followed by a final { "done": true, "total", "succeeded" } line.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler
+
+from api._helpers import send_json, get_query_params
+from api._qti import (
+    QtiFetcher,
+    filter_blocked,
+    find_test,
+    get_blocked_question_ids,
+    is_test,
+    qti_headers,
+    resolve_test,
+)
+
+MAX_IDS = 100
+TEST_WORKERS = 4
+FETCH_WORKERS = 8
+
+
+def _resolve_one(test_id, fetcher, blocked, stimuli_table):
+    """Locate one test by ID and resolve its questions. Returns a result line dict."""
+    qti_id, data = find_test(test_id, fetcher)
+    if not data:
+        return {"id": test_id, "success": False, "error": f"Assessment {test_id} not found"}
+    if not is_test(data):
+        return {"id": test_id, "success": True, "qtiId": qti_id, "data": data}
+
+    test = data.get("qti-assessment-test", data)
+    questions, stimuli = resolve_test(test, fetcher)
+    questions = filter_blocked(questions, blocked)
+    used = {q.get("_stimulusRef") for q in questions if isinstance(q, dict)}
+    stimuli = {k: v for k, v in stimuli.items() if k in used}
+
+    title = data.get("title") or (test.get("_attributes") or {}).get("title", "")
+    out = {"title": title, "questions": questions, "totalQuestions": len(questions)}
+    if stimuli_table:
+        out["stimuli"] = stimuli
+    else:
+        out["questions"] = [
+            {**q, "_sectionStimulus": stimuli[q["_stimulusRef"]]}
+            if isinstance(q, dict) and q.get("_stimulusRef") in stimuli else q
+            for q in questions
+        ]
+    return {"id": test_id, "success": True, "qtiId": qti_id, "data": out}
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self):
+        params = get_query_params(self)
+        ids = [i.strip() for i in params.get("ids", "").split(",")]
+        self._run(ids, params.get("stimuliTable", "") in ("1", "true"))
+
+    def do_POST(self):
+        try:
+            cl = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(cl)) if cl else {}
+        except Exception:
+            send_json(self, {"error": "Invalid JSON"}, 400)
+            return
+        ids = body.get("ids") or []
+        if not isinstance(ids, list):
+            send_json(self, {"error": "ids must be a list"}, 400)
+            return
+        self._run([str(i).strip() for i in ids], bool(body.get("stimuliTable")))
+
+    def _run(self, ids, stimuli_table):
+        ids = list(dict.fromkeys(i for i in ids if i))
+        if not ids:
+            send_json(self, {"error": "Need ids"}, 400)
+            return
+        if len(ids) > MAX_IDS:
+            send_json(self, {"error": f"At most {MAX_IDS} ids per call"}, 400)
+            return
+
+        fetcher = QtiFetcher(qti_headers(), max_workers=FETCH_WORKERS)
+        blocked = get_blocked_question_ids()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        succeeded = 0
+        try:
+            with ThreadPoolExecutor(max_workers=TEST_WORKERS) as pool:
+                futures = {
+                    pool.submit(_resolve_one, tid, fetcher, blocked, stimuli_table): tid
+                    for tid in ids
+                }
+                for f in as_completed(futures):
+                    try:
+                        line = f.result()
+                    except Exception as e:
+                        line = {"id": futures[f], "success": False, "error": str(e)}
+                    if line.get("success"):
+                        succeeded += 1
+                    self._write_line(line)
+        finally:
+            fetcher.close()
+
+        self._write_line({"done": True, "total": len(ids), "succeeded": succeeded})
+
+    def _write_line(self, obj):
+        self.wfile.write((json.dumps(obj) + "\n").encode())
+        self.wfile.flush()
@@ -1,7 +1,12 @@
-"""GET /api/qti-item?url=...&id=...&type=...
+"""GET /api/qti-item?url=...&id=...&type=...[&stimuliTable=1]
 
 Fetch QTI content (assessments, stimuli, items).
 
+Resolved assessments copy each question's passage into "_sectionStimulus",
+as they always have. Clients that pass stimuliTable=1 instead get shared
+stimuli once, in data.stimuli keyed by id, with each question pointing at
+its passage via "_stimulusRef".
+
 Endpoint priority (per API docs):
   1. /api/v1/qti/assessment-tests/<id>/questions/  — direct questions list
   2. /api/v1/qti/assessment-tests/<id>/            — test structure → resolve refs
@@ -17,49 +22,36 @@ Endpoint priority (per API docs):
    breaking the import of api._kv (Vercel's sys.path setup differs for
    files in subdirectories vs flat in api/).
 
-2. The _kv import uses "from api._kv" (not bare "from _kv") because this
-   file imports kv_list_get which is used for blocked-question filtering.
-   Both patterns work for flat files in api/, but be consistent with
-   whatever pattern the file already uses.
+2. Shared modules are imported as "from api._qti" / "from api._kv" (not
+   bare "from _qti"). Both patterns work for flat files in api/, but be
+   consistent with whatever pattern the file already uses.
 
-3. The blocked-question filtering (_get_blocked_question_ids,
+3. The blocked-question filtering (api._qti.get_blocked_question_ids,
    _filter_blocked_questions) removes questions that admins have globally
    hidden or marked as permanently bad. This runs AFTER QTI content is
    fetched and parsed. Do not remove this filtering.
+
+4. Test resolution (item refs → items → stimuli) lives in api/_qti.py and
+   is shared with /api/qti-batch.
 """
 
 from http.server import BaseHTTPRequestHandler
 
 import requests
-from api._helpers import CLIENT_ID, CLIENT_SECRET, send_json, get_query_params, get_token
-from api._kv import kv_list_get
+from api._helpers import send_json, get_query_params
+from api._qti import (
+    QTI_BASE,
+    QtiFetcher,
+    filter_blocked,
+    get_blocked_question_ids,
+    qti_token as _get_token,
+    resolve_bank_to_qti as _resolve_bank_to_qti,
+    resolve_test,
+)
 
-COGNITO_URL = "https://prod-beyond-timeback-api-2-idp.auth.us-east-1.amazoncognito.com/oauth2/token"
-QTI_BASE = "https://qti.alpha-1edtech.ai"
 API_BASE = "https://api.alpha-1edtech.ai"
 
 
-def _get_token():
-    """Get Cognito token, try QTI admin scope first."""
-    try:
-        resp = requests.post(
-            COGNITO_URL,
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            data={
-                "grant_type": "client_credentials",
-                "client_id": CLIENT_ID,
-                "client_secret": CLIENT_SECRET,
-                "scope": "qti/v3/scope/admin",
-            },
-            timeout=10,
-        )
-        if resp.status_code == 200:
-            return resp.json()["access_token"]
-    except Exception:
-        pass
-    return get_token()
-
-
 def _fetch(url, headers):
     """Fetch a URL, return (json_data, status) or (None, status)."""
     try:
@@ -80,30 +72,6 @@ def _try_fetch(urls, headers):
     return None, 404
 
 
-def _resolve_bank_to_qti(bank_id):
-    """Transform a PowerPath bank ID to QTI test and item IDs.
-
-    PowerPath: HUMG20-r173056-bank-v1
-    QTI test:  HUMG20-qti173056-test-v1
-    Pattern:   replace 'r{num}' with 'qti{num}', replace 'bank' with 'test'
-
-    Also try: HUMG20-r173056-test-v1, HUMG20-r173056-v1
-    """
-    import re
-    ids = []
-    if "-bank-" in bank_id:
-        # Primary: r→qti, bank→test
-        ids.append(re.sub(r'-r(\d+)-bank-', r'-qti\1-test-', bank_id))
-        # Also try: just replace bank→test (keep r prefix)
-        ids.append(bank_id.replace("-bank-", "-test-"))
-        # Also try: remove -bank entirely
-        ids.append(bank_id.replace("-bank-", "-"))
-    elif "-r" in bank_id:
-        # Not a bank ID but has resource number — try qti prefix
-        ids.append(re.sub(r'-r(\d+)-', r'-qti\1-', bank_id))
-    return ids
-
-
 def _match_items(items, target_subject, code, title_lower):
     """Score and rank QTI items by relevance to the search criteria."""
     scored = []
@@ -129,31 +97,9 @@ def _match_items(items, target_subject, code, title_lower):
     return [s[1] for s in scored]
 
 
-def _get_blocked_question_ids():
-    """Return set of question IDs that should be hidden (globally hidden + permanently bad + AI-flagged irrelevant)."""
-    try:
-        hidden = set(kv_list_get("globally_hidden_questions"))
-        bad = set(kv_list_get("bad_questions"))
-        irrelevant = set(kv_list_get("ai_irrelevant_questions"))
-        return hidden | bad | irrelevant
-    except Exception:
-        return set()
-
-
 def _filter_blocked_questions(questions):
     """Remove any questions whose ID is in the blocked set."""
-    blocked = _get_blocked_question_ids()
-    if not blocked:
-        return questions
-    filtered = []
-    for q in questions:
-        if not isinstance(q, dict):
-            filtered.append(q)
-            continue
-        qid = q.get("identifier") or q.get("id") or ""
-        if qid not in blocked:
-            filtered.append(q)
-    return filtered
+    return filter_blocked(questions, get_blocked_question_ids())
 
 
 def _fetch_full_items(items, headers):
@@ -249,6 +195,7 @@ class handler(BaseHTTPRequestHandler):
         search_subject = params.get("subject", "").strip()
         search_title = params.get("title", "").strip()
         search_grade = params.get("grade", "").strip()
+        self.stimuli_table = params.get("stimuliTable", "") in ("1", "true")
 
         if not item_id and not direct_url:
             send_json(self, {"error": "Need id or url"}, 400)
@@ -375,10 +322,10 @@ class handler(BaseHTTPRequestHandler):
                     # Check if it's a test with parts → resolve questions
                     test = data.get("qti-assessment-test", data) if isinstance(data, dict) else data
                     if isinstance(test, dict) and (test.get("qti-test-part") or test.get("testParts")):
-                        questions = self._resolve_questions(test, headers)
+                        questions, stimuli = self._resolve_questions(test, headers)
                         title = data.get("title") or (test.get("_attributes") or {}).get("title", "")
                         send_json(self, {
-                            "data": {"title": title, "questions": questions, "totalQuestions": len(questions)},
+                            "data": self._assessment_data(title, questions, stimuli),
                             "success": True,
                         })
                         return True
@@ -408,10 +355,10 @@ class handler(BaseHTTPRequestHandler):
                             if data:
                                 test = data.get("qti-assessment-test", data) if isinstance(data, dict) else data
                                 if isinstance(test, dict) and (test.get("qti-test-part") or test.get("testParts")):
-                                    questions = self._resolve_questions(test, headers)
+                                    questions, stimuli = self._resolve_questions(test, headers)
                                     title = data.get("title") or (test.get("_attributes") or {}).get("title", "")
                                     send_json(self, {
-                                        "data": {"title": title, "questions": questions, "totalQuestions": len(questions)},
+                                        "data": self._assessment_data(title, questions, stimuli),
                                         "success": True,
                                     })
                                     return True
@@ -561,10 +508,10 @@ class handler(BaseHTTPRequestHandler):
                         if full:
                             inner = full.get("qti-assessment-test", full) if isinstance(full, dict) else full
                             if isinstance(inner, dict) and (inner.get("qti-test-part") or inner.get("testParts")):
-                                questions = self._resolve_questions(inner, headers)
+                                questions, stimuli = self._resolve_questions(inner, headers)
                                 t = full.get("title") or (inner.get("_attributes") or {}).get("title", "")
                                 send_json(self, {
-                                    "data": {"title": t or title, "questions": questions, "totalQuestions": len(questions)},
+                                    "data": self._assessment_data(t or title, questions, stimuli),
                                     "success": True,
                                 })
                                 return True
@@ -595,165 +542,41 @@ class handler(BaseHTTPRequestHandler):
     # ── Question resolution from test structure ───────────────
 
     def _resolve_questions(self, test, headers):
-        """Extract items + stimuli from test. Uses two-pass approach for speed:
-        Pass 1: Collect all item hrefs and stimulus IDs
-        Pass 2: Fetch items in parallel, then fetch unique stimuli, then attach.
+        """Extract items + stimuli from test (see api._qti.resolve_test).
+
+        Returns (questions, stimuli) with blocked questions removed and only
+        the stimuli still referenced by a remaining question.
         """
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-
-        parts = test.get("qti-test-part", test.get("testParts", []))
-        if not isinstance(parts, list):
-            parts = [parts]
-
-        # Pass 1: Collect refs from all sections
-        item_hrefs = []
-        section_stim_map = {}  # item_href → stimulus_key
-        stim_keys_to_fetch = {}  # stim_key → best URL to fetch
-
-        for part in parts:
-            sections = part.get("qti-assessment-section", part.get("sections", []))
-            if not isinstance(sections, list):
-                sections = [sections]
-            for section in sections:
-                # Section-level stimulus
-                sec_stim_key = ""
-                stim_refs = section.get("qti-assessment-stimulus-ref", [])
-                if not isinstance(stim_refs, list):
-                    stim_refs = [stim_refs]
-                for sref in (stim_refs or []):
-                    if not sref:
-                        continue
-                    if isinstance(sref, str):
-                        sec_stim_key = sref
-                        stim_keys_to_fetch[sref] = sref
-                    else:
-                        attrs = sref.get("_attributes", sref)
-                        shref = attrs.get("href", "")
-                        sid = attrs.get("identifier", "")
-                        sec_stim_key = shref or sid
-                        if shref:
-                            stim_keys_to_fetch[sec_stim_key] = shref
-                        elif sid:
-                            stim_keys_to_fetch[sec_stim_key] = f"{QTI_BASE}/api/stimuli/{sid}"
-
-                # Item refs
-                refs = section.get("qti-assessment-item-ref", section.get("itemRefs", section.get("items", [])))
-                if not isinstance(refs, list):
-                    refs = [refs]
-                for ref in refs:
-                    href = ""
-                    if isinstance(ref, str):
-                        href = ref
-                    else:
-                        href = ref.get("href", "") or (ref.get("_attributes") or {}).get("href", "")
-                        if not href:
-                            ref_id = ref.get("identifier", ref.get("id", ""))
-                            if ref_id:
-                                href = f"{QTI_BASE}/api/assessment-items/{ref_id}"
-                    if href:
-                        item_hrefs.append(href)
-                        if sec_stim_key:
-                            section_stim_map[href] = sec_stim_key
-
-        # Pass 2: Fetch all items in parallel (max 5 threads)
-        items_by_href = {}
-        def fetch_item(url):
-            return url, _fetch(url, headers)
-
-        with ThreadPoolExecutor(max_workers=5) as pool:
-            futures = [pool.submit(fetch_item, h) for h in item_hrefs]
-            for f in as_completed(futures):
-                try:
-                    url, (data, st) = f.result()
-                    if data:
-                        items_by_href[url] = data
-                except Exception:
-                    pass
-
-        # Check items for embedded stimulus refs (can be at multiple nesting levels)
-        for href, item in items_by_href.items():
-            if href in section_stim_map:
-                continue
-            if not isinstance(item, dict):
-                continue
-            # Check multiple locations for stimulus ref
-            stim_ref = None
-            # Level 1: item.content.qti-assessment-item.qti-assessment-stimulus-ref
-            if isinstance(item.get("content"), dict):
-                qi = item["content"].get("qti-assessment-item", {})
-                if isinstance(qi, dict):
-                    stim_ref = qi.get("qti-assessment-stimulus-ref")
-            # Level 2: item.qti-assessment-stimulus-ref (top level)
-            if not stim_ref:
-                stim_ref = item.get("qti-assessment-stimulus-ref")
-            # Level 3: check responseDeclarations metadata for stimulus ID
-            if not stim_ref and isinstance(item.get("metadata"), dict):
-                sid = item["metadata"].get("stimulusId") or item["metadata"].get("stimulus_id") or ""
-                if sid:
-                    stim_ref = {"_attributes": {"identifier": sid}}
-
-            if stim_ref:
-                attrs = stim_ref.get("_attributes", stim_ref) if isinstance(stim_ref, dict) else {}
-                shref = attrs.get("href", "")
-                sid = attrs.get("identifier", "")
-                key = shref or sid
-                if key:
-                    section_stim_map[href] = key
-                    if key not in stim_keys_to_fetch:
-                        # Try multiple URL patterns for the stimulus
-                        if shref:
-                            stim_keys_to_fetch[key] = shref
-                        elif sid:
-                            stim_keys_to_fetch[key] = f"{QTI_BASE}/api/stimuli/{sid}"
-
-        # Pass 3: Fetch unique stimuli in parallel (try multiple URL patterns)
-        stimulus_cache = {}
-        if stim_keys_to_fetch:
-            def fetch_stim(key_url):
-                key, primary_url = key_url
-                # Try primary URL first
-                data, st = _fetch(primary_url, headers)
-                if data:
-                    return key, data
-                # Try alternate URL patterns
-                sid = key.split("/")[-1] if "/" in key else key
-                for alt in [
-                    f"{QTI_BASE}/api/stimuli/{sid}",
-                    f"{QTI_BASE}/api/assessment-stimuli/{sid}",
-                    f"{QTI_BASE}/api/assessment-items/{sid}",
-                ]:
-                    if alt != primary_url:
-                        data, st = _fetch(alt, headers)
-                        if data:
-                            return key, data
-                return key, None
-
-            with ThreadPoolExecutor(max_workers=5) as pool:
-                futures = [pool.submit(fetch_stim, (k, u)) for k, u in stim_keys_to_fetch.items() if u]
-                for f in as_completed(futures):
-                    try:
-                        key, data = f.result()
-                        if data:
-                            stimulus_cache[key] = data
-                    except Exception:
-                        pass
-
-        # Build final question list in order, with stimuli attached
-        questions = []
-        for href in item_hrefs:
-            item = items_by_href.get(href)
-            if not item:
-                continue
-            if isinstance(item, dict):
-                stim_key = section_stim_map.get(href)
-                if stim_key and stim_key in stimulus_cache:
-                    item["_sectionStimulus"] = stimulus_cache[stim_key]
-            questions.append(item)
+        fetcher = QtiFetcher(headers)
+        try:
+            questions, stimuli = resolve_test(test, fetcher)
+        finally:
+            fetcher.close()
 
         # Filter out globally hidden and permanently bad questions
         questions = _filter_blocked_questions(questions)
 
-        return questions
+        used = {q.get("_stimulusRef") for q in questions if isinstance(q, dict)}
+        stimuli = {k: v for k, v in stimuli.items() if k in used}
+        return questions, stimuli
+
+    def _assessment_data(self, title, questions, stimuli):
+        """Build the ``data`` payload for a resolved assessment.
+
+        Each stimulus is copied into its items' ``_sectionStimulus``, unless
+        the client asked for ``stimuliTable=1``: then stimuli go in a
+        top-level ``stimuli`` table keyed by ``_stimulusRef``.
+        """
+        data = {"title": title, "questions": questions, "totalQuestions": len(questions)}
+        if getattr(self, "stimuli_table", False):
+            data["stimuli"] = stimuli
+        else:
+            data["questions"] = [
+                {**q, "_sectionStimulus": stimuli[q["_stimulusRef"]]}
+                if isinstance(q, dict) and q.get("_stimulusRef") in stimuli else q
+                for q in questions
+            ]
+        return data
 
 
 def _process_response(handler, data, headers):
@@ -771,10 +594,10 @@ def _process_response(handler, data, headers):
         test = {"qti-test-part": top_parts, "_attributes": {"title": data.get("title", "")}}
 
     if test:
-        questions = handler._resolve_questions(test, headers)
+        questions, stimuli = handler._resolve_questions(test, headers)
         title = data.get("title") or (test.get("_attributes") or {}).get("title", "")
         send_json(handler, {
-            "data": {"title": title, "questions": questions, "totalQuestions": len(questions)},
+            "data": handler._assessment_data(title, questions, stimuli),
             "success": True,
         })
         return True
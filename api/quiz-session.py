@@ -7,32 +7,75 @@ Uses the documented PowerPath endpoints:
   POST /powerpath/finalStudentAssessmentResponse   — finalize the attempt
 
 Actions (frontend-facing):
-  POST ?action=start    — {studentId, testId, lessonId}
-  GET  ?action=next     — {attemptId}  (synthetic pp::student::lesson)
-  POST ?action=respond  — {attemptId, questionId, response}
+  POST ?action=start    — {studentId, testId, lessonId, courseId?}
+  GET  ?action=next     — {attemptId, skipIds?}  (synthetic pp::student::lesson)
+  POST ?action=respond  — {attemptId, questionId, response, needScore?}
+  POST ?action=respond_and_next — {attemptId, questionId, response, skipIds?, needScore?}
+                          → PUT response + { next: question | {complete...} }
+  GET  ?action=sweep    — drain every active write-behind stream (cron)
   POST ?action=finalize — {attemptId}
+                          → 503 { retry, pending } while queued responses
+                          are still being saved; otherwise PowerPath's body
+                          plus ``rejected`` (responses PowerPath refused)
+
+Session record: each attempt keeps its state in KV —
+  quiz_session:{student}:{lesson}    { courseId, order, answered ("0101…"
+                                       bitmap over order), hidden, score,
+                                       finalized, updatedAt }
+  quiz_questions:{student}:{lesson}  zlib + base64 JSON { qid: question },
+                                       written when the session is built
+  quiz_hydrated:{student}:{lesson}   { qid: question } for the next
+                                       PREFETCH_DEPTH unanswered questions
+                                       (correct answer, QTI identifier,
+                                       stimulus, AI explanations)
+The record is built from getAssessmentProgress on start / next and then
+updated in place as responses are recorded, so action=next and
+respond_and_next serve the next question without downloading progress
+again. PowerPath is re-read only when the record is missing, doesn't know
+the answered question, or claims the attempt is complete.
+
+Write-behind: a response that can be graded from the stored QTI is
+acknowledged once it is appended to the attempt's KV stream
+(api/_answer_queue.py); a background drain PUTs the stream to
+updateStudentQuestionResponse in order. finalize flushes the stream first,
+and the action=sweep cron drains streams nobody came back for.
+The acknowledgement only carries ``responseResult.isCorrect``; a client that
+needs PowerPath's own ``powerpathScore`` / feedback / xp for the answer
+(PowerPath 100 quizzes end on that score) sends ``needScore: true`` and
+gets the synchronous PUT.
+
+Progress reads go through the attempt snapshot cache (api/_progress_cache.py):
+start / next / progress reuse a snapshot younger than its max age, while
+reconciling always asks PowerPath. Accepted responses are written into the
+snapshot; resetAttempt and finalize invalidate it.
 """
 
+import base64
 import json
-import re
+import threading
+import time
+import zlib
 from http.server import BaseHTTPRequestHandler
 import requests
-from api._helpers import API_BASE, api_headers, send_json, get_query_params
-from api._kv import kv_get
+from api._helpers import API_BASE, CLIENT_ID, CLIENT_SECRET, api_headers, send_json, get_query_params, get_token
+from api._answer_queue import (discard_answers, enqueue_answer, failed_answers, flush_answers, pending_answers,
+                               sweep_answers)
+from api._content_cache import invalidate_student
+from api._kv import kv_get, kv_set, kv_delete
+from api._progress_cache import get_progress, invalidate_progress, record_responses
+from api._qti_xml import correct_response, item_summary
 
 
 def _extract_correct_answer(question):
     """Extract the correct answer from the question's QTI XML (for testing)."""
     raw_xml = question.get("content", {}).get("rawXml", "") if isinstance(question.get("content"), dict) else ""
-    match = re.search(r'<qti-correct-response>\s*<qti-value>([^<]+)</qti-value>', raw_xml)
-    return match.group(1) if match else None
+    return correct_response(raw_xml) or None
 
 
 def _extract_qti_identifier(question):
     """Extract the QTI identifier attribute from the question's raw XML."""
     raw_xml = question.get("content", {}).get("rawXml", "") if isinstance(question.get("content"), dict) else ""
-    match = re.search(r'<qti-assessment-item[^>]+identifier="([^"]+)"', raw_xml)
-    return match.group(1) if match else None
+    return item_summary(raw_xml)["identifier"] or None
 
 PP = f"{API_BASE}/powerpath"
 
@@ -53,6 +96,352 @@ def _decode_attempt(attempt_id: str):
     return None, None
 
 
+# ── Prefetch ─────────────────────────────────────────────────
+
+COGNITO_URL = "https://prod-beyond-timeback-api-2-idp.auth.us-east-1.amazoncognito.com/oauth2/token"
+QTI_BASE = "https://qti.alpha-1edtech.ai"
+
+PREFETCH_DEPTH = 3       # questions hydrated ahead of the student
+SESSION_TTL = 3600       # seconds session records live in KV
+SWEEP_BUDGET = 45        # seconds the sweep cron drains for (maxDuration 60)
+
+
+def _session_key(student: str, lesson: str) -> str:
+    return f"quiz_session:{student}:{lesson}"
+
+
+def _questions_key(student: str, lesson: str) -> str:
+    return f"quiz_questions:{student}:{lesson}"
+
+
+def _hydrated_key(student: str, lesson: str) -> str:
+    return f"quiz_hydrated:{student}:{lesson}"
+
+
+def _clear_session(student: str, lesson: str):
+    for key in (_session_key(student, lesson), _questions_key(student, lesson), _hydrated_key(student, lesson)):
+        kv_delete(key)
+
+
+def _qti_headers():
+    """Headers with a QTI admin-scoped token (falls back to the default token)."""
+    token = None
+    try:
+        resp = requests.post(
+            COGNITO_URL,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            data={
+                "grant_type": "client_credentials",
+                "client_id": CLIENT_ID,
+                "client_secret": CLIENT_SECRET,
+                "scope": "qti/v3/scope/admin",
+            },
+            timeout=10,
+        )
+        if resp.status_code == 200:
+            token = resp.json()["access_token"]
+    except Exception:
+        pass
+    return {"Authorization": f"Bearer {token or get_token()}", "Accept": "application/json"}
+
+
+def _load_explanations(course_id: str) -> dict:
+    """AI wrong-answer explanations for a course, or {} if disabled (mirrors get-explanations)."""
+    if not course_id:
+        return {}
+    alias = kv_get(f"explanation_alias:{course_id}")
+    resolved = alias if isinstance(alias, str) and alias else course_id
+    enabled = kv_get(f"explanations_enabled:{course_id}")
+    if not (enabled is True or enabled == "true"):
+        enabled = kv_get(f"explanations_enabled:{resolved}")
+    if not (enabled is True or enabled == "true"):
+        return {}
+    for cid in (resolved, course_id):
+        saved = kv_get(f"explanations:{cid}")
+        if isinstance(saved, dict) and saved.get("explanations"):
+            return saved["explanations"]
+    return {}
+
+
+def _fetch_stimulus(ref: dict, headers: dict):
+    """Fetch a referenced stimulus and return its body node, or None."""
+    sid = ref.get("identifier") or ""
+    href = ref.get("href") or ""
+    urls = []
+    if href.startswith("http"):
+        urls.append(href)
+    if sid:
+        urls.append(f"{QTI_BASE}/api/stimuli/{sid}")
+    for url in urls:
+        try:
+            resp = requests.get(url, headers=headers, timeout=10)
+            if resp.status_code != 200:
+                continue
+            data = resp.json()
+            stim = data.get("qti-assessment-stimulus") or (data.get("content") or {}).get("qti-assessment-stimulus") or data
+            body = stim.get("qti-stimulus-body") if isinstance(stim, dict) else None
+            if body:
+                return body
+        except Exception:
+            continue
+    return None
+
+
+def _hydrate(q: dict, explanations: dict, ctx: dict) -> dict:
+    """Attach correctId, qtiIdentifier, stimulus and explanations to a PowerPath question.
+
+    ``ctx`` carries the stimulus cache and lazily-fetched QTI headers across a batch.
+    """
+    raw_xml = q.get("content", {}).get("rawXml", "") if isinstance(q.get("content"), dict) else ""
+    head = item_summary(raw_xml)
+    if head["correctId"]:
+        q["correctId"] = head["correctId"]
+    if head["identifier"]:
+        q["qtiIdentifier"] = head["identifier"]
+
+    if not q.get("stimulus") and head["stimulusRefs"]:
+        ref = head["stimulusRefs"][0]
+        key = ref["identifier"] or ref["href"]
+        stimuli = ctx["stimuli"]
+        if key not in stimuli:
+            if ctx["headers"] is None:
+                ctx["headers"] = _qti_headers()
+            stimuli[key] = _fetch_stimulus(ref, ctx["headers"])
+        if stimuli[key]:
+            q["stimulus"] = stimuli[key]
+
+    for qid in (head["identifier"], q.get("id")):
+        if qid and qid in explanations:
+            q["explanations"] = explanations[qid]
+            break
+    return q
+
+
+# ── Session record ───────────────────────────────────────────
+
+def _is_answered(q: dict) -> bool:
+    return bool(q.get("answered", False) or q.get("response") is not None)
+
+
+def _build_session(student: str, lesson: str, progress: dict, course_id: str = "") -> dict:
+    """Replace the session record from a getAssessmentProgress payload.
+
+    Responses still in the write-behind queue count as answered.
+    """
+    questions = [q for q in progress.get("questions", []) if q.get("id")]
+    hidden = set(kv_get(f"hidden_questions:{student}") or [])
+    queued = {item.get("question") for item in pending_answers(student, lesson)}
+    session = {
+        "courseId": course_id,
+        "order": [q["id"] for q in questions],
+        "answered": "".join("1" if _is_answered(q) or q["id"] in queued else "0" for q in questions),
+        "hidden": [q["id"] for q in questions if q["id"] in hidden],
+        "score": progress.get("score"),
+        "finalized": progress.get("finalized", False),
+        "updatedAt": time.time(),
+    }
+    blob = base64.b64encode(zlib.compress(json.dumps({q["id"]: q for q in questions}).encode(), 6)).decode()
+    kv_set(_questions_key(student, lesson), {"z": blob}, ttl=SESSION_TTL)
+    kv_set(_session_key(student, lesson), session, ttl=SESSION_TTL)
+    return session
+
+
+def _load_session(student: str, lesson: str) -> dict | None:
+    session = kv_get(_session_key(student, lesson))
+    return session if isinstance(session, dict) and "order" in session else None
+
+
+def _load_questions(student: str, lesson: str) -> dict:
+    stored = kv_get(_questions_key(student, lesson))
+    try:
+        return json.loads(zlib.decompress(base64.b64decode(stored["z"])))
+    except Exception:
+        return {}
+
+
+def _counts(session: dict) -> tuple[int, int]:
+    """(total, answered) — hidden questions count as answered."""
+    hidden = set(session["hidden"])
+    answered = sum(1 for qid, bit in zip(session["order"], session["answered"]) if bit == "1" or qid in hidden)
+    return len(session["order"]), answered
+
+
+def _upcoming(session: dict, skip_ids: set, limit: int) -> list[str]:
+    """The next ``limit`` unanswered, visible question ids in order."""
+    hidden = set(session["hidden"]) | skip_ids
+    out = []
+    for qid, bit in zip(session["order"], session["answered"]):
+        if bit == "0" and qid not in hidden:
+            out.append(qid)
+            if len(out) >= limit:
+                break
+    return out
+
+
+def _mark_answered(session: dict, question_id: str) -> bool:
+    """Set a question's answered bit. False if the session doesn't know the question."""
+    try:
+        i = session["order"].index(question_id)
+    except ValueError:
+        return False
+    bits = session["answered"]
+    session["answered"] = bits[:i] + "1" + bits[i + 1:]
+    session["updatedAt"] = time.time()
+    return True
+
+
+def _question_for(student: str, lesson: str, session: dict, question_id: str) -> dict | None:
+    """A hydrated question with progress counts, from the prefetch cache or the stored payload."""
+    hydrated = kv_get(_hydrated_key(student, lesson)) or {}
+    q = hydrated.get(question_id) if isinstance(hydrated, dict) else None
+    if not q:
+        raw = _load_questions(student, lesson).get(question_id)
+        if not raw:
+            return None
+        q = _hydrate(raw, _load_explanations(session.get("courseId", "")), {"stimuli": {}, "headers": None})
+    total, answered = _counts(session)
+    q["totalQuestions"] = total
+    q["answeredQuestions"] = answered
+    return q
+
+
+def _top_up(student: str, lesson: str):
+    """Hydrate the next PREFETCH_DEPTH unanswered questions into KV. Runs in a background thread."""
+    try:
+        session = _load_session(student, lesson)
+        if not session:
+            return
+        upcoming = _upcoming(session, set(), PREFETCH_DEPTH)
+        prev = kv_get(_hydrated_key(student, lesson))
+        hydrated = {qid: q for qid, q in (prev or {}).items() if qid in upcoming} if isinstance(prev, dict) else {}
+        todo = [qid for qid in upcoming if qid not in hydrated]
+        if todo:
+            questions = _load_questions(student, lesson)
+            explanations = _load_explanations(session.get("courseId", ""))
+            ctx = {"stimuli": {}, "headers": None}
+            for qid in todo:
+                if qid in questions:
+                    hydrated[qid] = _hydrate(questions[qid], explanations, ctx)
+        if hydrated != prev:
+            kv_set(_hydrated_key(student, lesson), hydrated, ttl=SESSION_TTL)
+    except Exception as e:
+        print(f"[quiz-session] prefetch failed: {e}")
+
+
+def _fetch_progress(student: str, lesson: str, headers: dict | None = None, max_age: float | None = None) -> dict | None:
+    return get_progress(student, lesson, headers, max_age)[0]
+
+
+def _reconcile(student: str, lesson: str, headers: dict | None = None, course_id: str = "") -> dict | None:
+    """Rebuild the session from PowerPath (the source of truth). None if unavailable."""
+    if not course_id:
+        prev = _load_session(student, lesson)
+        course_id = prev.get("courseId", "") if prev else ""
+    try:
+        progress = _fetch_progress(student, lesson, headers, max_age=0)
+    except Exception:
+        return None
+    return _build_session(student, lesson, progress, course_id) if progress is not None else None
+
+
+def _warm_prefetch(student: str, lesson: str, progress: dict | None = None, course_id: str = ""):
+    """Rebuild the session record and hydrate the next PREFETCH_DEPTH questions.
+
+    ``progress`` is an already-fetched getAssessmentProgress payload; when
+    omitted it is fetched here. Runs in a background thread.
+    """
+    try:
+        if progress is None:
+            if _reconcile(student, lesson, course_id=course_id) is None:
+                return
+        else:
+            if not course_id:
+                prev = _load_session(student, lesson)
+                course_id = prev.get("courseId", "") if prev else ""
+            _build_session(student, lesson, progress, course_id)
+        _top_up(student, lesson)
+    except Exception as e:
+        print(f"[quiz-session] prefetch failed: {e}")
+
+
+def _start_prefetch(student: str, lesson: str, progress: dict | None = None, course_id: str = ""):
+    threading.Thread(
+        target=_warm_prefetch,
+        args=(student, lesson, progress, course_id),
+        daemon=True,
+    ).start()
+
+
+def _start_top_up(student: str, lesson: str):
+    threading.Thread(target=_top_up, args=(student, lesson), daemon=True).start()
+
+
+def _next_from_prefetch(student: str, lesson: str, skip_ids: set):
+    """Return the next question from the session record, or None on a miss."""
+    session = _load_session(student, lesson)
+    if not session:
+        return None
+    upcoming = _upcoming(session, skip_ids, 1)
+    if not upcoming:
+        return None  # let PowerPath confirm completion
+    q = _question_for(student, lesson, session, upcoming[0])
+    if q:
+        q["prefetched"] = True
+    return q
+
+
+def _record_answer(student: str, lesson: str, question_id: str) -> bool:
+    """Mark a question answered in the session record. False if the record
+    is missing or doesn't know the question (it then needs a rebuild)."""
+    session = _load_session(student, lesson)
+    if not session or not _mark_answered(session, question_id):
+        return False
+    kv_set(_session_key(student, lesson), session, ttl=SESSION_TTL)
+    return True
+
+
+def _grade_locally(student: str, lesson: str, question_id: str, response) -> bool | None:
+    """Whether ``response`` matches the question's QTI correct response, or
+    None if the stored question can't tell (multi-value, missing XML)."""
+    if not isinstance(response, str):
+        return None
+    q = _load_questions(student, lesson).get(question_id)
+    correct = _extract_correct_answer(q) if q else None
+    return response == correct if correct else None
+
+
+def _accept_response(student: str, lesson: str, question_id: str, response, headers: dict,
+                     need_score: bool = False):
+    """Record a response. Returns (data, status).
+
+    When the answer can be graded from the stored QTI and the caller doesn't
+    need PowerPath's score for it, it is appended to the write-behind queue
+    and acknowledged straight away; otherwise it is PUT to PowerPath
+    synchronously and PowerPath's body is returned.
+    """
+    is_correct = None if need_score else _grade_locally(student, lesson, question_id, response)
+    if is_correct is not None and enqueue_answer(student, lesson, question_id, response):
+        return {"queued": True, "responseResult": {"isCorrect": is_correct}}, 200
+    resp = _put_response(student, lesson, question_id, response, headers)
+    if not resp.ok:
+        return {"error": resp.text[:200]}, resp.status_code
+    data = resp.json() if resp.text else {}
+    result = data.get("responseResult") if isinstance(data, dict) else None
+    record_responses(student, lesson, {question_id: {
+        "response": response,
+        "isCorrect": result.get("isCorrect") if isinstance(result, dict) else None,
+    }})
+    return data, resp.status_code
+
+
+def _put_response(student: str, lesson: str, question_id: str, response, headers: dict):
+    payload = {"student": student, "lesson": lesson, "question": question_id, "response": response}
+    resp = requests.put(f"{PP}/updateStudentQuestionResponse", headers=headers, json=payload, timeout=10)
+    if resp.status_code == 401:
+        resp = requests.put(f"{PP}/updateStudentQuestionResponse", headers=api_headers(), json=payload, timeout=10)
+    return resp
+
+
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(204)
@@ -75,19 +464,21 @@ class handler(BaseHTTPRequestHandler):
 
             student, lesson = _decode_attempt(attempt_id)
             if student and lesson:
-                # Use documented getAssessmentProgress endpoint
+                # Serve from the prefetch record when it has a question ready
+                skip_ids = {s for s in params.get("skipIds", "").split(",") if s}
+                cached = _next_from_prefetch(student, lesson, skip_ids)
+                if cached:
+                    send_json(self, cached)
+                    return
+
+                # Use documented getAssessmentProgress endpoint (via the snapshot cache)
                 try:
-                    resp = requests.get(
-                        f"{PP}/getAssessmentProgress",
-                        headers=headers,
-                        params={"student": student, "lesson": lesson},
-                        timeout=15,
-                    )
-                    if resp.status_code == 200:
-                        data = resp.json()
+                    data, status = get_progress(student, lesson, headers)
+                    if data is not None:
                         questions = data.get("questions", [])
                         # Filter out questions hidden by admin
                         hidden = kv_get(f"hidden_questions:{student}") or []
+                        queued = {item.get("question") for item in pending_answers(student, lesson)}
                         total_q = len(questions)
                         answered_q = 0
                         # Find the first unanswered question
@@ -95,7 +486,7 @@ class handler(BaseHTTPRequestHandler):
                             if q.get("id") in hidden:
                                 answered_q += 1
                                 continue
-                            answered = q.get("answered", False) or q.get("response") is not None
+                            answered = _is_answered(q) or q.get("id") in queued
                             if answered:
                                 answered_q += 1
                             elif not answered:
@@ -110,6 +501,7 @@ class handler(BaseHTTPRequestHandler):
                                 q["totalQuestions"] = total_q
                                 q["answeredQuestions"] = answered_q
                                 send_json(self, q)
+                                _start_prefetch(student, lesson, data)
                                 return
                         # All questions answered — only mark complete if ALL were answered
                         send_json(self, {
@@ -122,7 +514,7 @@ class handler(BaseHTTPRequestHandler):
                         return
                     else:
                         send_json(self, {
-                            "error": f"Progress fetch failed ({resp.status_code})",
+                            "error": f"Progress fetch failed ({status})",
                             "retry": True,
                         })
                         return
@@ -148,18 +540,18 @@ class handler(BaseHTTPRequestHandler):
         elif action == "progress":
             sid = params.get("studentId", "")
             lid = params.get("lessonId", params.get("testId", ""))
+            max_age = params.get("maxAge", "")
             try:
-                resp = requests.get(
-                    f"{PP}/getAssessmentProgress",
-                    headers=headers,
-                    params={"student": sid, "lesson": lid},
-                    timeout=10,
-                )
-                send_json(self, resp.json(), resp.status_code)
+                data, status = get_progress(sid, lid, headers, float(max_age) if max_age else None, timeout=10)
+                send_json(self, data if data is not None else {"error": f"Progress fetch failed ({status})"}, status)
+            except ValueError:
+                send_json(self, {"error": "maxAge must be a number of seconds"}, 400)
             except Exception as e:
                 send_json(self, {"error": str(e)}, 500)
+        elif action == "sweep":
+            send_json(self, sweep_answers(deadline=time.time() + SWEEP_BUDGET))
         else:
-            send_json(self, {"error": "Use action=next or action=progress"}, 400)
+            send_json(self, {"error": "Use action=next, progress or sweep"}, 400)
 
     # ── POST actions ─────────────────────────────────────────
     def do_POST(self):
@@ -177,10 +569,12 @@ class handler(BaseHTTPRequestHandler):
             self._handle_start(body, headers)
         elif action == "respond":
             self._handle_respond(body, headers)
+        elif action == "respond_and_next":
+            self._handle_respond_and_next(body, headers)
         elif action == "finalize":
             self._handle_finalize(body, headers)
         else:
-            send_json(self, {"error": "Use action=start, respond, or finalize"}, 400)
+            send_json(self, {"error": "Use action=start, respond, respond_and_next, or finalize"}, 400)
 
     # ── start: NEVER reset unless explicit retry or empty bank ─
     def _handle_start(self, body, headers):
@@ -193,33 +587,22 @@ class handler(BaseHTTPRequestHandler):
             send_json(self, {"error": "Need studentId and testId or lessonId"}, 400)
             return
 
+        course_id = body.get("courseId", "")
         debug = []
         synthetic_id = _encode_attempt(student_id, lesson_id)
 
         # ── Explicit retry: reset and start fresh ──
         if force_retry:
+            _clear_session(student_id, lesson_id)
+            discard_answers(student_id, lesson_id)
             self._do_reset(student_id, lesson_id, headers, debug)
-            self._return_progress(student_id, lesson_id, headers, debug, synthetic_id)
+            self._return_progress(student_id, lesson_id, headers, debug, synthetic_id, course_id)
             return
 
         # ── Normal entry: check existing progress, NEVER reset ──
         try:
-            resp = requests.get(
-                f"{PP}/getAssessmentProgress",
-                headers=headers,
-                params={"student": student_id, "lesson": lesson_id},
-                timeout=15,
-            )
-            if resp.status_code == 401:
-                headers = api_headers()
-                resp = requests.get(
-                    f"{PP}/getAssessmentProgress",
-                    headers=headers,
-                    params={"student": student_id, "lesson": lesson_id},
-                    timeout=15,
-                )
-            if resp.status_code == 200:
-                data = resp.json()
+            data, status = get_progress(student_id, lesson_id, headers)
+            if data is not None:
                 questions = data.get("questions", [])
                 total_q = len(questions)
                 answered_q = sum(
@@ -242,6 +625,7 @@ class handler(BaseHTTPRequestHandler):
                         "score": data.get("score"),
                         "debug": debug,
                     })
+                    _start_prefetch(student_id, lesson_id, data, course_id)
                     return
 
                 # No questions at all — bank not initialized, need reset
@@ -249,8 +633,7 @@ class handler(BaseHTTPRequestHandler):
             else:
                 debug.append({
                     "step": "checkProgress",
-                    "status": resp.status_code,
-                    "body": resp.text[:200],
+                    "status": status,
                 })
         except Exception as e:
             debug.append({"step": "checkProgress", "error": str(e)})
@@ -266,7 +649,7 @@ class handler(BaseHTTPRequestHandler):
 
         # ── Only reaches here if question bank is empty — initialize it ──
         self._do_reset(student_id, lesson_id, headers, debug)
-        self._return_progress(student_id, lesson_id, headers, debug, synthetic_id)
+        self._return_progress(student_id, lesson_id, headers, debug, synthetic_id, course_id)
 
     def _do_reset(self, student_id, lesson_id, headers, debug):
         """Call resetAttempt to initialize/reset the question bank."""
@@ -292,18 +675,14 @@ class handler(BaseHTTPRequestHandler):
                 )
         except Exception as e:
             debug.append({"step": "resetAttempt", "error": str(e)})
+        invalidate_progress(student_id, lesson_id)
+        invalidate_student(student_id)
 
-    def _return_progress(self, student_id, lesson_id, headers, debug, synthetic_id):
+    def _return_progress(self, student_id, lesson_id, headers, debug, synthetic_id, course_id=""):
         """Fetch progress after a reset and return it."""
         try:
-            resp = requests.get(
-                f"{PP}/getAssessmentProgress",
-                headers=headers,
-                params={"student": student_id, "lesson": lesson_id},
-                timeout=15,
-            )
-            if resp.status_code == 200:
-                data = resp.json()
+            data, _ = get_progress(student_id, lesson_id, headers, max_age=0)
+            if data is not None:
                 questions = data.get("questions", [])
                 send_json(self, {
                     "attemptId": synthetic_id,
@@ -313,6 +692,7 @@ class handler(BaseHTTPRequestHandler):
                     "score": data.get("score"),
                     "debug": debug,
                 })
+                _start_prefetch(student_id, lesson_id, data, course_id)
                 return
         except Exception as e:
             debug.append({"step": "getAssessmentProgress", "error": str(e)})
@@ -349,39 +729,18 @@ class handler(BaseHTTPRequestHandler):
 
         student, lesson = _decode_attempt(attempt_id)
         if student and lesson:
-            # Use documented PUT endpoint
             try:
-                resp = requests.put(
-                    f"{PP}/updateStudentQuestionResponse",
-                    headers=headers,
-                    json={
-                        "student": student,
-                        "lesson": lesson,
-                        "question": question_id,
-                        "response": response,
-                    },
-                    timeout=10,
-                )
-                if resp.status_code == 401:
-                    headers = api_headers()
-                    resp = requests.put(
-                        f"{PP}/updateStudentQuestionResponse",
-                        headers=headers,
-                        json={
-                            "student": student,
-                            "lesson": lesson,
-                            "question": question_id,
-                            "response": response,
-                        },
-                        timeout=10,
-                    )
-                if resp.ok:
-                    data = resp.json() if resp.text else {}
-                    send_json(self, data, resp.status_code)
-                else:
-                    send_json(self, {"error": resp.text[:200]}, resp.status_code)
+                data, status = _accept_response(student, lesson, question_id, response, headers,
+                                                bool(body.get("needScore")))
             except Exception as e:
                 send_json(self, {"error": str(e)}, 500)
+                return
+            send_json(self, data, status)
+            if status < 300:
+                if _record_answer(student, lesson, question_id):
+                    _start_top_up(student, lesson)
+                else:
+                    _start_prefetch(student, lesson)
         else:
             # Legacy attemptId — use old endpoint
             try:
@@ -395,6 +754,65 @@ class handler(BaseHTTPRequestHandler):
             except Exception as e:
                 send_json(self, {"error": str(e)}, 500)
 
+    # ── respond_and_next: record a response, return the next question ─
+    def _handle_respond_and_next(self, body, headers):
+        attempt_id = body.get("attemptId", "")
+        question_id = body.get("questionId", "")
+        response = body.get("response", "")
+        student, lesson = _decode_attempt(attempt_id)
+        if not student or not lesson or not question_id:
+            send_json(self, {"error": "Need a PowerPath attemptId and questionId"}, 400)
+            return
+
+        try:
+            data, status = _accept_response(student, lesson, question_id, response, headers,
+                                            bool(body.get("needScore")))
+        except Exception as e:
+            send_json(self, {"error": str(e)}, 500)
+            return
+        if status >= 300:
+            send_json(self, data, status)
+            return
+
+        # Advance the session record in place; rebuild from PowerPath only
+        # when the record is missing or disagrees with what was answered.
+        raw_skip = body.get("skipIds") or []
+        if isinstance(raw_skip, str):
+            raw_skip = raw_skip.split(",")
+        skip_ids = {s for s in raw_skip if s} | {question_id}
+        session = _load_session(student, lesson)
+        reconciled = False
+        if not session or session.get("finalized") or not _mark_answered(session, question_id):
+            session = _reconcile(student, lesson, headers)
+            reconciled = True
+        else:
+            kv_set(_session_key(student, lesson), session, ttl=SESSION_TTL)
+
+        upcoming = _upcoming(session, skip_ids, 1) if session else []
+        if session and not upcoming and not reconciled:
+            # The record says we're done — confirm with PowerPath before saying so
+            session = _reconcile(student, lesson, headers)
+            reconciled = True
+            upcoming = _upcoming(session, skip_ids, 1) if session else []
+
+        if not session:
+            nxt = {"error": "Progress fetch failed", "retry": True}
+        elif upcoming:
+            nxt = _question_for(student, lesson, session, upcoming[0]) or {"error": "Question unavailable", "retry": True}
+        else:
+            total, answered = _counts(session)
+            nxt = {
+                "complete": True,
+                "totalQuestions": total,
+                "answeredQuestions": answered,
+                "score": session.get("score"),
+                "finalized": session.get("finalized", False),
+            }
+
+        send_json(self, {**data, "next": nxt, "reconciled": reconciled})
+        if session:
+            _start_top_up(student, lesson)
+
     # ── finalize: finalStudentAssessmentResponse ─────────────
     def _handle_finalize(self, body, headers):
         attempt_id = body.get("attemptId", "")
@@ -404,6 +822,18 @@ class handler(BaseHTTPRequestHandler):
 
         student, lesson = _decode_attempt(attempt_id)
         if student and lesson:
+            # Every queued response must reach PowerPath before it scores the attempt
+            if not flush_answers(student, lesson):
+                send_json(self, {
+                    "status": "error",
+                    "message": "Responses are still being saved — try again",
+                    "pending": len(pending_answers(student, lesson)),
+                    "retry": True,
+                }, 503)
+                return
+            rejected = failed_answers(student, lesson)
+            if rejected:
+                print(f"[quiz-session] {student}/{lesson}: {len(rejected)} response(s) rejected by PowerPath")
             # Use documented endpoint
             try:
                 resp = requests.post(
@@ -420,14 +850,19 @@ class handler(BaseHTTPRequestHandler):
                         json={"student": student, "lesson": lesson},
                         timeout=15,
                     )
+                invalidate_progress(student, lesson)
+                invalidate_student(student)
                 if resp.ok:
                     data = resp.json() if resp.text else {}
+                    if rejected and isinstance(data, dict):
+                        data = {**data, "rejected": rejected}
                     send_json(self, data)
                 else:
                     send_json(self, {
                         "status": "error",
                         "message": f"Finalize failed ({resp.status_code})",
                         "body": resp.text[:300],
+                        "rejected": rejected,
                     }, resp.status_code if resp.status_code < 500 else 502)
             except Exception as e:
                 send_json(self, {"error": str(e)}, 500)
@@ -4,16 +4,29 @@ If a PowerPath assessmentLineItemSourcedId is provided (UUID format), we use it
 Otherwise, we create/upsert our own assessmentLineItem.
 
 Then we create/upsert an AssessmentResult referencing that line item.
+
+Bulk: { "results": [ {...same fields as a single submission...}, ... ] }
+upserts every result in one request. Line items are upserted once each
+(skipping ones already upserted, remembered in-process and in KV under
+``ali_upserted:{id}``), then all results are PUT concurrently; the response
+reports a status per item, in input order. A result PUT that fails with
+404 / 422 against a line item we had skipped as known (deleted or
+deactivated upstream since) forgets the marker, re-upserts the line item
+once, and retries the result.
 """
 
 import json
 import hashlib
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from http.server import BaseHTTPRequestHandler
 
 import requests
+from api._content_cache import invalidate_student
 from api._helpers import API_BASE, api_headers, send_json
+from api._kv import kv_delete, kv_mget, kv_set_many
+from api._xp_ledger import record_result
 
 
 def _deterministic_id(seed: str) -> str:
@@ -29,6 +42,171 @@ def _is_uuid(s: str) -> bool:
 
 
 GRADEBOOK = f"{API_BASE}/ims/oneroster/gradebook/v1p2"
+MAX_BULK = 200
+PUT_WORKERS = 8
+ALI_KNOWN_TTL = 30 * 24 * 3600
+
+_known_alis = set()   # line items this instance has upserted or confirmed
+
+
+def _put(url: str, payload: dict, headers: dict):
+    """PUT with one retry on a fresh token after 401."""
+    resp = requests.put(url, headers=headers, json=payload, timeout=15)
+    if resp.status_code == 401:
+        resp = requests.put(url, headers=api_headers(), json=payload, timeout=15)
+    return resp
+
+
+def _prepare(item: dict, now: str) -> dict:
+    """Resolve one submission's line item and result ids and payloads."""
+    student_id = item.get("studentSourcedId", "")
+    if not student_id:
+        return {"error": "Missing studentSourcedId"}
+    line_item_id = item.get("assessmentLineItemSourcedId", "")
+    metadata = item.get("metadata") or {}
+    lesson_title = metadata.get("timeback.lessonTitle", "") or item.get("lessonTitle", "")
+
+    # If the provided ID looks like a UUID (from PowerPath), use it directly
+    # Otherwise, create our own deterministic ID
+    is_powerpath_id = _is_uuid(line_item_id)
+    ali_payload = None
+    if is_powerpath_id:
+        ali_id = line_item_id
+    else:
+        ali_seed = line_item_id or lesson_title or "unknown"
+        ali_id = _deterministic_id(f"ali:{ali_seed}")
+        ali_title = lesson_title or line_item_id or "Quiz"
+        ali_payload = {
+            "assessmentLineItem": {
+                "sourcedId": ali_id,
+                "status": "active",
+                "title": ali_title,
+                "description": f"Auto-created for {ali_title}",
+                "assignDate": now,
+                "dueDate": now,
+                "resultValueMin": 0.0,
+                "resultValueMax": 100.0,
+            }
+        }
+
+    result_id = _deterministic_id(f"result:{ali_id}:{student_id}:{now[:10]}")
+    result = {
+        "sourcedId": result_id,
+        "status": "active",
+        "student": {"sourcedId": student_id},
+        "assessmentLineItem": {"sourcedId": ali_id},
+        "score": item.get("score"),
+        "scoreStatus": item.get("scoreStatus", "fully graded"),
+        "scoreDate": now,
+        "comment": item.get("comment", "") or None,
+        "metadata": metadata or None,
+    }
+    return {
+        "studentId": student_id,
+        "aliId": ali_id,
+        "aliPayload": ali_payload,
+        "resultId": result_id,
+        "result": result,
+        "usedPowerPathALI": is_powerpath_id,
+    }
+
+
+def _unknown_alis(ali_ids: set) -> set:
+    """The line items not yet upserted, per the in-process set and KV."""
+    todo = sorted(ali_ids - _known_alis)
+    if not todo:
+        return set()
+    for ali_id, known in zip(todo, kv_mget([f"ali_upserted:{a}" for a in todo])):
+        if known:
+            _known_alis.add(ali_id)
+    return set(todo) - _known_alis
+
+
+def _forget_alis(ali_ids: set):
+    """Drop the known markers of line items that turned out to be missing."""
+    _known_alis.difference_update(ali_ids)
+    for ali_id in ali_ids:
+        kv_delete(f"ali_upserted:{ali_id}")
+
+
+def _upsert_alis(payloads: dict, headers: dict, debug: list) -> dict:
+    """PUT line items concurrently. Returns {ali_id: error} for failures."""
+    def put_one(ali_id):
+        url = f"{GRADEBOOK}/assessmentLineItems/{ali_id}"
+        try:
+            resp = _put(url, payloads[ali_id], headers)
+        except Exception as e:
+            return ali_id, {"step": "1_upsert_lineItem", "url": url, "error": str(e)}
+        return ali_id, {"step": "1_upsert_lineItem", "url": url, "status": resp.status_code, "body": resp.text[:300]}
+
+    failed, upserted = {}, []
+    with ThreadPoolExecutor(max_workers=max(1, min(PUT_WORKERS, len(payloads)))) as pool:
+        for ali_id, entry in pool.map(put_one, list(payloads)):
+            debug.append(entry)
+            if entry.get("status") in (200, 201):
+                upserted.append(ali_id)
+            else:
+                failed[ali_id] = entry.get("error") or f"AssessmentLineItem upsert failed ({entry.get('status')})"
+    _known_alis.update(upserted)
+    kv_set_many({f"ali_upserted:{a}": 1 for a in upserted}, ttl=ALI_KNOWN_TTL)
+    return failed
+
+
+def _submit(items: list, debug: list) -> list:
+    """Upsert line items then results for every item. Returns one outcome per item."""
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    headers = api_headers()
+    prepared = [_prepare(item, now) for item in items]
+
+    ali_payloads = {p["aliId"]: p["aliPayload"] for p in prepared if p.get("aliPayload")}
+    for ali_id in set(ali_payloads) - _unknown_alis(set(ali_payloads)):
+        debug.append({"step": "1_lineItem_known", "assessmentLineItemSourcedId": ali_id})
+        ali_payloads.pop(ali_id)
+    ali_errors = _upsert_alis(ali_payloads, headers, debug) if ali_payloads else {}
+
+    def put_result(p):
+        if "error" in p:
+            return {"status": "error", "message": p["error"]}
+        if p["aliId"] in ali_errors:
+            return {"status": "error", "message": ali_errors[p["aliId"]], "assessmentLineItemId": p["aliId"]}
+        url = f"{GRADEBOOK}/assessmentResults/{p['resultId']}"
+        out = {"assessmentLineItemId": p["aliId"], "resultId": p["resultId"], "usedPowerPathALI": p["usedPowerPathALI"]}
+        try:
+            resp = _put(url, {"assessmentResult": p["result"]}, headers)
+        except Exception as e:
+            return {**out, "status": "error", "message": str(e), "debug": {"step": "2_upsert_result", "url": url, "error": str(e)}}
+        out["debug"] = {"step": "2_upsert_result", "url": url, "status": resp.status_code, "body": resp.text[:300]}
+        out["httpStatus"] = resp.status_code
+        if resp.status_code in (200, 201):
+            try:
+                out["response"] = resp.json()
+            except Exception:
+                out["response"] = {}
+            return {**out, "status": "success"}
+        return {**out, "status": "error", "message": f"AssessmentResult upsert failed ({resp.status_code})"}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(PUT_WORKERS, len(prepared)))) as pool:
+        outcomes = list(pool.map(put_result, prepared))
+
+    # A line item skipped as known may have been deleted or deactivated
+    # upstream: re-upsert it once and retry its results
+    stale = [i for i, (p, out) in enumerate(zip(prepared, outcomes))
+             if p.get("aliPayload") and p["aliId"] not in ali_payloads and out.get("httpStatus") in (404, 422)]
+    if stale:
+        payloads = {prepared[i]["aliId"]: prepared[i]["aliPayload"] for i in stale}
+        debug.append({"step": "1_lineItem_stale", "assessmentLineItemSourcedIds": sorted(payloads)})
+        _forget_alis(set(payloads))
+        ali_errors.update(_upsert_alis(payloads, headers, debug))
+        with ThreadPoolExecutor(max_workers=max(1, min(PUT_WORKERS, len(stale)))) as pool:
+            for i, out in zip(stale, pool.map(put_result, [prepared[i] for i in stale])):
+                outcomes[i] = out
+
+    for p, out in zip(prepared, outcomes):
+        if out["status"] == "success":
+            record_result(p["studentId"], p["result"])
+    for student_id in {p["studentId"] for p, out in zip(prepared, outcomes) if out["status"] == "success"}:
+        invalidate_student(student_id)
+    return outcomes
 
 
 class handler(BaseHTTPRequestHandler):
@@ -47,139 +225,56 @@ class handler(BaseHTTPRequestHandler):
             send_json(self, {"error": "Invalid JSON body"}, 400)
             return
 
-        student_id = body.get("studentSourcedId", "")
-        line_item_id = body.get("assessmentLineItemSourcedId", "")
-        score = body.get("score")
-        score_status = body.get("scoreStatus", "fully graded")
-        comment = body.get("comment", "")
-        metadata = body.get("metadata") or {}
-        lesson_title = metadata.get("timeback.lessonTitle", "") or body.get("lessonTitle", "")
+        if "results" in body:
+            self._handle_bulk(body.get("results"))
+            return
 
-        if not student_id:
+        if not body.get("studentSourcedId", ""):
             send_json(self, {"error": "Missing studentSourcedId"}, 400)
             return
 
-        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        headers = api_headers()
         debug = []
-
-        # ── Determine the AssessmentLineItem ID to use ──
-        # If the provided ID looks like a UUID (from PowerPath), use it directly
-        # Otherwise, create our own deterministic ID
-        
-        is_powerpath_id = _is_uuid(line_item_id)
-        
-        if is_powerpath_id:
-            # Use the PowerPath assessmentLineItemSourcedId directly
-            ali_id = line_item_id
-            debug.append({
-                "step": "0_using_powerpath_ali",
-                "assessmentLineItemSourcedId": ali_id,
-                "note": "Using existing PowerPath assessmentLineItem"
-            })
-        else:
-            # Create our own assessmentLineItem
-            ali_seed = line_item_id or lesson_title or "unknown"
-            ali_id = _deterministic_id(f"ali:{ali_seed}")
-            ali_title = lesson_title or line_item_id or "Quiz"
-
-            ali_payload = {
-                "assessmentLineItem": {
-                    "sourcedId": ali_id,
-                    "status": "active",
-                    "title": ali_title,
-                    "description": f"Auto-created for {ali_title}",
-                    "assignDate": now,
-                    "dueDate": now,
-                    "resultValueMin": 0.0,
-                    "resultValueMax": 100.0,
-                }
-            }
-
-            ali_url = f"{GRADEBOOK}/assessmentLineItems/{ali_id}"
-            try:
-                resp = requests.put(ali_url, headers=headers, json=ali_payload, timeout=15)
-                if resp.status_code == 401:
-                    headers = api_headers()
-                    resp = requests.put(ali_url, headers=headers, json=ali_payload, timeout=15)
-                debug.append({
-                    "step": "1_upsert_lineItem",
-                    "url": ali_url,
-                    "status": resp.status_code,
-                    "body": resp.text[:300],
-                })
-            except Exception as e:
-                debug.append({"step": "1_upsert_lineItem", "error": str(e)})
-                send_json(self, {
-                    "status": "error",
-                    "message": "Failed to create assessmentLineItem",
-                    "debug": debug,
-                }, 502)
-                return
-
-            if resp.status_code not in (200, 201):
-                send_json(self, {
-                    "status": "error",
-                    "message": f"AssessmentLineItem upsert failed ({resp.status_code})",
-                    "debug": debug,
-                }, 502)
-                return
-
-        # ── Step 2: Create the AssessmentResult ──
-        result_seed = f"result:{ali_id}:{student_id}:{now[:10]}"
-        result_id = _deterministic_id(result_seed)
-
-        result_payload = {
-            "assessmentResult": {
-                "sourcedId": result_id,
-                "status": "active",
-                "student": {"sourcedId": student_id},
-                "assessmentLineItem": {"sourcedId": ali_id},
-                "score": score,
-                "scoreStatus": score_status,
-                "scoreDate": now,
-                "comment": comment or None,
-                "metadata": metadata or None,
-            }
-        }
-
-        result_url = f"{GRADEBOOK}/assessmentResults/{result_id}"
-        try:
-            resp = requests.put(result_url, headers=headers, json=result_payload, timeout=15)
-            if resp.status_code == 401:
-                headers = api_headers()
-                resp = requests.put(result_url, headers=headers, json=result_payload, timeout=15)
-            debug.append({
-                "step": "2_upsert_result",
-                "url": result_url,
-                "status": resp.status_code,
-                "body": resp.text[:300],
-            })
-        except Exception as e:
-            debug.append({"step": "2_upsert_result", "error": str(e)})
-            send_json(self, {
-                "status": "error",
-                "message": "Failed to create assessmentResult",
-                "debug": debug,
-            }, 502)
-            return
-
-        if resp.status_code in (200, 201):
-            try:
-                data = resp.json()
-            except Exception:
-                data = {}
+        out = _submit([body], debug)[0]
+        if "debug" in out:
+            debug.append(out.pop("debug"))
+        if out["status"] == "success":
             send_json(self, {
                 "status": "success",
-                "assessmentLineItemId": ali_id,
-                "resultId": result_id,
-                "usedPowerPathALI": is_powerpath_id,
-                "response": data,
+                "assessmentLineItemId": out["assessmentLineItemId"],
+                "resultId": out["resultId"],
+                "usedPowerPathALI": out["usedPowerPathALI"],
+                "response": out.get("response", {}),
                 "debug": debug,
             }, 201)
         else:
             send_json(self, {
                 "status": "error",
-                "message": f"AssessmentResult upsert failed ({resp.status_code})",
+                "message": out["message"],
                 "debug": debug,
             }, 502)
+
+    def _handle_bulk(self, items):
+        if not isinstance(items, list) or not items:
+            send_json(self, {"error": "results must be a non-empty list"}, 400)
+            return
+        if len(items) > MAX_BULK:
+            send_json(self, {"error": f"At most {MAX_BULK} results per request"}, 400)
+            return
+        if not all(isinstance(i, dict) for i in items):
+            send_json(self, {"error": "Each result must be an object"}, 400)
+            return
+
+        debug = []
+        outcomes = _submit(items, debug)
+        for out in outcomes:
+            out.pop("debug", None)
+            out.pop("response", None)
+        succeeded = sum(1 for o in outcomes if o["status"] == "success")
+        status = "success" if succeeded == len(outcomes) else ("partial" if succeeded else "error")
+        send_json(self, {
+            "status": status,
+            "succeeded": succeeded,
+            "failed": len(outcomes) - succeeded,
+            "results": outcomes,
+            "debug": debug,
+        }, 200 if succeeded else 502)
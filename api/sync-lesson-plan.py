@@ -7,6 +7,11 @@ Body:
 Endpoints per docs:
   POST /powerpath/lessonPlans/course/{courseId}/sync - Full course sync
   POST /powerpath/lessonPlans/{lessonPlanId}/operations/sync - Operations sync
+
+After a course sync the cached lesson-plan tree version is bumped (see
+api/_tree_cache.py), the course is registered for scheduled warming and a
+background warm of its QTI content and articles is started
+(see /api/warm-course).
 """
 
 import json
@@ -14,6 +19,8 @@ from http.server import BaseHTTPRequestHandler
 
 import requests
 from api._helpers import API_BASE, api_headers, send_json
+from api._course_warm import register_course, start_warm
+from api._tree_cache import bump_tree_version
 
 
 class handler(BaseHTTPRequestHandler):
@@ -58,6 +65,11 @@ class handler(BaseHTTPRequestHandler):
                     "status": resp.status_code,
                     "body": resp.text[:1000]
                 })
+
+                if resp.status_code < 300:
+                    bump_tree_version(course_id)
+                    register_course(course_id)
+                    debug.append({"step": "warm", "started": start_warm(course_id)})
             except Exception as e:
                 debug.append({"step": "course_sync", "error": str(e)})
 
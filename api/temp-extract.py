@@ -1,18 +1,26 @@
-"""GET /api/temp-extract?courseId=...
+"""GET /api/temp-extract?courseId=...[&stimuliTable=1]
 
 TEMPORARY — Extract all content from an AP course's PowerPath lesson plan tree.
 
 Uses ONLY read-only GET requests:
-  - PowerPath lesson plan tree (course structure)
+  - PowerPath lesson plan tree (course structure, via the shared tree cache)
   - QTI catalog (question content, article/stimulus content)
   - OneRoster user lookup (to resolve service account email)
 
 A dedicated service account (pehal64861@aixind.com) is used ONLY for
 read-only lesson plan GET when the generic tree endpoint returns 404.
-The service account ID is NEVER used with any write endpoint.
+If it has no lesson plan yet, provisioning is queued and the response is
+202 { status: "provisioning", provisioningCourseIds } — poll
+/api/provision-status and call again.
+
+Each question carries its reading passage as "stimulus" text. With
+stimuliTable=1, passages shared by several questions are instead returned
+once in a top-level "stimuli" table, and questions carry a "stimulusId"
+into it.
 """
 
 import re
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from http.server import BaseHTTPRequestHandler
 
@@ -21,11 +29,13 @@ from api._helpers import (
     API_BASE,
     CLIENT_ID,
     CLIENT_SECRET,
-    api_headers,
     send_json,
     get_query_params,
     get_token,
 )
+from api._course_tree import index_for
+from api._provisioning import enqueue
+from api._tree_cache import get_tree
 
 COGNITO_URL = "https://prod-beyond-timeback-api-2-idp.auth.us-east-1.amazoncognito.com/oauth2/token"
 QTI_BASE = "https://qti.alpha-1edtech.ai"
@@ -34,6 +44,13 @@ QTI_BASE = "https://qti.alpha-1edtech.ai"
 # ---------------------------------------------------------------------------
 # Auth — QTI admin-scoped token (catalog access only)
 # ---------------------------------------------------------------------------
+def _sort_key(value):
+    """Sort key for a sortOrder that may be a number, a string or missing."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    return (1, 0, "" if value is None else str(value))
+
+
 def _qti_token():
     try:
         resp = requests.post(
@@ -334,6 +351,9 @@ def _parse_qti_item(item):
     if raw_xml and not prompt_text:
         result["rawContent"] = _extract_html_text(raw_xml)[:2000]
 
+    if item.get("_stimulusRef"):
+        result["stimulusId"] = item["_stimulusRef"]
+
     stim = item.get("_sectionStimulus")
     if stim and isinstance(stim, dict):
         sb = (stim.get("qti-assessment-stimulus") or stim).get("qti-stimulus-body", "")
@@ -343,9 +363,71 @@ def _parse_qti_item(item):
     return result
 
 
-def _resolve_qti_test_questions(test_data, qti_headers):
+def _stimulus_ref(section):
+    """Return (key, url) for a section-level stimulus ref, or ("", "")."""
+    refs = section.get("qti-assessment-stimulus-ref") or []
+    if not isinstance(refs, list):
+        refs = [refs]
+    for ref in refs:
+        if isinstance(ref, str) and ref:
+            return ref, ref if ref.startswith("http") else f"{QTI_BASE}/api/stimuli/{ref}"
+        if isinstance(ref, dict):
+            attrs = ref.get("_attributes", ref)
+            href = attrs.get("href", "")
+            sid = attrs.get("identifier", "")
+            if href.startswith("http"):
+                return href, href
+            if sid or href:
+                return sid or href, f"{QTI_BASE}/api/stimuli/{sid or href.rstrip('/').split('/')[-1]}"
+    return "", ""
+
+
+class _Stimuli:
+    """Course-wide passage table (stimulus key → text).
+
+    Lessons are resolved concurrently and often cite the same passage, so
+    each key gets one in-flight future that every citing worker shares (as
+    api._qti.QtiFetcher does per URL): a passage is fetched once per course.
+    """
+
+    def __init__(self, qti_headers: dict, max_workers: int = 4):
+        self.headers = qti_headers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, url: str):
+        with self._lock:
+            fut = self._futures.get(key)
+            if fut is None:
+                fut = self._futures[key] = self._pool.submit(self._fetch, url)
+            return fut
+
+    def _fetch(self, url: str) -> str:
+        data, _st = _fetch_json(url, self.headers)
+        text = _extract_article_text(data) if data else ""
+        return text[:5000] if text else ""
+
+    def texts(self) -> dict:
+        """Every passage fetched so far (failed fetches map to "")."""
+        out = {}
+        for key, fut in list(self._futures.items()):
+            try:
+                out[key] = fut.result()
+            except Exception:
+                out[key] = ""
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+def _resolve_qti_test_questions(test_data, qti_headers, stimuli):
     """Given a QTI assessment-test JSON, walk its parts/sections to
-    collect item refs and fetch each item. Read-only GETs only."""
+    collect item refs and fetch each item. Read-only GETs only.
+
+    Section stimuli go through the course-wide ``stimuli`` table (_Stimuli),
+    and items are tagged with ``_stimulusRef``."""
     test = test_data.get("qti-assessment-test", test_data)
     if not isinstance(test, dict):
         return []
@@ -355,11 +437,16 @@ def _resolve_qti_test_questions(test_data, qti_headers):
         parts = [parts]
 
     item_hrefs = []
+    item_stim = {}   # item href → stimulus key
+    stim_urls = {}   # stimulus key → fetch URL
     for part in parts:
         sections = part.get("qti-assessment-section") or part.get("sections") or []
         if not isinstance(sections, list):
             sections = [sections]
         for section in sections:
+            stim_key, stim_url = _stimulus_ref(section)
+            if stim_key:
+                stim_urls[stim_key] = stim_url
             refs = section.get("qti-assessment-item-ref") or section.get("itemRefs") or section.get("items") or []
             if not isinstance(refs, list):
                 refs = [refs]
@@ -375,6 +462,8 @@ def _resolve_qti_test_questions(test_data, qti_headers):
                             href = f"{QTI_BASE}/api/assessment-items/{rid}"
                 if href:
                     item_hrefs.append(href)
+                    if stim_key:
+                        item_stim[href] = stim_key
 
     if not item_hrefs:
         return []
@@ -383,6 +472,9 @@ def _resolve_qti_test_questions(test_data, qti_headers):
     def _get_item(url):
         return url, _fetch_json(url, qti_headers)
 
+    for key, url in stim_urls.items():
+        stimuli.submit(key, url)
+
     items = {}
     with ThreadPoolExecutor(max_workers=6) as pool:
         futs = [pool.submit(_get_item, h) for h in item_hrefs]
@@ -394,10 +486,18 @@ def _resolve_qti_test_questions(test_data, qti_headers):
             except Exception:
                 pass
 
-    return [items[h] for h in item_hrefs if h in items]
+    out = []
+    for h in item_hrefs:
+        item = items.get(h)
+        if item is None:
+            continue
+        if isinstance(item, dict) and h in item_stim:
+            item["_stimulusRef"] = item_stim[h]
+        out.append(item)
+    return out
 
 
-def _fetch_questions_from_qti(url, res_id, qti_headers):
+def _fetch_questions_from_qti(url, res_id, qti_headers, stimuli):
     """Fetch questions for a resource via the QTI catalog.
     Uses ONLY read-only GET requests to admin-scoped QTI endpoints.
     Returns list of parsed question dicts."""
@@ -412,7 +512,7 @@ def _fetch_questions_from_qti(url, res_id, qti_headers):
         if data and isinstance(data, dict):
             test = data.get("qti-assessment-test", data)
             if isinstance(test, dict) and (test.get("qti-test-part") or test.get("testParts")):
-                raw_items = _resolve_qti_test_questions(data, qti_headers)
+                raw_items = _resolve_qti_test_questions(data, qti_headers, stimuli)
                 parsed = [_parse_qti_item(i) for i in raw_items]
                 parsed = [p for p in parsed if p]
                 if parsed:
@@ -433,7 +533,7 @@ def _fetch_questions_from_qti(url, res_id, qti_headers):
             if data and isinstance(data, dict):
                 test = data.get("qti-assessment-test", data)
                 if isinstance(test, dict) and (test.get("qti-test-part") or test.get("testParts")):
-                    raw_items = _resolve_qti_test_questions(data, qti_headers)
+                    raw_items = _resolve_qti_test_questions(data, qti_headers, stimuli)
                     parsed = [_parse_qti_item(i) for i in raw_items]
                     parsed = [p for p in parsed if p]
                     if parsed:
@@ -457,59 +557,12 @@ def _fetch_questions_from_qti(url, res_id, qti_headers):
 # updateStudentQuestionResponse, or any student-mutating endpoint.
 # It is used ONLY for:
 #   - GET /powerpath/lessonPlans/{courseId}/{svcId}  (read-only)
-#   - POST /edubridge/enrollments/enroll/{svcId}/{courseId}  (one-time per course)
-#   - POST /powerpath/lessonPlans/course/{courseId}/sync  (provisions lesson plan)
+#   - enroll + sync, one-time per course, via the provisioning queue
+#     (api/_provisioning.py) — never inline in this request
 # ---------------------------------------------------------------------------
 SERVICE_USER_ID = "8ea2b8e1-1b04-4cab-b608-9ab524c059c2"
 
 
-def _ensure_enrolled(course_id, pp_headers, debug):
-    """Enroll the service account in a course if not already enrolled.
-    This is a one-time write per course to the service account only.
-    Never touches any real student data."""
-    try:
-        resp = requests.post(
-            f"{API_BASE}/edubridge/enrollments/enroll/{SERVICE_USER_ID}/{course_id}",
-            headers=pp_headers,
-            json={"role": "student"},
-            timeout=15,
-        )
-        if resp.status_code == 401:
-            pp_headers = api_headers()
-            resp = requests.post(
-                f"{API_BASE}/edubridge/enrollments/enroll/{SERVICE_USER_ID}/{course_id}",
-                headers=pp_headers,
-                json={"role": "student"},
-                timeout=15,
-            )
-        debug.append({"step": "enroll", "courseId": course_id, "status": resp.status_code})
-    except Exception as e:
-        debug.append({"step": "enroll", "courseId": course_id, "error": str(e)})
-
-
-def _sync_course(course_id, pp_headers, debug):
-    """Trigger PowerPath to provision lesson plans for all enrolled users.
-    Same endpoint as sync-lesson-plan.py. Only affects service account."""
-    try:
-        resp = requests.post(
-            f"{API_BASE}/powerpath/lessonPlans/course/{course_id}/sync",
-            headers=pp_headers,
-            json={},
-            timeout=60,
-        )
-        if resp.status_code == 401:
-            pp_headers = api_headers()
-            resp = requests.post(
-                f"{API_BASE}/powerpath/lessonPlans/course/{course_id}/sync",
-                headers=pp_headers,
-                json={},
-                timeout=60,
-            )
-        debug.append({"step": "sync", "courseId": course_id, "status": resp.status_code})
-    except Exception as e:
-        debug.append({"step": "sync", "courseId": course_id, "error": str(e)})
-
-
 # ---------------------------------------------------------------------------
 # Handler — read-only, no real student data
 # ---------------------------------------------------------------------------
@@ -525,6 +578,7 @@ class handler(BaseHTTPRequestHandler):
         params = get_query_params(self)
         course_id = params.get("courseId", "").strip()
         catalog_id = params.get("catalogId", "").strip()
+        stimuli_table = params.get("stimuliTable", "") in ("1", "true")
 
         if not course_id:
             send_json(self, {"error": "Need courseId"}, 400)
@@ -536,88 +590,33 @@ class handler(BaseHTTPRequestHandler):
             ids_to_try.append(catalog_id)
 
         try:
-            pp_headers = api_headers()
             qti_headers = _qti_headers()
             debug = []
 
-            # 1. Try every ID with the tree endpoint first (no user needed)
+            # 1. Shared tree cache: generic tree, then service account lesson plan
             tree = None
             for cid in ids_to_try:
+                tree = get_tree(cid)
+                debug.append({"step": "tree_cache", "courseId": cid, "found": bool(tree)})
                 if tree:
                     break
-                try:
-                    resp = requests.get(
-                        f"{API_BASE}/powerpath/lessonPlans/tree/{cid}",
-                        headers=pp_headers,
-                        timeout=30,
-                    )
-                    if resp.status_code == 401:
-                        pp_headers = api_headers()
-                        resp = requests.get(
-                            f"{API_BASE}/powerpath/lessonPlans/tree/{cid}",
-                            headers=pp_headers,
-                            timeout=30,
-                        )
-                    debug.append({"step": "tree", "courseId": cid, "status": resp.status_code})
-                    if resp.status_code == 200:
-                        tree = resp.json()
-                except Exception as e:
-                    debug.append({"step": "tree", "courseId": cid, "error": str(e)})
-
-            # 2. Fallback: try service account GET (maybe already provisioned)
-            if not tree:
-                for cid in ids_to_try:
-                    if tree:
-                        break
-                    try:
-                        resp = requests.get(
-                            f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}",
-                            headers=pp_headers,
-                            timeout=30,
-                        )
-                        if resp.status_code == 401:
-                            pp_headers = api_headers()
-                            resp = requests.get(
-                                f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}",
-                                headers=pp_headers,
-                                timeout=30,
-                            )
-                        debug.append({"step": "svc_get", "courseId": cid, "status": resp.status_code})
-                        if resp.status_code == 200:
-                            tree = resp.json()
-                            break
-                    except Exception as e:
-                        debug.append({"step": "svc_get", "courseId": cid, "error": str(e)})
-
-            # 3. Not provisioned — enroll + sync + retry
-            if not tree:
-                for cid in ids_to_try:
-                    if tree:
-                        break
-                    _ensure_enrolled(cid, pp_headers, debug)
-                    _sync_course(cid, pp_headers, debug)
-                    # Retry GET after sync
-                    try:
-                        resp = requests.get(
-                            f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}",
-                            headers=pp_headers,
-                            timeout=30,
-                        )
-                        if resp.status_code == 401:
-                            pp_headers = api_headers()
-                            resp = requests.get(
-                                f"{API_BASE}/powerpath/lessonPlans/{cid}/{SERVICE_USER_ID}",
-                                headers=pp_headers,
-                                timeout=30,
-                            )
-                        debug.append({"step": "svc_retry", "courseId": cid, "status": resp.status_code})
-                        if resp.status_code == 200:
-                            tree = resp.json()
-                            break
-                    except Exception as e:
-                        debug.append({"step": "svc_retry", "courseId": cid, "error": str(e)})
 
+            # 2. Not provisioned — queue enroll + sync and let the client poll
             if not tree:
+                provisioning = []
+                for cid in ids_to_try:
+                    job = enqueue(cid)
+                    debug.append({"step": "provision", "courseId": cid, "status": job.get("status")})
+                    if job.get("status") in ("queued", "running"):
+                        provisioning.append(cid)
+                if provisioning:
+                    send_json(self, {
+                        "status": "provisioning",
+                        "success": False,
+                        "provisioningCourseIds": provisioning,
+                        "_debug": debug,
+                    }, 202)
+                    return
                 send_json(self, {
                     "error": f"No lesson plan found for course {course_id}",
                     "success": False,
@@ -627,74 +626,57 @@ class handler(BaseHTTPRequestHandler):
                 }, 404)
                 return
 
-            inner = tree.get("lessonPlan", tree) if isinstance(tree, dict) else tree
-            if isinstance(inner, dict) and inner.get("lessonPlan"):
-                inner = inner["lessonPlan"]
-
-            course_title = inner.get("title", "") if isinstance(inner, dict) else ""
-            units_raw = inner.get("subComponents", []) if isinstance(inner, dict) else []
-            units_raw.sort(key=lambda u: u.get("sortOrder", ""))
+            index = index_for(tree)
+            course_title = index.title
+            unit_order = sorted(range(len(index.units)), key=lambda i: _sort_key(index.units[i]["sortOrder"]))
+            units_raw = [index.units[i] for i in unit_order]
 
             # 2. Collect ALL resources from ALL units upfront
-            #    Each entry: (unit_idx, lesson_idx, res_title, res_id, rurl, kind)
             all_lessons = []   # [(unit_idx, lesson_dict)]
-            all_resources = [] # [(unit_idx, lesson_idx, res_title, res_id, rurl)]
+            all_resources = [] # [(lesson_idx, res_title, res_id, rurl, kind)]
             debug = {"attempted": 0, "succeeded": 0, "failed": 0}
 
-            for ui, unit in enumerate(units_raw):
-                lessons_raw = unit.get("subComponents", [])
-                lessons_raw.sort(key=lambda l: l.get("sortOrder", ""))
-                lessons_raw = [
-                    les for les in lessons_raw
-                    if "advanced organizer" not in (les.get("title", "")).lower()
-                    and "organizer submission" not in (les.get("title", "")).lower()
+            for ui, iu in enumerate(unit_order):
+                start, end = index.units[iu]["lessons"]
+                groups = [
+                    (index.lessons[li]["title"], index.lessons[li]["sortOrder"], index.lesson_resources(li))
+                    for li in sorted(range(start, end), key=lambda li: _sort_key(index.lessons[li]["sortOrder"]))
+                    if "advanced organizer" not in index.lessons[li]["title"].lower()
+                    and "organizer submission" not in index.lessons[li]["title"].lower()
                 ]
-                unit_res = unit.get("componentResources", [])
-                if not lessons_raw and unit_res:
-                    for i, ur in enumerate(unit_res):
-                        r = ur.get("resource", ur) if isinstance(ur, dict) else ur
-                        lessons_raw.append({
-                            "title": (r.get("title", "") if isinstance(r, dict) else "") or f"Assessment {i + 1}",
-                            "sortOrder": str(i),
-                            "componentResources": [ur],
-                        })
-
-                for li, lesson in enumerate(lessons_raw):
+                unit_res = index.unit_resources(iu)
+                if not groups and unit_res:
+                    groups = [
+                        (r["title"] or f"Assessment {i + 1}", str(i), [r])
+                        for i, r in enumerate(unit_res)
+                    ]
+
+                for title, sort_order, resources in groups:
                     lesson_idx = len(all_lessons)
                     all_lessons.append((ui, {
-                        "title": lesson.get("title", ""),
-                        "sortOrder": lesson.get("sortOrder", ""),
+                        "title": title,
+                        "sortOrder": sort_order,
                         "_videos": [],
                         "_articles": [],
                         "_questions": [],
                     }))
 
-                    for res_wrapper in lesson.get("componentResources", []):
-                        res = res_wrapper.get("resource", res_wrapper) if isinstance(res_wrapper, dict) else res_wrapper
-                        if not isinstance(res, dict):
-                            continue
-                        meta = res.get("metadata") or {}
-                        rurl = meta.get("url", "") or res.get("url", "") or meta.get("href", "") or res.get("href", "")
-                        res_id = res.get("id", "") or res.get("sourcedId", "") or ""
-                        res_title = res.get("title", "")
-                        rtype = (meta.get("type", "") or res.get("type", "")).lower()
-
-                        if rtype == "video":
+                    for r in resources:
+                        if r["kind"] == "video":
                             all_lessons[lesson_idx][1]["_videos"].append({
-                                "title": res_title, "url": rurl, "id": res_id,
+                                "title": r["title"], "url": r["url"], "id": r["id"],
                             })
-                        elif "stimuli" in rurl:
-                            all_resources.append((lesson_idx, res_title, res_id, rurl, "article"))
                         else:
-                            all_resources.append((lesson_idx, res_title, res_id, rurl, "assessment"))
+                            all_resources.append((lesson_idx, r["title"], r["id"], r["url"], r["kind"]))
 
             # 3. Parallel fetch: ALL resources in ONE batch (read-only GETs only)
             debug["attempted"] = len(all_resources)
+            stimuli = _Stimuli(qti_headers)  # shared across the whole course
 
             def _process_resource(entry):
                 lesson_idx, res_title, res_id, rurl, kind = entry
                 if kind == "assessment":
-                    questions = _fetch_questions_from_qti(rurl, res_id, qti_headers)
+                    questions = _fetch_questions_from_qti(rurl, res_id, qti_headers, stimuli)
                     if questions:
                         return (lesson_idx, "questions", questions)
                 # Either it's an article, or assessment returned no questions
@@ -718,6 +700,10 @@ class handler(BaseHTTPRequestHandler):
                     except Exception:
                         debug["failed"] += 1
 
+            texts = stimuli.texts()  # waits for passages still in flight
+            stimuli.close()
+            stimuli = texts
+
             # 4. Build final response
             units_out = []
             total_questions = 0
@@ -730,6 +716,10 @@ class handler(BaseHTTPRequestHandler):
                 if ui not in unit_lessons:
                     unit_lessons[ui] = []
                 questions = ld.pop("_questions")
+                if not stimuli_table:
+                    for q in questions:
+                        if q.get("stimulusId") in stimuli:
+                            q["stimulus"] = stimuli[q["stimulusId"]]
                 videos = ld.pop("_videos")
                 articles = ld.pop("_articles")
                 ld["questionCount"] = len(questions)
@@ -754,7 +744,7 @@ class handler(BaseHTTPRequestHandler):
                     "lessons": lessons,
                 })
 
-            send_json(self, {
+            result = {
                 "success": True,
                 "course": {"title": course_title, "courseId": course_id},
                 "totalQuestions": total_questions,
@@ -763,7 +753,10 @@ class handler(BaseHTTPRequestHandler):
                 "unitCount": len(units_out),
                 "units": units_out,
                 "_debug": debug,
-            })
+            }
+            if stimuli_table:
+                result["stimuli"] = stimuli
+            send_json(self, result)
 
         except Exception as e:
             send_json(self, {"error": str(e), "success": False}, 500)
@@ -14,6 +14,7 @@ from http.server import BaseHTTPRequestHandler
 
 import requests
 from api._helpers import API_BASE, api_headers, send_json
+from api._xp_ledger import record_result
 
 
 GRADEBOOK = f"{API_BASE}/ims/oneroster/gradebook/v1p2"
@@ -117,6 +118,7 @@ class handler(BaseHTTPRequestHandler):
             })
             
             if resp.status_code in (200, 201):
+                record_result((existing.get("student") or {}).get("sourcedId", ""), update_payload["assessmentResult"])
                 send_json(self, {
                     "status": "success",
                     "resultId": result_id,
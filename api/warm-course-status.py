@@ -0,0 +1,38 @@
+"""GET /api/warm-course-status?courseId=...
+
+Polls the status of a course warm job (see /api/warm-course). Returns:
+  - { status: "warming", total, warmed, failed, ... } while running
+  - { status: "partial", ... } when a scheduled run hit its time limit (resumes next run)
+  - { status: "done", total, warmed, failed, completedAt } when complete
+  - { status: "error", error: "..." } on failure
+"""
+
+from http.server import BaseHTTPRequestHandler
+
+from api._helpers import send_json, get_query_params
+from api._kv import kv_get
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self):
+        params = get_query_params(self)
+        course_id = params.get("courseId", "").strip()
+
+        if not course_id:
+            send_json(self, {"error": "Missing courseId"}, 400)
+            return
+
+        data = kv_get(f"course_warm:{course_id}")
+        if not data or not isinstance(data, dict):
+            send_json(self, {"status": "not_started"})
+            return
+
+        data = {k: v for k, v in data.items() if k != "done"}
+        send_json(self, data)
@@ -0,0 +1,75 @@
+"""POST /api/warm-course — Pre-fetch a course's QTI content into the cache.
+
+Receives { courseId, restart? }.
+Runs async in a background thread: walks the course tree, resolves every
+assessment (test, items, stimuli) and renders every article into KV, with
+bounded concurrency. Progress is resumable; pass restart=true to start over.
+
+GET /api/warm-course is the scheduled entry point (see "crons" in
+vercel.json): it re-warms every course registered by /api/sync-lesson-plan,
+or a single course with ?courseId=..., within the function's time limit.
+
+Poll /api/warm-course-status?courseId=... for progress.
+"""
+
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+
+from api._helpers import send_json, get_query_params
+from api._kv import kv_list_get
+from api._course_warm import (
+    WARM_COURSES_KEY,
+    is_running,
+    register_course,
+    start_warm,
+    warm_course,
+)
+
+CRON_BUDGET = 240  # seconds; leaves headroom under maxDuration
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            body = json.loads(raw)
+        except Exception:
+            send_json(self, {"error": "Invalid JSON"}, 400)
+            return
+
+        course_id = (body.get("courseId") or "").strip()
+        if not course_id:
+            send_json(self, {"error": "Missing courseId"}, 400)
+            return
+
+        register_course(course_id)
+        started = start_warm(course_id, restart=bool(body.get("restart")))
+        send_json(self, {"status": "warming", "courseId": course_id, "started": started})
+
+    def do_GET(self):
+        params = get_query_params(self)
+        course_id = params.get("courseId", "").strip()
+        course_ids = [course_id] if course_id else kv_list_get(WARM_COURSES_KEY)
+
+        deadline = time.time() + CRON_BUDGET
+        results = {}
+        for cid in course_ids:
+            if time.time() > deadline:
+                results[cid] = "deferred"
+                continue
+            if is_running(cid):
+                results[cid] = "running"
+                continue
+            state = warm_course(cid, deadline=deadline)
+            results[cid] = state.get("status")
+
+        send_json(self, {"courses": results, "count": len(course_ids)})
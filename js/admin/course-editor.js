@@ -84,6 +84,34 @@
         return m > 0 ? m + 'm ' + s + 's' : s + 's';
     }
 
+    /* ---- Find course tests (waits out queued provisioning) ----------- */
+    function sleep(ms) { return new Promise(function (r) { setTimeout(r, ms); }); }
+
+    async function findCourseTests(course, onProvisioning) {
+        var body = JSON.stringify({ courseId: course.sourcedId, courseCode: course.courseCode || '' });
+        for (var round = 0; round < 2; round++) {
+            var resp = await fetch('/api/find-course-tests', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: body,
+                signal: AbortSignal.timeout ? AbortSignal.timeout(120000) : undefined,
+            });
+            var data = await resp.json();
+            var ids = data.provisioningCourseIds || [];
+            if (!data.provisioning || (data.tests && data.tests.length) || !ids.length || round > 0) return data;
+
+            // Enroll + sync runs server-side; poll until it settles (max ~5 min)
+            if (onProvisioning) onProvisioning();
+            for (var i = 0; i < 60; i++) {
+                await sleep(5000);
+                var st = await fetch('/api/provision-status?courseIds=' + encodeURIComponent(ids.join(',')))
+                    .then(function (r) { return r.json(); }).catch(function () { return {}; });
+                if (!st.pending) break;
+            }
+        }
+        return data;
+    }
+
     /* ---- Skeleton Cards --------------------------------------------- */
     function showSkeletonCards(count) {
         var grid = document.getElementById('courses-grid');
@@ -1181,16 +1209,9 @@
 
         try {
             // Phase 1: Find tests (may enroll+sync on first call — can take 30-60s)
-            var findResp = await fetch('/api/find-course-tests', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    courseId: selectedCourse.sourcedId,
-                    courseCode: selectedCourse.courseCode || '',
-                }),
-                signal: AbortSignal.timeout ? AbortSignal.timeout(120000) : undefined, // 2 min timeout
+            var findData = await findCourseTests(selectedCourse, function () {
+                showQuestionAnalysisProgress('Provisioning course access in PowerPath (first run only, up to a few minutes)...', 0);
             });
-            var findData = await findResp.json();
             var tests = findData.tests || [];
 
             if (!tests.length) {
@@ -1470,16 +1491,9 @@
 
         try {
             // Phase 1: Find tests
-            var findResp = await fetch('/api/find-course-tests', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    courseId: selectedCourse.sourcedId,
-                    courseCode: selectedCourse.courseCode || '',
-                }),
-                signal: AbortSignal.timeout ? AbortSignal.timeout(120000) : undefined,
+            var findData = await findCourseTests(selectedCourse, function () {
+                showExplProgress('Provisioning course access in PowerPath (first run only, up to a few minutes)...', 0);
             });
-            var findData = await findResp.json();
             var tests = findData.tests || [];
 
             if (!tests.length) {
@@ -1742,16 +1756,9 @@
 
         try {
             // Phase 1: Find tests (includes videoUrl and articleUrl per lesson)
-            var findResp = await fetch('/api/find-course-tests', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    courseId: selectedCourse.sourcedId,
-                    courseCode: selectedCourse.courseCode || '',
-                }),
-                signal: AbortSignal.timeout ? AbortSignal.timeout(120000) : undefined,
+            var findData = await findCourseTests(selectedCourse, function () {
+                showRelProgress('Provisioning course access in PowerPath (first run only, up to a few minutes)...', 0);
             });
-            var findData = await findResp.json();
             var tests = findData.tests || [];
 
             if (!tests.length) {
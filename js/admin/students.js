@@ -480,7 +480,7 @@ async function removeEnrollment(enrollmentId, courseTitle, btn) {
         const resp = await fetch('/api/enrollments', {
             method: 'DELETE',
             headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({ sourcedId: enrollmentId }),
+            body: JSON.stringify({ sourcedId: enrollmentId, userId: currentStudentId }),
         });
         const data = await resp.json().catch(()=>({}));
         if (resp.ok && data.success) {
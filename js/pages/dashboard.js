@@ -496,12 +496,11 @@
         }
 
         try {
-            /* 1. Fire user-lookup AND enrollments in parallel when we have a cached userId.
+            /* 1. Fire user-lookup AND the dashboard aggregate (enrollments + goals) in
+             *    parallel when we have a cached userId.
              *    This saves a full API round-trip on return visits (~200-500ms). */
             const lookupPromise = fetch(`/api/user-lookup?email=${encodeURIComponent(email)}`).then(r => r.json());
-            const earlyEnrollPromise = cachedUserId
-                ? fetch(`/api/enrollments?userId=${cachedUserId}`).then(r => r.json())
-                : null;
+            const earlyDashPromise = cachedUserId ? fetchDashboard(cachedUserId) : null;
 
             const lookupData = await lookupPromise;
 
@@ -546,13 +545,11 @@
             }
 
             /* 2. Use pre-fetched enrollments if userId matches, otherwise fetch now */
-            let enrollData;
-            if (earlyEnrollPromise && userId === cachedUserId) {
-                enrollData = await earlyEnrollPromise;
-            } else {
-                const enrollResp = await fetch(`/api/enrollments?userId=${userId}`);
-                enrollData = await enrollResp.json();
-            }
+            const dash = (earlyDashPromise && userId === cachedUserId)
+                ? await earlyDashPromise
+                : await fetchDashboard(userId);
+            const enrollData = dash.sections.enrollments || { enrollments: [] };
+            const dashGoals = dash.sections.goals;
 
             const raw = enrollData.data
                 || enrollData.enrollments
@@ -765,12 +762,9 @@
             allCourses = courses;
 
             const hasInternalCourses = courses.some(c => isInternalCourse(c));
+            if (dashGoals) savedGoals = dashGoals.goals || {};
+            else console.warn('[AlphaLearn] Goals unavailable:', (dash.errors || {}).goals);
             await Promise.all([
-                // Load goals from KV API
-                fetch(`/api/goals?userId=${encodeURIComponent(userId)}`)
-                    .then(r => r.json())
-                    .then(d => { savedGoals = d.goals || {}; })
-                    .catch(e => { console.warn('[AlphaLearn] Goals unavailable:', e.message); }),
                 hasInternalCourses ? loadFullYearXp(email) : Promise.resolve(),
                 loadXp(email, 'today'),
             ]);
@@ -785,6 +779,14 @@
         }
     });
 
+    /* ---- Enrollments + goals in one call (/api/dashboard) ----------------- */
+    async function fetchDashboard(userId) {
+        const resp = await fetch(`/api/dashboard?userId=${encodeURIComponent(userId)}&sections=enrollments,goals`);
+        const data = await resp.json();
+        if (!resp.ok) throw new Error(data.error || `HTTP ${resp.status}`);
+        return data;
+    }
+
     /* ---- Fetch XP from EduBridge analytics -------------------------------- */
     function localDateStr(d) {
         // Use LOCAL date (not UTC) so "today" matches the user's timezone
@@ -193,7 +193,20 @@ function stopProgress(success) {
     }
 }
 
-function extractContent() {
+function waitForProvisioning(courseIds, done) {
+    var tries = 0;
+    (function poll() {
+        fetch('/api/provision-status?courseIds=' + encodeURIComponent(courseIds.join(',')))
+            .then(function (r) { return r.json(); })
+            .catch(function () { return { pending: true }; })
+            .then(function (st) {
+                if (!st.pending || ++tries >= 60) { done(); return; }
+                setTimeout(poll, 5000);
+            });
+    })();
+}
+
+function extractContent(provisionWaited) {
     if (!selectedCourseId) return;
 
     var btn = document.getElementById('btn-extract');
@@ -205,19 +218,26 @@ function extractContent() {
     startProgress();
 
     // No student ID sent — download uses admin catalog endpoints only
-    var extractUrl = '/api/temp-extract?courseId=' + encodeURIComponent(selectedCourseId);
+    var extractUrl = '/api/temp-extract?courseId=' + encodeURIComponent(selectedCourseId) + '&stimuliTable=1';
     if (selectedCatalogId && selectedCatalogId !== selectedCourseId) {
         extractUrl += '&catalogId=' + encodeURIComponent(selectedCatalogId);
     }
     fetch(extractUrl)
         .then(function (r) { return r.json(); })
         .then(function (data) {
+            // Course not provisioned yet: enroll + sync is queued server-side
+            if (data.status === 'provisioning' && !provisionWaited) {
+                setStatus('<span class="spinner"></span> Provisioning course in PowerPath (first run only, up to a few minutes)...');
+                waitForProvisioning(data.provisioningCourseIds || [], function () { extractContent(true); });
+                return;
+            }
+
             btn.innerHTML = '<i class="fa-solid fa-wand-magic-sparkles"></i> Extract Content';
             btn.disabled = false;
 
             if (!data.success) {
                 stopProgress(false);
-                setStatus('<i class="fa-solid fa-exclamation-triangle" style="color:#E53E3E"></i> ' + escapeHtml(data.error || 'Unknown error'));
+                setStatus('<i class="fa-solid fa-exclamation-triangle" style="color:#E53E3E"></i> ' + escapeHtml(data.error || (data.status === 'provisioning' ? 'Course is still provisioning — try again in a few minutes.' : 'Unknown error')));
                 return;
             }
 
@@ -387,14 +407,22 @@ function toggleArticle(id, btn) {
     btn.textContent = el.classList.contains('expanded') ? 'Show less' : 'Show more';
 }
 
+// Passages come once per course in data.stimuli; questions point at them by stimulusId
+function questionStimulus(q) {
+    if (q.stimulus) return q.stimulus;
+    var table = extractedData && extractedData.stimuli;
+    return (table && q.stimulusId && table[q.stimulusId]) || '';
+}
+
 function renderQuestion(q, idx) {
     var html = '<div class="dl-question">';
     html += '<span class="dl-q-num">Q' + (idx + 1) + '</span>';
     if (q.title) html += '<strong>' + escapeHtml(q.title) + '</strong>';
     html += '<span class="dl-q-type ' + (q.type || 'mcq') + '">' + (q.type === 'frq' ? 'FRQ' : 'MCQ') + '</span>';
 
-    if (q.stimulus) {
-        html += '<div class="dl-q-stimulus">' + escapeHtml(q.stimulus) + '</div>';
+    var stimulus = questionStimulus(q);
+    if (stimulus) {
+        html += '<div class="dl-q-stimulus">' + escapeHtml(stimulus) + '</div>';
     }
 
     if (q.prompt) {
@@ -436,7 +464,8 @@ function formatQuestionsTxt(questions) {
     questions.forEach(function (q, i) {
         lines.push('Q' + (i + 1) + (q.title ? '. ' + q.title : '.'));
         lines.push('Type: ' + (q.type === 'frq' ? 'Free Response' : 'Multiple Choice'));
-        if (q.stimulus) { lines.push(''); lines.push('Stimulus:'); lines.push(q.stimulus); }
+        var stimulus = questionStimulus(q);
+        if (stimulus) { lines.push(''); lines.push('Stimulus:'); lines.push(stimulus); }
         if (q.prompt) { lines.push(''); lines.push(q.prompt); }
         if (q.rawContent && !q.prompt) { lines.push(''); lines.push(q.rawContent); }
         if (q.choices && q.choices.length) {
@@ -28,6 +28,8 @@
         cachedPassage: '',
         // Track answered question IDs locally (survives reload even if server state is stale)
         answeredIds: [],
+        // Next question returned by action=respond_and_next (consumed by loadNextQuestion)
+        prefetchedNext: null,
     };
     var quizArea = null; // reference to the quiz container element
     var _aiExplanations = null; // AI-generated wrong-answer explanations (prefetched)
@@ -474,12 +476,21 @@
         console.log('[Sync] Finalizing lesson via PowerPath - lessonId:', lessonId, 'userId:', syncState.userId, 'score:', score);
         
         try {
-            var resp = await fetch('/api/finalize-lesson', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload),
-            });
-            var d = await resp.json();
+            var resp, d;
+            // 503 = queued responses are still being saved; back off and retry
+            for (var tries = 0; ; tries++) {
+                resp = await fetch('/api/finalize-lesson', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(payload),
+                });
+                d = await resp.json();
+                if (resp.status !== 503 || tries >= 4) break;
+                await new Promise(function(r) { setTimeout(r, 1000 * Math.pow(2, tries)); });
+            }
+            if (d.rejected && d.rejected.length) {
+                console.warn('[Sync] PowerPath rejected ' + d.rejected.length + ' response(s):', d.rejected);
+            }
             console.log('[Sync] PowerPath finalize response (status ' + resp.status + '):', JSON.stringify(d));
             
             // The backend now returns xpEarned even on "partial" status
@@ -676,7 +687,7 @@
         quizState.staticIdx = 0; quizState.quizLessonId = '';
         quizState.isReadingQuiz = false; quizState.accumulatedStimuli = [];
         quizState.totalQuestions = 0;
-        quizState.answeredIds = [];
+        quizState.answeredIds = []; quizState.prefetchedNext = null;
     }
 
     /* ── QTI renderNode (for rich question content) ─────────── */
@@ -960,9 +971,13 @@
             quizArea.innerHTML = '<div class="loading-msg"><i class="fa-solid fa-spinner fa-spin" style="font-size:1.2rem;display:block;margin-bottom:10px;"></i>Loading question...</div>';
         }
         try {
-            var skipParam = quizState.answeredIds.length > 0 ? '&skipIds=' + encodeURIComponent(quizState.answeredIds.join(',')) : '';
-            var resp = await fetch('/api/quiz-session?action=next&attemptId=' + encodeURIComponent(quizState.attemptId) + skipParam);
-            var data = await resp.json();
+            var data = quizState.prefetchedNext;
+            quizState.prefetchedNext = null;
+            if (!data || data.error) {
+                var skipParam = quizState.answeredIds.length > 0 ? '&skipIds=' + encodeURIComponent(quizState.answeredIds.join(',')) : '';
+                var resp = await fetch('/api/quiz-session?action=next&attemptId=' + encodeURIComponent(quizState.attemptId) + skipParam);
+                data = await resp.json();
+            }
 
             // Handle errors separately — don't treat API failures as quiz completion
             if (data.error && !data.complete) {
@@ -999,7 +1014,7 @@
                         if (retryData.attemptId || retryData.id) {
                             quizState.attemptId = retryData.attemptId || retryData.id;
                             quizState.ppScore = 0; quizState.correct = 0; quizState.total = 0;
-                            quizState.streak = 0; quizState.questionNum = 0; quizState.answeredIds = [];
+                            quizState.streak = 0; quizState.questionNum = 0; quizState.answeredIds = []; quizState.prefetchedNext = null;
                             await loadNextQuestion();
                             return;
                         }
@@ -1251,16 +1266,20 @@
         // PowerPath adaptive submit
         if (quizState.attemptId) {
             try {
-                var resp = await fetch('/api/quiz-session?action=respond', {
+                var resp = await fetch('/api/quiz-session?action=respond_and_next', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
                     body: JSON.stringify({
                         attemptId: quizState.attemptId,
                         questionId: quizState.currentQuestion.id || quizState.currentQuestion.questionId || '',
                         response: quizState.selectedChoice,
+                        skipIds: quizState.answeredIds,
+                        // PowerPath 100 ends on PowerPath's own score, so wait for it
+                        needScore: !quizState.isReadingQuiz,
                     }),
                 });
                 var data = await resp.json();
+                quizState.prefetchedNext = data.next || null;
                 isCorrect = (data.responseResult && data.responseResult.isCorrect) || data.correct || data.isCorrect || false;
                 feedback = (data.responseResult && data.responseResult.feedback) || data.feedback || data.explanation || '';
                 if (data.xpEarned || data.xp) {
@@ -1514,6 +1533,7 @@
             var apiUrl = '/api/qti-item?';
             if (qtiUrl) apiUrl += 'url=' + encodeURIComponent(qtiUrl);
             else apiUrl += 'id=' + encodeURIComponent(testId) + '&type=assessment';
+            apiUrl += '&stimuliTable=1';
             if (subject) apiUrl += '&subject=' + encodeURIComponent(subject);
             if (gradeLevel) apiUrl += '&grade=' + encodeURIComponent(gradeLevel);
             if (quizState.title) apiUrl += '&title=' + encodeURIComponent(quizState.title);
@@ -1632,7 +1652,7 @@
 
                 // Extract stimulus content (article/passage attached by backend)
                 var stimulusHtml = '';
-                var secStim = q['_sectionStimulus'] || qi['_sectionStimulus'] || null;
+                var secStim = q['_sectionStimulus'] || qi['_sectionStimulus'] || (data.stimuli && data.stimuli[q['_stimulusRef']]) || null;
                 if (secStim) {
                     var stimObj = secStim;
                     if (stimObj.content && stimObj.content['qti-assessment-stimulus']) stimObj = stimObj.content['qti-assessment-stimulus'];
@@ -58,6 +58,8 @@
         reportingEnabled: true, // default ON; API can disable
         // Track answered question IDs locally (survives reload even if server state is stale)
         answeredIds: [],
+        // Next question returned by action=respond_and_next (consumed by loadNextQuestion)
+        prefetchedNext: null,
     };
     var _aiExplanations = null; // AI-generated wrong-answer explanations (prefetched)
 
@@ -995,7 +997,7 @@
                 var startResp = await fetch('/api/quiz-session?action=start', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({ studentId: userId, testId: testId, lessonId: lessonId, subject: subject, grade: gradeLevel, retry: isRetry }),
+                    body: JSON.stringify({ studentId: userId, testId: testId, lessonId: lessonId, courseId: _lessonCourseId(), subject: subject, grade: gradeLevel, retry: isRetry }),
                 });
                 var startData = await startResp.json();
 
@@ -1032,15 +1034,25 @@
         area.innerHTML = '<div class="loading-msg">No quiz ID provided.</div>';
     });
 
+    function _lessonCourseId() {
+        try {
+            return JSON.parse(sessionStorage.getItem('al_lesson_data') || '{}').courseSourcedId || '';
+        } catch(e) { return ''; }
+    }
+
     // ── PowerPath adaptive: load one question at a time ──
     async function loadNextQuestion() {
         if (!quizState.attemptId) return;
         area.innerHTML = '<div class="loading-msg"><div class="loading-spinner"></div>Loading question...</div>';
 
         try {
-            var skipParam = quizState.answeredIds.length > 0 ? '&skipIds=' + encodeURIComponent(quizState.answeredIds.join(',')) : '';
-            var resp = await fetch('/api/quiz-session?action=next&attemptId=' + encodeURIComponent(quizState.attemptId) + skipParam);
-            var data = await resp.json();
+            var data = quizState.prefetchedNext;
+            quizState.prefetchedNext = null;
+            if (!data || data.error) {
+                var skipParam = quizState.answeredIds.length > 0 ? '&skipIds=' + encodeURIComponent(quizState.answeredIds.join(',')) : '';
+                var resp = await fetch('/api/quiz-session?action=next&attemptId=' + encodeURIComponent(quizState.attemptId) + skipParam);
+                data = await resp.json();
+            }
 
             if (data.complete || data.finished || data.error === 'no_more_questions') {
                 showResults();
@@ -1276,16 +1288,20 @@
         var feedback = '';
         if (quizState.attemptId) {
             try {
-                var resp = await fetch('/api/quiz-session?action=respond', {
+                var resp = await fetch('/api/quiz-session?action=respond_and_next', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
                     body: JSON.stringify({
                         attemptId: quizState.attemptId,
                         questionId: quizState.currentQuestion.id || quizState.currentQuestion.questionId || '',
                         response: quizState.selectedChoice,
+                        skipIds: quizState.answeredIds,
+                        // PowerPath 100 ends on PowerPath's own score, so wait for it
+                        needScore: !quizState.isReadingQuiz,
                     }),
                 });
                 var data = await resp.json();
+                quizState.prefetchedNext = data.next || null;
                 isCorrect = (data.responseResult && data.responseResult.isCorrect) || data.correct || data.isCorrect || false;
                 feedback = (data.responseResult && data.responseResult.feedback) || data.feedback || data.explanation || '';
                 if (data.xpEarned || data.xp) quizState.xpEarned += (data.xpEarned || data.xp);
@@ -1293,7 +1309,10 @@
         }
 
         // Override with AI explanation if available for this wrong choice
-        if (!isCorrect && _aiExplanations && quizState.currentQuestion) {
+        var _qExpl = quizState.currentQuestion && quizState.currentQuestion.explanations;
+        if (!isCorrect && _qExpl && _qExpl[quizState.selectedChoice]) {
+            feedback = _qExpl[quizState.selectedChoice];
+        } else if (!isCorrect && _aiExplanations && quizState.currentQuestion) {
             var _cq = quizState.currentQuestion;
             var _aiIds = [];
             if (_cq.qtiIdentifier) _aiIds.push(_cq.qtiIdentifier);
@@ -1409,17 +1428,34 @@
         '</div>';
 
         // Finalize the attempt
-        if (quizState.attemptId) {
-            fetch('/api/quiz-session?action=finalize', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({attemptId: quizState.attemptId}),
-            }).catch(function(){});
-        }
+        if (quizState.attemptId) _finalizeAttempt(quizState.attemptId, 0);
 
         if (passed) { _markQuizComplete(); }
     }
 
+    // Finalize, retrying with backoff while queued responses are still being saved (503)
+    var FINALIZE_BACKOFF = [1000, 2000, 4000, 8000, 16000];
+    function _finalizeAttempt(attemptId, tries) {
+        fetch('/api/quiz-session?action=finalize', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({attemptId: attemptId}),
+        }).then(function(resp) {
+            return resp.json().catch(function() { return {}; }).then(function(d) {
+                if (resp.status === 503 && tries < FINALIZE_BACKOFF.length) {
+                    setTimeout(function() { _finalizeAttempt(attemptId, tries + 1); }, FINALIZE_BACKOFF[tries]);
+                    return;
+                }
+                if (!resp.ok) console.error('[Quiz] Finalize failed (status ' + resp.status + '):', d.message || d.error || '');
+                if (d.rejected && d.rejected.length) console.warn('[Quiz] PowerPath rejected ' + d.rejected.length + ' response(s):', d.rejected);
+            });
+        }).catch(function(e) {
+            if (tries < FINALIZE_BACKOFF.length) {
+                setTimeout(function() { _finalizeAttempt(attemptId, tries + 1); }, FINALIZE_BACKOFF[tries]);
+            }
+        });
+    }
+
     // ── Reading/Article display — fetch content and render as readable article ──
     async function loadReadingContent(qtiUrl, testId, contentType) {
         try {
@@ -1487,6 +1523,7 @@
             var apiUrl = '/api/qti-item?';
             if (qtiUrl) apiUrl += 'url=' + encodeURIComponent(qtiUrl);
             else apiUrl += 'id=' + encodeURIComponent(testId) + '&type=' + encodeURIComponent(contentType || 'assessment');
+            apiUrl += '&stimuliTable=1';
             // Pass subject/title/grade for QTI catalog search when ID isn't a direct QTI ID
             if (subject) apiUrl += '&subject=' + encodeURIComponent(subject);
             if (gradeLevel) apiUrl += '&grade=' + encodeURIComponent(gradeLevel);
@@ -1589,7 +1626,7 @@
 
                     // Stimulus content — from backend _sectionStimulus attachment
                     var stimulusHtml = '';
-                    var secStim = q['_sectionStimulus'] || qi['_sectionStimulus'] || null;
+                    var secStim = q['_sectionStimulus'] || qi['_sectionStimulus'] || (data.stimuli && data.stimuli[q['_stimulusRef']]) || null;
                     if (secStim) {
                         // The stimulus from QTI API can be nested in multiple ways
                         var stimObj = secStim;